@@ -1,39 +1,73 @@
-from users.tools import Tools as user_tools
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from users.controller.user_controller import User as uc
 from authentication.password import Password as pw
+from security.sessions import Sessions
 
 
 class Auth:
-    
+    # bcrypt releases the GIL, so a thread pool runs that many hashes in parallel
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="auth")
+    sessions = Sessions()
+    # demoting, deleting or changing the password of a user applies to the sessions already open
+    uc.session_stores.append(sessions)
 
     def compare_password(username, password_to_compare):
         
         try:
-            user = user_tools.read(username=username)
-            salt = user[4]
-            password = user[3]
-
-
-            hashed_pw_to_compare = pw.hash_with_salt(password=password_to_compare, salt_req=salt)
+            # password hash and salt in a single query
+            user = uc.credentials(username)
 
-
-            if password == hashed_pw_to_compare: 
-                return True
-            
-            else: 
+            if user is None:
                 return False
 
+            return pw.check(password_to_compare, user.password)
+
         except Exception as e:
 
             return e
 
 
     def login(username, password):
-        if user_tools.exists(username=username) is not None:
-            if Auth.compare_password(username,password):
-                return True
-        
-        else:
-            return False
+        return Auth.compare_password(username, password) is True
+
+
+    def open_session(username, password):
+        '''
+         Logs a user in and issues a session token, so later permission checks don't run bcrypt again.
+
+         @return The signed token or None if the credentials are wrong.
+        '''
+        user = uc.credentials(username)
+
+        if user is None or not pw.check(password, user.password):
+            return None
+
+        return Auth.sessions.issue(user.id, username, user.perm_level)
+
+
+    def check_permission(token, perm_level):
+        return Auth.sessions.check_permission(token, perm_level)
+
+
+    async def login_async(username, password):
+        '''
+         Runs login on the bcrypt worker pool so the event loop keeps serving other tills.
+        '''
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(Auth.executor, Auth.login, username, password)
+
+
+    def login_many(credentials):
+        '''
+         Checks a batch of (username, password) pairs concurrently, e.g. at shift change.
+
+         @return A list of booleans in the same order as credentials.
+        '''
+        return list(Auth.executor.map(lambda pair: Auth.login(*pair), credentials))
 
 
 
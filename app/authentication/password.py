@@ -1,47 +1,89 @@
+import string
+
 import bcrypt as bc
 
 
-class Password:
+class Policy:
+    '''
+     Password rules compiled once into str.translate deletion tables.
 
+     Counting a character class is len(password) minus the length of the
+     password with that class deleted, which runs in C instead of a Python
+     loop over every character.
+    '''
 
-    def req_verify(password):
-        '''the conditions to make a password are:
-            - at least 8 characters , where two must be numbers
+    def __init__(self, min_length=8, min_lower=6, min_upper=0, min_digits=2, min_symbols=0, allowed=None):
+        '''
+         @param allowed - Characters a password may hold, by default lowercase letters and digits
+                          plus every class another rule asks for, e.g. uppercase letters with min_upper.
         '''
+        classes = ((string.ascii_lowercase, min_lower), (string.ascii_uppercase, min_upper),
+                   (string.digits, min_digits), (string.punctuation, min_symbols))
 
-        letters, numbers = list("abcdefghijklmnopqrstuvwxyz"), list("0123456789")
-        l = 0
-        n = 0
+        if allowed is None:
+            allowed = (string.ascii_lowercase + string.digits + (string.ascii_uppercase if min_upper else "")
+                       + (string.punctuation if min_symbols else ""))
 
-        for p in range(len(password)):
-            if password[p] in letters:
-                l+=1
+        for chars, minimum in classes:
+            if minimum and not set(chars) & set(allowed):
+                raise ValueError(f"the policy requires characters of {chars[:10]}... but allows none of them")
 
-            
-            
-            elif password[p] in numbers:
-                n+=1
+        self.min_length = min_length
+        self._allowed = str.maketrans("", "", allowed)
+        self._rules = [(str.maketrans("", "", chars), minimum) for chars, minimum in classes if minimum]
 
-            
+    def invalid(self, password):
+        '''
+         Returns the characters of the password that the policy doesn't allow.
+        '''
+        return password.translate(self._allowed)
+
+    def verify(self, password):
+        if len(password) < self.min_length or self.invalid(password):
+            return False
+
+        size = len(password)
 
-            else: 
-                print(f"invalid character: {password[p]}")
+        for table, minimum in self._rules:
+            if size - len(password.translate(table)) < minimum:
                 return False
 
-        
-        if l>=6 and n>=2: 
-            return True
-        
-        else:
+        return True
+
+    def verify_many(self, passwords):
+        '''
+         Checks a batch of passwords, e.g. a chunk of an user import.
+
+         @return A list of booleans in the same order as passwords.
+        '''
+        return [isinstance(password, str) and self.verify(password) for password in passwords]
+
+
+class Password:
+    # bcrypt work factor used for new hashes, existing hashes keep the one they were made with
+    ROUNDS = 12
+    policy = Policy()
+
+    def req_verify(password):
+        '''the conditions to make a password are set by Password.policy, by default:
+            - at least 8 characters, only lowercase letters and numbers, where two must be numbers
+        '''
+
+        invalid = Password.policy.invalid(password)
+
+        if invalid:
+            print(f"invalid character: {invalid[0]}")
             return False
 
+        return Password.policy.verify(password)
+
 
     def hash(password):
 
         if Password.req_verify(password):
             try:
                 
-                salt = bc.gensalt()
+                salt = bc.gensalt(rounds=Password.ROUNDS)
                 hashed_pw = bc.hashpw(password.encode(), salt)
 
                 return hashed_pw.decode(), salt.decode()
@@ -60,3 +102,12 @@ class Password:
             except Exception as e:
                 return e
 
+    def check(password, hashed):
+        '''
+         Checks a password against a stored hash with bcrypt.checkpw, which reads the salt and work factor from the hash.
+        '''
+        try:
+            return bc.checkpw(password.encode(), hashed.encode())
+
+        except ValueError:
+            return False
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import time
+
+
+def scratch():
+    '''
+     Points database.config at a new temporary directory, so a benchmark never touches the till's databases.
+
+     Must run before anything imports database.config, i.e. before the controllers.
+
+     @return The directory.
+    '''
+    directory = tempfile.mkdtemp(prefix="pos-bench-")
+    os.environ["POS_DB_DIR"] = directory
+    os.environ["POS_DB_LAYOUT"] = "split"
+    os.environ["POS_DB_BACKEND"] = "sqlite"
+
+    return directory
+
+
+def clock(function, *args):
+    '''
+     @return A tuple (result of function, seconds it took).
+    '''
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+
+def report(label, count, seconds, unit="ops"):
+    '''
+     Prints one line of results: the rate, the time per operation and the total time.
+    '''
+    print(f"{label:<36} {count / seconds:>12,.1f} {unit}/s {seconds / count * 1e6:>12,.1f} us each"
+          f" {seconds * 1000:>10,.1f} ms for {count:,}")
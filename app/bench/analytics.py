@@ -0,0 +1,103 @@
+import argparse
+import random
+
+from bench import clock, report, scratch
+
+
+def history(conn, lines, items, days, seed=7):
+    '''
+     Fills the sales tables with about lines sale lines spread over days, straight through SQL.
+
+     @return A tuple (start, end) of unix timestamps covering the sales.
+    '''
+    rng = random.Random(seed)
+    start = 1_700_000_000
+    end = start + days * 86400
+    sales = lines // 8
+
+    with conn:
+        conn.executemany("INSERT INTO sales (id, created_at, total_cents) VALUES (?,?,0)",
+                         ((sale_id, start + sale_id * (end - start) // (sales + 1)) for sale_id in range(1, sales + 1)))
+        conn.executemany("INSERT INTO sale_lines (sale_id, item_id, quantity, unit_cents) VALUES (?,?,?,?)",
+                         ((n // 8 + 1, rng.randint(1, items), rng.randint(1, 3), rng.randint(100, 5000))
+                          for n in range(sales * 8)))
+
+    return start, end
+
+
+def grouped(conn, start, end):
+    '''
+     The same reports as SQL GROUP BYs, per item and per day.
+    '''
+    by_item = conn.execute('''SELECT l.item_id, SUM(l.quantity), SUM(l.quantity * l.unit_cents)
+                              FROM sales s JOIN sale_lines l ON l.sale_id = s.id
+                              WHERE s.created_at >= ? AND s.created_at < ?
+                              GROUP BY l.item_id ORDER BY 3 DESC''', (start, end)).fetchall()
+    by_day = conn.execute('''SELECT CAST(s.created_at / 86400 AS INTEGER), SUM(l.quantity * l.unit_cents)
+                             FROM sales s JOIN sale_lines l ON l.sale_id = s.id
+                             WHERE s.created_at >= ? AND s.created_at < ?
+                             GROUP BY 1 ORDER BY 1''', (start, end)).fetchall()
+
+    return by_item[:10], by_day
+
+
+def looped(conn, start, end):
+    '''
+     The same reports summed row by row in Python.
+    '''
+    by_item, by_day = {}, {}
+
+    for item_id, quantity, cents, created_at in conn.execute('''SELECT l.item_id, l.quantity, l.quantity * l.unit_cents, s.created_at
+                                                                FROM sales s JOIN sale_lines l ON l.sale_id = s.id
+                                                                WHERE s.created_at >= ? AND s.created_at < ?''', (start, end)):
+        sold = by_item.setdefault(item_id, [0, 0])
+        sold[0] += quantity
+        sold[1] += cents
+        day = int(created_at // 86400)
+        by_day[day] = by_day.get(day, 0) + cents
+
+    return sorted(by_item.items(), key=lambda pair: -pair[1][1])[:10], sorted(by_day.items())
+
+
+def main(lines, items, days):
+    scratch()
+
+    from database.connection import conn
+    from database.create import create_all
+    from inventory.controller.items_controller import Items
+    from reports.analytics import Analytics
+
+    create_all()
+    connection = conn(Items.DB)
+    start, end = history(connection, lines, items, days)
+    print(f"{lines:,} sale lines over {days} days, {items:,} items")
+
+    data, seconds = clock(Analytics.load, start, end)
+    report("Analytics.load", len(data), seconds, "lines")
+
+    def reports(data):
+        top = Analytics.top_items(data, 10)
+        _, per_day = Analytics.by_period(data)
+
+        return top, Analytics.moving_average(per_day, 7)
+
+    (top, _), seconds = clock(reports, data)
+    report("NumPy reports on loaded lines", len(data), seconds, "lines")
+
+    (sql_top, _), seconds = clock(grouped, connection, start, end)
+    report("SQL GROUP BY", len(data), seconds, "lines")
+
+    (python_top, _), seconds = clock(looped, connection, start, end)
+    report("Python loop", len(data), seconds, "lines")
+
+    # all three must agree on the best sellers
+    assert [item_id for item_id, _, _ in top] == [item_id for item_id, _, _ in sql_top] == [item_id for item_id, _ in python_top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reports over historical sale lines: NumPy, SQL and a Python loop.")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=5_000)
+    parser.add_argument("--days", type=int, default=365)
+    arguments = parser.parse_args()
+    main(arguments.lines, arguments.items, arguments.days)
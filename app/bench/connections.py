@@ -0,0 +1,77 @@
+import argparse
+import random
+import sqlite3
+import threading
+
+from bench import clock, report, scratch
+
+
+def unpooled(path, ids):
+    '''
+     Lookups the way the controllers did them before the pool: connect, query, close.
+    '''
+    for client_id in ids:
+        connection = sqlite3.connect(path)
+
+        try:
+            connection.execute("SELECT * FROM clients WHERE id = ?", (client_id,)).fetchone()
+
+        finally:
+            connection.close()
+
+
+def pooled(conn, path, ids):
+    for client_id in ids:
+        conn(path).execute("SELECT * FROM clients WHERE id = ?", (client_id,)).fetchone()
+
+
+def threaded(conn, path, ids, threads):
+    '''
+     The same lookups split among short-lived threads, like a server running a thread per request.
+    '''
+    share = len(ids) // threads
+    workers = [threading.Thread(target=pooled, args=(conn, path, ids[index * share:(index + 1) * share]))
+               for index in range(threads)]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+
+def main(clients, lookups, threads):
+    scratch()
+
+    from database.connection import conn, pool
+    from database.create import create_all
+    from clients.controller.client_controller import Client
+
+    create_all()
+
+    with conn(Client.DB) as connection:
+        connection.executemany("INSERT INTO clients (name, cpf, telephone, email) VALUES (?,?,?,?)",
+                               [(f"client {n}", f"{n:011d}", f"11 9{n:08d}", f"c{n}@example.com") for n in range(clients)])
+
+    ids = [random.randint(1, clients) for _ in range(lookups)]
+
+    _, seconds = clock(unpooled, Client.DB, ids)
+    report("connect/close per lookup", lookups, seconds)
+
+    _, seconds = clock(pooled, conn, Client.DB, ids)
+    report("pooled connection", lookups, seconds)
+
+    # the main thread keeps its own connections, create_all and the lookups above opened them
+    before = pool.opened()
+    _, seconds = clock(threaded, conn, Client.DB, ids, threads)
+    report(f"pooled, {threads} short-lived threads", lookups, seconds)
+    print(f"connections of ended threads left open: {pool.opened() - before}, main thread's: {before}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Primary key lookups with and without the connection pool.")
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=200)
+    arguments = parser.parse_args()
+    main(arguments.clients, arguments.lookups, arguments.threads)
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import os
+import time
+
+from bench import clock, report, scratch
+
+
+async def heartbeat(stop, interval=0.005):
+    '''
+     Ticks on the event loop until stop is set.
+
+     @return The longest gap between two ticks in seconds, how long other tills' requests would have waited.
+    '''
+    worst = 0
+    last = time.perf_counter()
+
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+
+    return worst
+
+
+async def on_loop(login, credentials):
+    '''
+     Runs the logins from the event loop while it keeps ticking.
+
+     @return The longest stall of the loop in seconds.
+    '''
+    stop = asyncio.Event()
+    ticks = asyncio.create_task(heartbeat(stop))
+    await asyncio.sleep(0)
+    await login(credentials)
+    stop.set()
+
+    return await ticks
+
+
+def main(users, rounds):
+    scratch()
+
+    from authentication.password import Password
+    from authentication.login import Auth
+    from database.create import create_all
+    from users.controller.user_controller import User
+
+    create_all()
+    Password.ROUNDS = rounds
+    credentials = [(f"cashier{n}", f"shiftchange{n:02d}") for n in range(users)]
+
+    for username, password in credentials:
+        User.create(username, username, password, 1)
+
+    workers = Auth.executor._max_workers
+    print(f"{os.cpu_count()} cores, {workers} bcrypt workers, work factor {rounds}, {users} logins per run")
+
+    results, seconds = clock(lambda: [Auth.login(*pair) for pair in credentials])
+    assert all(results)
+    report("serial Auth.login", users, seconds, "logins")
+
+    results, seconds = clock(Auth.login_many, credentials)
+    assert all(results)
+    report("Auth.login_many", users, seconds, "logins")
+
+    async def blocking(pairs):
+        for pair in pairs:
+            Auth.login(*pair)
+
+    async def pooled(pairs):
+        await asyncio.gather(*(Auth.login_async(*pair) for pair in pairs))
+
+    stall, seconds = clock(asyncio.run, on_loop(blocking, credentials))
+    report("Auth.login on the event loop", users, seconds, "logins")
+    print(f"{'':<36} longest loop stall {stall * 1000:,.1f} ms")
+
+    stall, seconds = clock(asyncio.run, on_loop(pooled, credentials))
+    report("Auth.login_async", users, seconds, "logins")
+    print(f"{'':<36} longest loop stall {stall * 1000:,.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Logins per second, serial and on the bcrypt worker pool.")
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=10)
+    arguments = parser.parse_args()
+    main(arguments.users, arguments.rounds)
@@ -0,0 +1,56 @@
+import argparse
+import random
+import string
+import timeit
+
+from bench import report
+
+
+def legacy(password):
+    '''
+     Password.req_verify as it was before the policy, rebuilding its lists on every call.
+    '''
+    letters, numbers = list("abcdefghijklmnopqrstuvwxyz"), list("0123456789")
+    lower = digits = 0
+
+    for char in password:
+        if char in letters:
+            lower += 1
+
+        elif char in numbers:
+            digits += 1
+
+        else:
+            return False
+
+    return lower >= 6 and digits >= 2
+
+
+def main(calls, batch):
+    from authentication.password import Password, Policy
+
+    policy = Password.policy
+    strict = Policy(min_length=10, min_lower=4, min_upper=1, min_digits=2, min_symbols=1)
+    samples = ["abcdefgh12", "abc12", "abcdefghijklmnop1234", "abcdefG12", "Abcdef!123"]
+    alphabet = string.ascii_lowercase + string.digits
+    passwords = ["".join(random.choices(alphabet, k=random.randint(6, 16))) for _ in range(batch)]
+
+    # the policy must refuse and accept exactly what the old rules did
+    assert all(legacy(password) == policy.verify(password) for password in passwords + samples)
+
+    for password in samples[:3]:
+        print(f"{password!r}")
+        report("  old req_verify", calls, timeit.timeit(lambda: legacy(password), number=calls), "calls")
+        report("  Policy.verify", calls, timeit.timeit(lambda: policy.verify(password), number=calls), "calls")
+
+    report("Policy.verify with 5 rules", calls, timeit.timeit(lambda: strict.verify("Abcdef!123"), number=calls), "calls")
+    report(f"old req_verify over {batch:,}", batch, timeit.timeit(lambda: [legacy(p) for p in passwords], number=1), "passwords")
+    report(f"Policy.verify_many over {batch:,}", batch, timeit.timeit(lambda: policy.verify_many(passwords), number=1), "passwords")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost per call of the password rules, old and compiled.")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    arguments = parser.parse_args()
+    main(arguments.calls, arguments.batch)
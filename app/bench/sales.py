@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+
+from bench import clock, report, scratch
+
+
+def baskets(count, items, seed=7):
+    rng = random.Random(seed)
+
+    return [[(rng.randint(1, items), rng.randint(1, 3), rng.randint(100, 5000)) for _ in range(rng.randint(1, 15))]
+            for _ in range(count)]
+
+
+def per_line(conn, sales):
+    '''
+     Sales written the way they would be without Sales.record: a commit for the header and one per line.
+
+     It only writes the sale and the stock, not the totals and rollups Sales.record keeps, nor atomically.
+    '''
+    for lines in sales:
+        total = sum(quantity * cents for _, quantity, cents in lines)
+
+        with conn:
+            sale_id = conn.execute("INSERT INTO sales (created_at, total_cents) VALUES (?,?)", (time.time(), total)).lastrowid
+
+        for item_id, quantity, cents in lines:
+            with conn:
+                conn.execute("INSERT INTO sale_lines (sale_id, item_id, quantity, unit_cents) VALUES (?,?,?,?)",
+                             (sale_id, item_id, quantity, cents))
+                conn.execute("UPDATE items SET quantity_in_stock = quantity_in_stock - ? WHERE id = ?", (quantity, item_id))
+
+
+def recorded(record, sales):
+    for lines in sales:
+        sale_id = record(lines)
+        assert isinstance(sale_id, int), sale_id
+
+
+def main(items, count, synchronous):
+    scratch()
+
+    from database.connection import conn
+    from database.create import create_all
+    from inventory.controller.items_controller import Items
+    from sales.controller.sales_controller import Sales
+
+    create_all()
+    connection = conn(Items.DB)
+    # NORMAL is what the pool sets, FULL makes every commit wait for the disk like a till that can't lose a sale
+    connection.execute(f"PRAGMA synchronous={synchronous}")
+
+    with connection:
+        connection.executemany("INSERT INTO items (code, name, manufacturer, quantity_in_stock, value) VALUES (?,?,?,?,?)",
+                               ((f"SKU{n:07d}", f"item {n}", f"maker {n % 500}", 1_000_000, 9.99) for n in range(items)))
+
+    Items.low_stock.load()
+    print(f"{items:,} items, baskets of 1 to 15 lines, synchronous={synchronous}")
+
+    sales = baskets(count, items)
+    _, seconds = clock(per_line, connection, sales)
+    report("a commit per line", count, seconds, "baskets")
+
+    sales = baskets(count, items, seed=8)
+    _, seconds = clock(recorded, Sales.record, sales)
+    report("Sales.record", count, seconds, "baskets")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Baskets rung up per second on one SQLite file.")
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--baskets", type=int, default=2_000)
+    parser.add_argument("--synchronous", choices=("NORMAL", "FULL"), default="NORMAL")
+    arguments = parser.parse_args()
+    main(arguments.items, arguments.baskets, arguments.synchronous)
@@ -0,0 +1,64 @@
+import argparse
+import random
+import timeit
+
+from bench import clock, report, scratch
+
+WORDS = ["pilão", "café", "açúcar", "feijão", "arroz", "leite", "pão", "queijo", "manteiga", "sabão",
+         "detergente", "biscoito", "macarrão", "farinha", "óleo", "sal", "vinagre", "azeite", "molho", "tempero"]
+SIZES = ["pequeno", "médio", "grande", "1kg", "500g", "2l", "integral", "light", "tradicional", "extra"]
+
+
+def catalogue(conn, items, seed=7):
+    '''
+     Fills items with names made of a few common words, like a supermarket's catalogue.
+    '''
+    rng = random.Random(seed)
+
+    with conn:
+        conn.executemany("INSERT INTO items (code, name, manufacturer, quantity_in_stock, value) VALUES (?,?,?,?,?)",
+                         ((f"SKU{n:07d}", f"{rng.choice(WORDS).capitalize()} {rng.choice(SIZES)} {n}", f"maker {n % 2000}", 100, 9.99)
+                          for n in range(items)))
+
+
+def scan(conn, text, limit=20):
+    '''
+     Search the way it was done before the indexes: LIKE over every row.
+    '''
+    pattern = f"%{text}%"
+
+    return conn.execute("SELECT * FROM items WHERE name LIKE ? OR manufacturer LIKE ? LIMIT ?", (pattern, pattern, limit)).fetchall()
+
+
+def main(items, calls):
+    scratch()
+
+    from database.connection import conn
+    from database.create import create_all
+    from inventory.controller.items_controller import Items
+
+    create_all()
+    connection = conn(Items.DB)
+    _, seconds = clock(catalogue, connection, items)
+    print(f"{items:,} items, indexed in {seconds:,.1f} s")
+
+    queries = [("prefix", "manteig integ"), ("diacritics", "pilao"), ("substring", "ijo"),
+               ("vague word", "light"), ("one item", f"{items - 1}")]
+
+    for label, text in queries:
+        found = Items.search(text)
+        assert isinstance(found, list) and found, (text, found)
+        report(f"Items.search, {label}", calls, timeit.timeit(lambda: Items.search(text), number=calls), "queries")
+
+    # LIKE does not fold diacritics, so only the plain queries have a comparison; it stops at the
+    # first 20 rows it meets unranked, which is cheap for a common word and a full scan for a rare one
+    for label, text in [("substring", "ijo"), ("one item", f"{items - 1}")]:
+        report(f"LIKE scan, {label}", calls, timeit.timeit(lambda: scan(connection, text), number=calls), "queries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Items.search latency on a large catalogue.")
+    parser.add_argument("--items", type=int, default=500_000)
+    parser.add_argument("--calls", type=int, default=50)
+    arguments = parser.parse_args()
+    main(arguments.items, arguments.calls)
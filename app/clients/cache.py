@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecentClients:
+    '''
+     Small LRU of the clients served lately, by id and by cpf.
+
+     A client identified at the counter is usually looked up again a few
+     seconds later when the sale is closed, this keeps that second read off
+     the database. Entries expire after ttl seconds, so a change made by
+     another till or process shows up at most that late.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._cpfs = {}
+        self._lock = threading.Lock()
+
+    def get(self, client_id=None, cpf=None):
+        with self._lock:
+            if client_id is None:
+                client_id = self._cpfs.get(cpf)
+
+            entry = self._rows.get(client_id)
+
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._drop(client_id)
+
+                self.misses += 1
+                return None
+
+            self._rows.move_to_end(client_id)
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, row):
+        with self._lock:
+            self._drop(row.id)
+            self._rows[row.id] = (row, time.monotonic() + self.ttl)
+            self._cpfs[row.cpf] = row.id
+
+            while len(self._rows) > self.maxsize:
+                _, (evicted, _) = self._rows.popitem(last=False)
+                self._cpfs.pop(evicted.cpf, None)
+
+    def invalidate(self, client_id=None, cpf=None):
+        with self._lock:
+            self._drop(self._cpfs.get(cpf) if client_id is None else client_id)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._cpfs.clear()
+
+    def _drop(self, client_id):
+        entry = self._rows.pop(client_id, None)
+
+        if entry is not None:
+            self._cpfs.pop(entry[0].cpf, None)
@@ -1,9 +1,18 @@
 import sqlite3
-from database.connection import conn as c
+from database.connection import conn as c, digits as only_digits
+from database.queries import update_query, bulk_update, paginate
+from database import bulk, config
+from database.rows import ClientRow, cursor as row_cursor
+from clients.cache import RecentClients
 
 
 class Client:
-    DB = "app/database/clients.db"
+    DB = config.path("clients")
+    COLUMNS = ("name", "cpf", "address", "telephone", "email")
+    SELECT = "SELECT id, name, cpf, address, telephone, email FROM clients"
+    # indexed columns Client.list can sort on
+    ORDER_BY = ("id", "name", "cpf")
+    recent = RecentClients()
 
     def __init__(self, name, cpf, address, telephone, email):
         """
@@ -48,54 +57,171 @@ class Client:
         try:
             conn = c(Client.DB)
             cursor = conn.cursor()
-            cursor.execute(query, (name, cpf, address, telephone, email,))
-            conn.commit()
+            with conn:
+                cursor.execute(query, (name, cpf, address, telephone, email,))
+        except sqlite3.Error as e:
+            print(e)
+
+    @staticmethod
+    def validate(row):
+        """
+         Turns an imported row into the values of Client.COLUMNS. Raises ValueError when name or cpf are missing
+        """
+        if not row.get("name") or not row.get("cpf"):
+            raise ValueError("name and cpf are required")
+
+        return (row["name"], str(row["cpf"]), row.get("address") or None, row.get("telephone") or None, row.get("email") or None)
+
+    @staticmethod
+    def import_file(path, batch_size=bulk.BATCH_SIZE):
+        """
+         Loads clients from a CSV or JSON Lines file in chunked transactions
+
+         @param path - The file to import
+         @param batch_size - Rows per transaction
+
+         @return A tuple ( loaded rejected ) as returned by database. bulk. load
+        """
+        try:
+            return bulk.load(c(Client.DB), "clients", Client.COLUMNS, bulk.read_rows(path), Client.validate, batch_size)
+
+        except sqlite3.Error as e:
+            print(e)
+
+    @staticmethod
+    def export_file(path, batch_size=bulk.BATCH_SIZE):
+        """
+         Streams the clients table into a CSV file
+
+         @param path - The destination file
+         @param batch_size - Rows fetched per round trip
+
+         @return The number of clients written
+        """
+        columns = ("id",) + Client.COLUMNS
+
+        try:
+            return bulk.export_csv(path, columns, bulk.export(c(Client.DB), "clients", columns, batch_size))
+
         except sqlite3.Error as e:
             print(e)
-        finally:
-            conn.close()
 
     @staticmethod
     def read(client_id=None, cpf=None):
         """
-         Read a client from the database. This is a wrapper around the SQLAlchemy read function to avoid SQL injection attacks
+         Read a client from the database by id or cpf. Clients served lately come from Client.recent
          
          @param client_id - The client id to read
          @param cpf - The CPF to read ( optional )
          
-         @return A list of client data ( tuples in the form ( id cpf ) if client_id is None
+         @return The ClientRow matching the id or the cpf or None if there is no such client
         """
-        # Return a list of clients that have been connected to the database.
+        row = Client.recent.get(client_id=client_id, cpf=cpf)
+
+        if row is not None:
+            return row
+
+        # Return the client with the given id, otherwise the one with the given cpf.
         if client_id is not None:
-            query = '''
-                    SELECT * FROM clients WHERE id=?
-                    '''
-            try:
-                conn = c(Client.DB)
-                cursor = conn.cursor()
-                cursor.execute(query, (client_id,))
-                result = cursor.fetchall()
-                return result
-            except sqlite3.Error as e:
-                print(e)
-            finally:
-                conn.close()
+            query, key = Client.SELECT + " WHERE id=?", client_id
+
+        elif cpf is not None:
+            query, key = Client.SELECT + " WHERE cpf=?", cpf
+
+        else:
+            return None
+
+        try:
+            row = row_cursor(c(Client.DB), ClientRow).execute(query, (key,)).fetchone()
 
-        # Return the list of clients that have the specified cpf.
+        except sqlite3.Error as e:
+            print(e)
+            return None
+
+        if row is not None:
+            Client.recent.put(row)
+
+        return row
+
+    @staticmethod
+    def search(cpf=None, phone=None, email=None, limit=20, after=None):
+        """
+         Search clients by the beginning of their CPF, phone or email, one of them per call. Punctuation in CPF and phone and the case of the email are ignored
+
+         Results come in pages ordered by the searched field, pass the returned cursor as after to get the next page
+
+         @param cpf - Beginning of the CPF
+         @param phone - Beginning of the telephone
+         @param email - Beginning of the email
+         @param limit - Clients per page
+         @param after - Cursor returned with the previous page
+
+         @return A tuple ( clients next ) where next is None on the last page
+        """
         if cpf is not None:
-            query = '''
-                    SELECT * FROM clients WHERE cpf=?
-                    '''
-            try:
-                conn = c(Client.DB)
-                cursor = conn.cursor()
-                cursor.execute(query, (cpf,))
-                result = cursor.fetchall()
-                return result
-            except sqlite3.Error as e:
-                print(e)
-            finally:
-                conn.close()
+            column, prefix = "cpf_digits", Client.digits(cpf)
+
+        elif phone is not None:
+            column, prefix = "phone_digits", Client.digits(phone)
+
+        elif email is not None:
+            column, prefix = "email_lower", email.strip().lower()
+
+        else:
+            return [], None
+
+        # nothing left to search for, e.g. a CPF typed without digits, rather than every client
+        if not prefix:
+            return [], None
+
+        # every string starting with prefix sorts between prefix and prefix with its last character bumped
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        query = f"SELECT id, name, cpf, address, telephone, email, {column} FROM clients WHERE {column} >= ? AND {column} < ?"
+        params = [prefix, upper]
+
+        if after is not None:
+            query += f" AND ({column}, id) > (?, ?)"
+            params += list(after)
+
+        query += f" ORDER BY {column}, id LIMIT ?"
+        params.append(limit)
+
+        try:
+            rows = c(Client.DB).execute(query, params).fetchall()
+
+        except sqlite3.Error as e:
+            print(e)
+            return [], None
+
+        clients = [ClientRow(*row[:6]) for row in rows]
+        after = (rows[-1][6], rows[-1][0]) if len(rows) == limit else None
+
+        return clients, after
+
+    @staticmethod
+    def list(order_by="id", after=None, limit=None, page_size=bulk.BATCH_SIZE):
+        """
+         List clients page by page, sorted by one of Client.ORDER_BY
+
+         Pass (order_by value, id) of the last client seen as after to continue from it
+
+         @param order_by - Column to sort on
+         @param after - Cursor of the last client already seen
+         @param limit - Maximum number of clients, None for all of them
+         @param page_size - Clients read per query
+
+         @return A generator of ClientRow or the exception raised
+        """
+        try:
+            return paginate(c(Client.DB), "clients", ClientRow.__slots__, Client.ORDER_BY, (),
+                            order_by, None, after, limit, page_size, ClientRow)
+
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def digits(text):
+        return only_digits(text)
 
     @staticmethod
     def update(client_id, name=None, cpf=None, address=None, telephone=None, email=None):
@@ -108,60 +234,51 @@ class Client:
          @param address - The new address of the client ( optional )
          @param telephone - The new telephone number of the client ( optional )
          @param email - The new email address of the client ( optional )
+
+         @return True if the client was changed False if there is no client with that id
         """
+        fields = {"name": name, "cpf": cpf, "address": address, "telephone": telephone, "email": email}
+        built = update_query("clients", Client.COLUMNS, fields)
+
+        # Nothing to update
+        if built is None:
+            return
+
+        query, columns = built
+
         try:
             conn = c(Client.DB)
-            cursor = conn.cursor()
 
-            # Update the name of the client
-            if name is not None:
-                query = '''
-                        UPDATE clients SET name=? WHERE client_id=?
-                        '''
-                cursor.execute(query, (name, client_id,))
-                conn.commit()
-                print("successful")
+            with conn:
+                changed = conn.execute(query, tuple(fields[column] for column in columns) + (client_id,)).rowcount
 
-            # Update the client s cpf.
-            if cpf is not None:
-                query = '''
-                        UPDATE clients SET cpf=? WHERE client_id=?
-                        '''
-                cursor.execute(query, (cpf, client_id,))
-                conn.commit()
-                print("successful")
+            Client.recent.invalidate(client_id=client_id)
 
-            # update address of the client
-            if address is not None:
-                query = '''
-                        UPDATE clients SET address=? WHERE client_id=?
-                        '''
-                cursor.execute(query, (address, client_id,))
-                conn.commit()
+            if changed:
                 print("successful")
 
-            # update the telephone of the client
-            if telephone is not None:
-                query = '''
-                        UPDATE clients SET telephone=? WHERE client_id=?
-                        '''
-                cursor.execute(query, (telephone, client_id,))
-                conn.commit()
-                print("successful")
+            return changed > 0
 
-            # update the email of the client
-            if email is not None:
-                query = '''
-                        UPDATE clients SET email=? WHERE client_id=?
-                        '''
-                cursor.execute(query, (email, client_id,))
-                conn.commit()
-                print("successful")
+        except sqlite3.Error as e:
+            print(e)
+
+    @staticmethod
+    def bulk_update(updates):
+        """
+         Update many clients in a single transaction. Updates that change the same fields are sent together with executemany
+
+         @param updates - Iterable of ( client_id fields ) pairs where fields maps column names to new values
+
+         @return The number of clients changed
+        """
+        try:
+            changed = bulk_update(c(Client.DB), "clients", Client.COLUMNS, updates)
+            Client.recent.clear()
+
+            return changed
 
         except sqlite3.Error as e:
             print(e)
-        finally:
-            conn.close()
 
     @staticmethod
     def delete(client_id=None, cpf=None):
@@ -181,13 +298,12 @@ class Client:
             try:
                 conn = c(Client.DB)
                 cursor = conn.cursor()
-                cursor.execute(query, (client_id,))
-                conn.commit()
-                return True
+                with conn:
+                    cursor.execute(query, (client_id,))
+                Client.recent.invalidate(client_id=client_id)
+                return cursor.rowcount > 0
             except sqlite3.Error as e:
                 print(e)
-            finally:
-                conn.close()
 
         # Delete the client from the database.
         if cpf is not None:
@@ -197,10 +313,9 @@ class Client:
             try:
                 conn = c(Client.DB)
                 cursor = conn.cursor()
-                cursor.execute(query, (cpf,))
-                conn.commit()
-                return True
+                with conn:
+                    cursor.execute(query, (cpf,))
+                Client.recent.invalidate(cpf=cpf)
+                return cursor.rowcount > 0
             except sqlite3.Error as e:
-                print(e)
-            finally:
-                conn.close()
\ No newline at end of file
+                print(e)
\ No newline at end of file
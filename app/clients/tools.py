@@ -38,8 +38,6 @@ class Tools:
         except Exception as e:
             return e
 
-        finally:
-            conn.close()
 
 
     def create(name, cpf, address, telephone, email):
@@ -74,14 +72,12 @@ class Tools:
          @return None on success error message on failure. Example :. import fabtools >>> fabtools. read ('abc '
         """
         
-        # Return the client s contents.
-        if Tools.exists(client_id=client_id, cpf=cpf) is not None:
-        
-            try:
-                return clc.read(client_id=client_id, cpf=cpf)
-            
-            except Exception as e:
-                return e
+        # Return the client s contents, None if there is no such client.
+        try:
+            return clc.read(client_id=client_id, cpf=cpf) or None
+
+        except Exception as e:
+            return e
         
 
     def update(client_id=None, name=None, cpf=None, address=None, telephone=None, email=None):
@@ -98,21 +94,22 @@ class Tools:
         @return None if successful error message if not successful Example :. from iota import Costumer costumer = Costumer. update ( client_id = 1234
         """
 
+        try:
+            changed = clc.update(client_id=client_id, name=name, cpf=cpf,address=address, telephone=telephone, email=email)
+
+        except Exception as e:
+            return e
+
         # Costumer doesn t exist.
-        if Tools.exists(client_id=client_id, cpf=cpf) is not None:
-            try:
-                return clc.update(client_id=client_id, name=name, cpf=cpf,address=address, telephone=telephone, email=email)
-            
-            except Exception as e:
-                return e
-
-        else: 
+        if changed is False:
             return "Costumer doesn't exists"
+
+        return changed
         
     
     def delete(client_id=None, cpf=None):
         """
-        Deletes a client from CLC. This is a wrapper for clc. delete that checks if the client exists before deleting it.
+        Deletes a client from CLC. This is a wrapper for clc. delete that reports when no client was deleted.
         
         @param client_id - The client to delete. If you don't specify a client_id the function will delete the first client with that id.
         @param cpf - The CPF of the client to delete.
@@ -121,8 +118,8 @@ class Tools:
         """
 
         # Delete client from the cluster.
-        if Tools.exists(client_id=client_id, cpf=cpf) is not None:
-            return clc.delete(client_id=client_id, cpf=cpf)
-        
-        else: 
+        if clc.delete(client_id=client_id, cpf=cpf):
+            return True
+
+        else:
             return "client doesn't exists"
\ No newline at end of file
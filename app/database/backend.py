@@ -0,0 +1,330 @@
+import re
+import sqlite3
+import threading
+import weakref
+
+
+# Tables of the server schema, same columns in the same order as the SQLite migrations so the row classes fit both.
+# Only users, clients and items are here: Items.search (FTS5), sales and their rollups, the journal, the change log
+# and replication still need SQLite.
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+            id BIGSERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            perm_level INTEGER NOT NULL
+        )''',
+    "CREATE INDEX IF NOT EXISTS users_name ON users (name, id)",
+    "CREATE INDEX IF NOT EXISTS users_perm_level ON users (perm_level, id)",
+    '''CREATE TABLE IF NOT EXISTS clients (
+            id BIGSERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            cpf TEXT NOT NULL UNIQUE,
+            address TEXT,
+            telephone TEXT,
+            email TEXT,
+            -- byte order like SQLite, so the prefix ranges of Client.search can use the indexes
+            cpf_digits TEXT COLLATE "C" GENERATED ALWAYS AS (regexp_replace(cpf, '[^0-9]', '', 'g')) STORED,
+            phone_digits TEXT COLLATE "C" GENERATED ALWAYS AS (regexp_replace(telephone, '[^0-9]', '', 'g')) STORED,
+            email_lower TEXT COLLATE "C" GENERATED ALWAYS AS (lower(trim(email))) STORED
+        )''',
+    "CREATE INDEX IF NOT EXISTS clients_name ON clients (name, id)",
+    "CREATE INDEX IF NOT EXISTS clients_cpf_digits ON clients (cpf_digits, id)",
+    "CREATE INDEX IF NOT EXISTS clients_phone_digits ON clients (phone_digits, id)",
+    "CREATE INDEX IF NOT EXISTS clients_email_lower ON clients (email_lower, id)",
+    '''CREATE TABLE IF NOT EXISTS items (
+            id BIGSERIAL PRIMARY KEY,
+            code TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            manufacturer TEXT,
+            barcode TEXT UNIQUE,
+            quantity_in_stock INTEGER NOT NULL DEFAULT 0,
+            value DOUBLE PRECISION NOT NULL,
+            reorder_point INTEGER NOT NULL DEFAULT 0
+        )''',
+    "CREATE INDEX IF NOT EXISTS items_name ON items (name, id)",
+    "CREATE INDEX IF NOT EXISTS items_manufacturer ON items (manufacturer, id)",
+    "CREATE INDEX IF NOT EXISTS items_low_stock ON items (id) WHERE quantity_in_stock <= reorder_point",
+)
+
+# tables whose INSERTs report the new id through lastrowid
+SERIAL = ("users", "clients", "items", "sales", "sale_lines")
+
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def placeholders(query):
+    '''
+     Turns the qmark parameters of the controllers' queries into the format style of server drivers.
+
+     Question marks inside string literals are left alone. Percent signs are
+     doubled everywhere, literals included, as the driver reads them anywhere
+     in a query sent with parameters.
+    '''
+    parts = re.split(r"('(?:[^']|'')*')", query.replace("%", "%%"))
+
+    for index in range(0, len(parts), 2):
+        parts[index] = parts[index].replace("?", "%s")
+
+    return "".join(parts)
+
+
+def translated(error):
+    '''
+     Re-raises a server driver error as the sqlite3 class of the same DB-API name,
+     so the controllers' except sqlite3.Error clauses work on both backends.
+    '''
+    for cls in type(error).__mro__:
+        same = getattr(sqlite3, cls.__name__, None)
+
+        if isinstance(same, type) and issubclass(same, sqlite3.Error):
+            return same(str(error))
+
+    return sqlite3.DatabaseError(str(error))
+
+
+class ServerCursor:
+    '''
+     DB-API cursor of a server connection with the parts of the sqlite3 cursor the controllers use:
+     qmark parameters, lastrowid and a row_factory(cursor, row).
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.raw.cursor()
+        self.row_factory = None
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def execute(self, query, params=()):
+        query, returning = self.connection.prepare(query)
+
+        try:
+            self.cursor.execute(query, tuple(params))
+
+            if returning:
+                self.lastrowid = self.cursor.fetchone()[0]
+
+        except self.connection.driver.Error as e:
+            raise translated(e) from e
+
+        return self
+
+    def executemany(self, query, params):
+        query, _ = self.connection.prepare(query, many=True)
+
+        try:
+            self.cursor.executemany(query, [tuple(row) for row in params])
+
+        except self.connection.driver.Error as e:
+            raise translated(e) from e
+
+        return self
+
+    def _make(self, row):
+        return row if row is None or self.row_factory is None else self.row_factory(self, row)
+
+    def fetchone(self):
+        return self._make(self.cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._make(row) for row in self.cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._make(row) for row in self.cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self.cursor.close()
+
+
+class ServerConnection:
+    '''
+     Server connection behaving like a sqlite3 connection for the controllers.
+
+     The driver runs in autocommit and transactions are opened the way sqlite3
+     does it: before the first INSERT, UPDATE or DELETE, or on an explicit BEGIN,
+     and closed by commit, rollback or leaving a with block. Reads outside a
+     transaction never leave the server session idle in a transaction.
+    '''
+
+    def __init__(self, driver, raw):
+        self.driver = driver
+        self.raw = raw
+        self.in_transaction = False
+
+    def prepare(self, query, many=False):
+        '''
+         @return A tuple (query for the driver, whether it returns the new id).
+        '''
+        head = query.lstrip()[:7].upper()
+
+        if head.startswith("BEGIN"):
+            # SQLite's BEGIN IMMEDIATE takes the write lock up front, row locks make that unneeded here
+            query = "BEGIN"
+            self.in_transaction = True
+
+        elif head.startswith(WRITES) and not self.in_transaction:
+            self.raw.execute("BEGIN")
+            self.in_transaction = True
+
+        returning = False
+        match = re.match(r"\s*INSERT\s+INTO\s+(\w+)", query, re.IGNORECASE)
+
+        if not many and match and match.group(1).lower() in SERIAL and "RETURNING" not in query.upper():
+            query, returning = f"{query.rstrip().rstrip(';')} RETURNING id", True
+
+        return placeholders(query), returning
+
+    def cursor(self):
+        return ServerCursor(self)
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, params):
+        return self.cursor().executemany(query, params)
+
+    def commit(self):
+        if self.in_transaction:
+            self.in_transaction = False
+            self.raw.execute("COMMIT")
+
+    def rollback(self):
+        if self.in_transaction:
+            self.in_transaction = False
+            self.raw.execute("ROLLBACK")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.commit()
+
+        else:
+            self.rollback()
+
+        return False
+
+    def close(self):
+        self.raw.close()
+
+
+class ServerPool:
+    '''
+     Pool of server connections with the interface of connection.Pool.
+
+     Every entity lives in the one server database, so the path given to get
+     is ignored. Each thread keeps its connection, and statements are prepared
+     on the server the first time a connection runs them and reused after,
+     through psycopg's prepare_threshold.
+
+     driver is the DB-API module to connect with, psycopg when None; any
+     other must take the same connect arguments, e.g. a stand-in for tests.
+    '''
+
+    def __init__(self, dsn, prepare_threshold=0, driver=None):
+        self.dsn = dsn
+        self.prepare_threshold = prepare_threshold
+        self.driver = driver
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = set()
+        self._generation = 0
+
+    def _open(self):
+        driver = self.driver
+
+        if driver is None:
+            try:
+                import psycopg as driver
+
+            except ImportError:
+                raise ImportError("the postgres backend needs psycopg, pip install psycopg[binary]")
+
+        raw = driver.connect(self.dsn, autocommit=True, prepare_threshold=self.prepare_threshold)
+        connection = ServerConnection(driver, raw)
+
+        with self._lock:
+            self._opened.add(connection)
+
+        return connection
+
+    def _close(self, connections):
+        for connection in connections.values():
+            with self._lock:
+                self._opened.discard(connection)
+
+            try:
+                connection.close()
+
+            except Exception:
+                pass
+
+        connections.clear()
+
+    def get(self, database=None):
+        owner = getattr(self._local, "owner", None)
+
+        if owner is not None and (owner.generation != self._generation or owner.connections[self.dsn].raw.closed):
+            owner.release()
+            owner = None
+
+        if owner is None:
+            # closed with the thread, like the sqlite connections of connection.Pool
+            connection = self._open()
+            owner = self._local.owner = Owner(self)
+            owner.connections[self.dsn] = connection
+
+        return owner.connections[self.dsn]
+
+    def opened(self):
+        with self._lock:
+            return len(self._opened)
+
+    def close_all(self):
+        '''
+         Closes the calling thread's connection now and the other threads' the next time they ask for one.
+        '''
+        with self._lock:
+            self._generation += 1
+
+        owner = getattr(self._local, "owner", None)
+
+        if owner is not None:
+            owner.release()
+            self._local.owner = None
+
+
+class Owner:
+    '''
+     Connections of one thread, kept in a pool's thread local and closed with
+     pool._close once the thread is gone or pool.close_all was called.
+    '''
+
+    def __init__(self, pool):
+        self.connections = {}
+        self.generation = pool._generation
+        # the callback holds the dictionary, not the owner, so it runs when the thread local drops the owner
+        self.release = weakref.finalize(self, pool._close, self.connections)
+
+
+def create_schema(connection):
+    '''
+     Creates the server tables of users, clients and items.
+    '''
+    with connection:
+        for statement in SCHEMA:
+            connection.execute(statement)
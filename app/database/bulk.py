@@ -0,0 +1,168 @@
+import csv
+import json
+import sqlite3
+from itertools import islice
+
+from database import rows
+
+
+BATCH_SIZE = 1000
+
+
+def read_csv(path):
+    '''
+     Streams the rows of a CSV file with a header line as dictionaries.
+
+     @param path - Path to the CSV file.
+    '''
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl(path):
+    '''
+     Streams the objects of a JSON Lines file, skipping blank lines.
+
+     @param path - Path to the .jsonl file.
+    '''
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_rows(path):
+    '''
+     Picks the reader from the file extension, CSV unless it is .jsonl/.ndjson.
+
+     @param path - Path to the file to read.
+    '''
+    if str(path).endswith((".jsonl", ".ndjson")):
+        return read_jsonl(path)
+
+    return read_csv(path)
+
+
+def chunks(rows, size):
+    '''
+     Splits an iterable into lists of at most size items without reading it all.
+    '''
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def load(conn, table, columns, rows, validate, batch_size=BATCH_SIZE):
+    '''
+     Inserts rows in chunked executemany transactions.
+
+     Each chunk is committed on its own, so memory stays bounded by batch_size.
+     A chunk hitting a unique constraint, e.g. a code already in the table or
+     twice in the file, is written again one row per transaction so only the
+     offending rows are rejected.
+
+     @param conn - Connection to insert into.
+     @param table - Name of the table.
+     @param columns - Columns to insert, in the order validate returns them.
+     @param rows - Iterable of dictionaries, e.g. from read_rows.
+     @param validate - Callable turning a row into a tuple of values, raising ValueError for bad rows.
+     @param batch_size - Rows per transaction.
+
+     @return A tuple (loaded, rejected) where rejected lists (row number, error message).
+    '''
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    loaded = 0
+    rejected = []
+    number = 0
+
+    for chunk in chunks(rows, batch_size):
+        params = []
+
+        for row in chunk:
+            number += 1
+
+            try:
+                params.append((number, validate(row)))
+
+            except (ValueError, KeyError, TypeError) as e:
+                rejected.append((number, str(e)))
+
+        try:
+            with conn:
+                conn.executemany(query, [values for _, values in params])
+
+            loaded += len(params)
+
+        except sqlite3.IntegrityError:
+            # a duplicate key somewhere in the chunk, insert it row by row to reject only the bad rows
+            for row_number, values in params:
+                try:
+                    with conn:
+                        conn.execute(query, values)
+
+                    loaded += 1
+
+                except sqlite3.IntegrityError as e:
+                    rejected.append((row_number, str(e)))
+
+    rejected.sort()
+
+    return loaded, rejected
+
+
+def export(conn, table, columns, batch_size=BATCH_SIZE, row_type=None):
+    '''
+     Streams a table ordered by id, fetching batch_size rows at a time.
+
+     @param conn - Connection to read from.
+     @param table - Name of the table.
+     @param columns - Columns to select.
+     @param batch_size - Rows fetched per round trip.
+     @param row_type - Optional row class from database.rows, plain tuples otherwise.
+    '''
+    cursor = conn.cursor() if row_type is None else rows.cursor(conn, row_type)
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+
+    return stream(cursor, batch_size)
+
+
+def stream(cursor, batch_size=BATCH_SIZE):
+    '''
+     Yields the rows of an executed cursor, fetching batch_size rows at a time.
+    '''
+    while True:
+        batch = cursor.fetchmany(batch_size)
+
+        if not batch:
+            return
+
+        yield from batch
+
+
+def export_csv(path, columns, rows):
+    '''
+     Writes streamed rows to a CSV file with a header line.
+
+     @param path - Destination file.
+     @param columns - Header names.
+     @param rows - Iterable of row tuples, e.g. from export.
+
+     @return The number of rows written.
+    '''
+    written = 0
+
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+
+    return written
@@ -0,0 +1,35 @@
+import os
+
+
+# Storage layout, read once from the environment:
+#   POS_DB_DIR      directory of the database files, defaults to this package's directory
+#   POS_DB_LAYOUT   "split" keeps users, clients and items in their own files,
+#                   "single" keeps every entity in one file, see database.create.consolidate
+#   POS_DB_BACKEND  "sqlite" or "postgres" to share one server database between tills, see database.backend
+#   POS_DB_DSN      connection string of the server, e.g. "host=10.0.0.2 dbname=pos user=pos"
+DIRECTORY = os.environ.get("POS_DB_DIR", os.path.dirname(os.path.abspath(__file__)))
+LAYOUT = os.environ.get("POS_DB_LAYOUT", "split")
+BACKEND = os.environ.get("POS_DB_BACKEND", "sqlite")
+DSN = os.environ.get("POS_DB_DSN", "")
+
+FILES = {"users": "users.db", "clients": "clients.db", "items": "items.db"}
+SINGLE = "pos.db"
+
+if LAYOUT not in ("split", "single"):
+    raise ValueError(f"POS_DB_LAYOUT must be split or single, not {LAYOUT}")
+
+if BACKEND not in ("sqlite", "postgres"):
+    raise ValueError(f"POS_DB_BACKEND must be sqlite or postgres, not {BACKEND}")
+
+
+def path(entity):
+    '''
+     @param entity - "users", "clients" or "items", sales live with items.
+
+     @return The absolute path of the database holding entity.
+    '''
+    return os.path.join(DIRECTORY, SINGLE if LAYOUT == "single" else FILES[entity])
+
+
+def paths():
+    return {entity: path(entity) for entity in FILES}
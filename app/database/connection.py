@@ -1,14 +1,179 @@
+import os
+import re
 import sqlite3 as sql
+import threading
 
+from database import config
+from database.backend import Owner, ServerPool
+
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+NOT_DIGITS = re.compile("[^0-9]")
+
+
+def digits(text):
+    '''
+     Keeps the digits of a CPF or a phone number. Registered on every sqlite
+     connection as the SQL function digits(), which fills clients.cpf_digits
+     and clients.phone_digits, so stored values and searched prefixes are
+     normalised the same way, as on the server schema of database.backend.
+    '''
+    return None if text is None else NOT_DIGITS.sub("", str(text))
+
+
+class Pool:
+    '''
+     Registry of long-lived sqlite connections keyed by database path.
+
+     Every thread gets its own connection per database, opened once with the
+     tuned pragmas and reused on every call, so the controllers no longer pay
+     a connect/close per query. A thread's connections are closed when the
+     thread ends, so servers running a thread per request don't pile them up.
+    '''
+
+    def __init__(self, cached_statements=256):
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = set()
+        self._generation = 0
+
+    def _open(self, path):
+        connection = sql.connect(path, cached_statements=self.cached_statements, check_same_thread=False)
+
+        for pragma in PRAGMAS:
+            connection.execute(pragma)
+
+        connection.create_function("digits", 1, digits, deterministic=True)
+
+        with self._lock:
+            self._opened.add(connection)
+
+        return connection
+
+    def _close(self, connections):
+        for connection in connections.values():
+            with self._lock:
+                self._opened.discard(connection)
+
+            try:
+                connection.close()
+
+            except sql.Error:
+                pass
+
+        connections.clear()
+
+    def _connections(self):
+        '''
+         @return The current thread's dictionary of path to connection.
+        '''
+        owner = getattr(self._local, "owner", None)
+
+        if owner is not None and owner.generation != self._generation:
+            # close_all ran since this thread last used its connections
+            owner.release()
+            owner = None
+
+        if owner is None:
+            owner = self._local.owner = Owner(self)
+
+        return owner.connections
+
+    def get(self, database):
+        '''
+         Returns the connection of the current thread for the given database, opening it on first use.
+
+         @param database - Path to the sqlite file.
+
+         @return A sqlite3 connection that must not be closed by the caller.
+        '''
+        path = database if database == ":memory:" else os.path.abspath(database)
+        connections = self._connections()
+        connection = connections.get(path)
+
+        if connection is None:
+            connection = connections[path] = self._open(path)
+
+        return connection
+
+    def opened(self):
+        '''
+         @return The number of connections open in all threads.
+        '''
+        with self._lock:
+            return len(self._opened)
+
+    def close_all(self):
+        '''
+         Closes every connection opened by the pool.
+
+         The calling thread's connections are closed now, those of other
+         threads the next time they ask for one or when they end, so a
+         connection is never closed under a thread in the middle of using it.
+        '''
+        with self._lock:
+            self._generation += 1
+
+        owner = getattr(self._local, "owner", None)
+
+        if owner is not None:
+            owner.release()
+            self._local.owner = None
+
+
+# the controllers get their connections here whatever the backend, see database.config
+pool = ServerPool(config.DSN) if config.BACKEND == "postgres" else Pool()
 
 
 def conn(database):
 
     try:
-        
-        conn = sql.connect(database)
-        return conn
-    
-    
-    except Exception as e: 
-        return e
\ No newline at end of file
+
+        return pool.get(database)
+
+
+    except Exception as e:
+        return e
+
+
+def joined(paths=None):
+    '''
+     Returns a connection on which users, clients, items and sales can be joined in one statement.
+
+     It is the pooled connection of the items database, where sales live, with
+     the users and clients files attached to it when they are separate files.
+     Table names are unique across the entities, so the same unqualified SQL
+     runs on the split and the single layout.
+
+     @param paths - Mapping of entity to database path, defaults to database.create.databases().
+    '''
+    if paths is None:
+        from database.create import databases
+        paths = databases()
+
+    connection = pool.get(paths["items"])
+
+    if config.BACKEND != "sqlite":
+        # every entity is in the one server database already
+        return connection
+
+    attached = {row[2] for row in connection.execute("PRAGMA database_list")}
+
+    for entity in ("users", "clients"):
+        path = os.path.abspath(paths[entity])
+
+        if path not in attached:
+            connection.execute(f"ATTACH DATABASE ? AS {entity}_db", (path,))
+            attached.add(path)
+
+    return connection
@@ -0,0 +1,512 @@
+import os
+
+from database import config
+from database.backend import create_schema
+from database.connection import conn as c
+
+
+def change_log(*tables):
+    '''
+     Statements creating the change log of a database, read by integration.feed.
+
+     Every insert, update and delete on the given tables appends (table, id, op)
+     to changes, whose seq only grows. Only ids are logged, the feed reads the
+     current row when it ships the change.
+    '''
+    statements = [
+        '''CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                at REAL NOT NULL
+            )''',
+        '''CREATE TABLE IF NOT EXISTS changes_checkpoint (
+                target TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL
+            )''',
+    ]
+
+    for table in tables:
+        for op, row in (("insert", "new"), ("update", "new"), ("delete", "old")):
+            statements.append(f'''CREATE TRIGGER IF NOT EXISTS {table}_changes_{op} AFTER {op.upper()} ON {table} BEGIN
+                    INSERT INTO changes (entity, row_id, op, at) VALUES ('{table}', {row}.id, '{op}', (julianday('now') - 2440587.5) * 86400.0);
+                END''')
+
+    return statements
+
+
+def normalise_clients():
+    '''
+     Triggers filling the normalised columns of clients searched by Client.search.
+
+     digits() is registered on the pooled connections by database.connection,
+     so clients must be written through them.
+    '''
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS clients_normalise_{op} AFTER {event} ON clients BEGIN
+                UPDATE clients SET cpf_digits = digits(new.cpf), phone_digits = digits(new.telephone), email_lower = lower(trim(new.email))
+                WHERE id = new.id;
+            END'''
+        for op, event in (("insert", "INSERT"), ("update", "UPDATE OF cpf, telephone, email"))
+    ]
+
+
+# Ordered migrations per database, each version is applied once and recorded in PRAGMA user_version
+MIGRATIONS = {
+    "users": [
+        (1, [
+            '''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    salt TEXT NOT NULL,
+                    perm_level INTEGER NOT NULL
+                )''',
+        ]),
+        (2, [
+            "CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users (username)",
+        ]),
+        # sort and filter columns of User.list
+        (3, [
+            "CREATE INDEX IF NOT EXISTS users_name ON users (name)",
+            "CREATE INDEX IF NOT EXISTS users_perm_level ON users (perm_level)",
+        ]),
+        (4, change_log("users")),
+    ],
+    "clients": [
+        (1, [
+            '''CREATE TABLE IF NOT EXISTS clients (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    cpf TEXT NOT NULL,
+                    address TEXT,
+                    telephone TEXT,
+                    email TEXT
+                )''',
+        ]),
+        (2, [
+            # cpf was never unique, keep the first client registered with each one and
+            # move the others to clients_duplicates for someone to merge, see duplicates
+            '''CREATE TABLE IF NOT EXISTS clients_duplicates (
+                    id INTEGER PRIMARY KEY,
+                    kept_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    cpf TEXT NOT NULL,
+                    address TEXT,
+                    telephone TEXT,
+                    email TEXT
+                )''',
+            '''INSERT INTO clients_duplicates (id, kept_id, name, cpf, address, telephone, email)
+                SELECT clients.id, kept.id, clients.name, clients.cpf, clients.address, clients.telephone, clients.email
+                FROM clients JOIN (SELECT cpf, MIN(id) AS id FROM clients GROUP BY cpf) AS kept ON kept.cpf = clients.cpf
+                WHERE clients.id <> kept.id''',
+            "DELETE FROM clients WHERE id IN (SELECT id FROM clients_duplicates)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS clients_cpf ON clients (cpf)",
+        ]),
+        # normalised copies of cpf, telephone and email for prefix search, see Client.search
+        (3, [
+            "ALTER TABLE clients ADD COLUMN cpf_digits TEXT",
+            "ALTER TABLE clients ADD COLUMN phone_digits TEXT",
+            "ALTER TABLE clients ADD COLUMN email_lower TEXT",
+            *normalise_clients(),
+            "UPDATE clients SET cpf = cpf",
+            "CREATE INDEX IF NOT EXISTS clients_cpf_digits ON clients (cpf_digits)",
+            "CREATE INDEX IF NOT EXISTS clients_phone_digits ON clients (phone_digits)",
+            "CREATE INDEX IF NOT EXISTS clients_email_lower ON clients (email_lower)",
+        ]),
+        # sort column of Client.list
+        (4, [
+            "CREATE INDEX IF NOT EXISTS clients_name ON clients (name)",
+        ]),
+        (5, change_log("clients")),
+        # the triggers of version 3 only stripped a few punctuation marks, keep every digit and nothing else like Client.digits
+        (6, [
+            "DROP TRIGGER IF EXISTS clients_normalise_insert",
+            "DROP TRIGGER IF EXISTS clients_normalise_update",
+            *normalise_clients(),
+            '''UPDATE clients SET cpf_digits = digits(cpf), phone_digits = digits(telephone)
+                WHERE cpf_digits IS NOT digits(cpf) OR phone_digits IS NOT digits(telephone)''',
+        ]),
+    ],
+    "items": [
+        (1, [
+            '''CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    code TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    manufacturer TEXT,
+                    barcode TEXT,
+                    quantity_in_stock INTEGER NOT NULL DEFAULT 0,
+                    value REAL NOT NULL
+                )''',
+        ]),
+        (2, [
+            "CREATE UNIQUE INDEX IF NOT EXISTS items_code ON items (code)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS items_barcode ON items (barcode)",
+        ]),
+        # sales share the items file so a sale and its stock decrement commit together
+        (3, [
+            '''CREATE TABLE IF NOT EXISTS sales (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    user_id INTEGER,
+                    client_id INTEGER,
+                    total_cents INTEGER NOT NULL
+                )''',
+            '''CREATE TABLE IF NOT EXISTS sale_lines (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sale_id INTEGER NOT NULL REFERENCES sales (id),
+                    item_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    unit_cents INTEGER NOT NULL
+                )''',
+            "CREATE INDEX IF NOT EXISTS sale_lines_sale ON sale_lines (sale_id)",
+            "CREATE INDEX IF NOT EXISTS sales_created_at ON sales (created_at)",
+        ]),
+        (4, [
+            "ALTER TABLE sales ADD COLUMN shift TEXT",
+            "ALTER TABLE sales ADD COLUMN discount_cents INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE sales ADD COLUMN tax_cents INTEGER NOT NULL DEFAULT 0",
+            '''CREATE TABLE IF NOT EXISTS sales_totals (
+                    period TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    sales INTEGER NOT NULL,
+                    total_cents INTEGER NOT NULL,
+                    discount_cents INTEGER NOT NULL,
+                    tax_cents INTEGER NOT NULL,
+                    PRIMARY KEY (period, key)
+                )''',
+        ]),
+        (5, [
+            '''CREATE TABLE IF NOT EXISTS journal_checkpoint (
+                    name TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL
+                )''',
+        ]),
+        # rollups of reports.rollups, rebuild them with Rollups.rebuild after adding this version to an existing file
+        (6, [
+            '''CREATE TABLE IF NOT EXISTS report_hourly (
+                    hour TEXT PRIMARY KEY,
+                    sales INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    total_cents INTEGER NOT NULL
+                )''',
+            '''CREATE TABLE IF NOT EXISTS report_items (
+                    day TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    total_cents INTEGER NOT NULL,
+                    PRIMARY KEY (day, item_id)
+                )''',
+            '''CREATE TABLE IF NOT EXISTS report_cashiers (
+                    day TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    sales INTEGER NOT NULL,
+                    total_cents INTEGER NOT NULL,
+                    PRIMARY KEY (day, user_id)
+                )''',
+            '''CREATE TABLE IF NOT EXISTS report_clients (
+                    day TEXT NOT NULL,
+                    client_id INTEGER NOT NULL,
+                    sales INTEGER NOT NULL,
+                    total_cents INTEGER NOT NULL,
+                    PRIMARY KEY (day, client_id)
+                )''',
+        ]),
+        (7, [
+            "ALTER TABLE items ADD COLUMN reorder_point INTEGER NOT NULL DEFAULT 0",
+            # partial index holding only the items at or below their reorder point
+            "CREATE INDEX IF NOT EXISTS items_low_stock ON items (id) WHERE quantity_in_stock <= reorder_point",
+            "CREATE INDEX IF NOT EXISTS report_items_item ON report_items (item_id, day)",
+        ]),
+        # full text search over name and manufacturer, kept in sync with items by triggers
+        (8, [
+            '''CREATE VIRTUAL TABLE IF NOT EXISTS items_search USING fts5 (
+                    name, manufacturer, content='items', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                )''',
+            '''CREATE VIRTUAL TABLE IF NOT EXISTS items_trigram USING fts5 (
+                    name, manufacturer, content='items', content_rowid='id', tokenize='trigram'
+                )''',
+            '''CREATE TRIGGER IF NOT EXISTS items_search_insert AFTER INSERT ON items BEGIN
+                    INSERT INTO items_search (rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+                    INSERT INTO items_trigram (rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+                END''',
+            '''CREATE TRIGGER IF NOT EXISTS items_search_delete AFTER DELETE ON items BEGIN
+                    INSERT INTO items_search (items_search, rowid, name, manufacturer) VALUES ('delete', old.id, old.name, old.manufacturer);
+                    INSERT INTO items_trigram (items_trigram, rowid, name, manufacturer) VALUES ('delete', old.id, old.name, old.manufacturer);
+                END''',
+            '''CREATE TRIGGER IF NOT EXISTS items_search_update AFTER UPDATE OF name, manufacturer ON items BEGIN
+                    INSERT INTO items_search (items_search, rowid, name, manufacturer) VALUES ('delete', old.id, old.name, old.manufacturer);
+                    INSERT INTO items_trigram (items_trigram, rowid, name, manufacturer) VALUES ('delete', old.id, old.name, old.manufacturer);
+                    INSERT INTO items_search (rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+                    INSERT INTO items_trigram (rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+                END''',
+            "INSERT INTO items_search (items_search) VALUES ('rebuild')",
+            "INSERT INTO items_trigram (items_trigram) VALUES ('rebuild')",
+        ]),
+        # sort and filter columns of Items.list
+        (9, [
+            "CREATE INDEX IF NOT EXISTS items_name ON items (name)",
+            "CREATE INDEX IF NOT EXISTS items_manufacturer ON items (manufacturer)",
+        ]),
+        (10, change_log("items", "sales")),
+        # replication between the tills and HQ, see replication.till and replication.hq
+        (11, [
+            '''CREATE TABLE IF NOT EXISTS replica_state (
+                    name TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL
+                )''',
+            '''CREATE TABLE IF NOT EXISTS replica_uploads (
+                    till TEXT PRIMARY KEY,
+                    last_sale INTEGER NOT NULL
+                )''',
+            "ALTER TABLE sales ADD COLUMN till TEXT",
+        ]),
+        # sales of the tills HQ couldn't apply, see replication.hq.HQ.rejected
+        (12, [
+            '''CREATE TABLE IF NOT EXISTS replica_rejected (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    till TEXT NOT NULL,
+                    sale INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    at REAL NOT NULL,
+                    UNIQUE (till, sale)
+                )''',
+        ]),
+        # journaled sales the writer couldn't apply, see sales.journal.Journal.rejected
+        (13, [
+            '''CREATE TABLE IF NOT EXISTS journal_rejected (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    journal TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    at REAL NOT NULL,
+                    UNIQUE (journal, seq)
+                )''',
+        ]),
+    ],
+}
+
+
+# Every lookup the controllers and tools run, used by check_indexes
+QUERIES = {
+    "users": [
+        "SELECT * FROM users WHERE id = ?",
+        "SELECT * FROM users WHERE username = ?",
+        "UPDATE users SET name = ? WHERE id = ?",
+        "DELETE FROM users WHERE id = ?",
+        "DELETE FROM users WHERE username = ?",
+        "SELECT * FROM users WHERE (username, id) > (?, ?) ORDER BY username, id LIMIT ?",
+        "SELECT * FROM users WHERE (name, id) > (?, ?) ORDER BY name, id LIMIT ?",
+        "SELECT * FROM users WHERE perm_level = ? AND id > ? ORDER BY id LIMIT ?",
+    ],
+    "clients": [
+        "SELECT * FROM clients WHERE id = ?",
+        "SELECT * FROM clients WHERE cpf = ?",
+        "UPDATE clients SET name = ? WHERE id = ?",
+        "DELETE FROM clients WHERE id = ?",
+        "DELETE FROM clients WHERE cpf = ?",
+        "SELECT * FROM clients WHERE cpf_digits >= ? AND cpf_digits < ? ORDER BY cpf_digits, id",
+        "SELECT * FROM clients WHERE phone_digits >= ? AND phone_digits < ? ORDER BY phone_digits, id",
+        "SELECT * FROM clients WHERE email_lower >= ? AND email_lower < ? ORDER BY email_lower, id",
+        "SELECT * FROM clients WHERE (name, id) > (?, ?) ORDER BY name, id LIMIT ?",
+        "SELECT * FROM clients WHERE (cpf, id) > (?, ?) ORDER BY cpf, id LIMIT ?",
+    ],
+    "items": [
+        "SELECT * FROM items WHERE id = ?",
+        "SELECT * FROM items WHERE barcode = ?",
+        "SELECT * FROM items WHERE code = ?",
+        "SELECT * FROM items WHERE (code, id) > (?, ?) ORDER BY code, id LIMIT ?",
+        "SELECT * FROM items WHERE (name, id) > (?, ?) ORDER BY name, id LIMIT ?",
+        "SELECT * FROM items WHERE manufacturer = ? AND id > ? ORDER BY id LIMIT ?",
+        "UPDATE items SET name = ? WHERE id = ?",
+        "DELETE FROM items WHERE id = ?",
+        "UPDATE items SET quantity_in_stock = quantity_in_stock - ? WHERE id = ?",
+        "SELECT * FROM sale_lines WHERE sale_id = ?",
+        "SELECT * FROM sales_totals WHERE period = ? AND key = ?",
+        "SELECT * FROM report_hourly WHERE hour BETWEEN ? AND ?",
+        "SELECT * FROM report_items WHERE day BETWEEN ? AND ?",
+        "SELECT * FROM report_cashiers WHERE day BETWEEN ? AND ?",
+        "SELECT * FROM report_clients WHERE day BETWEEN ? AND ?",
+    ],
+}
+
+
+def version(conn, name=None):
+    '''
+     Schema version of a database file, or of one entity in a file shared by several, see migrate.
+    '''
+    if name is None:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    row = conn.execute("SELECT version FROM schema_versions WHERE name = ?", (name,)).fetchone()
+
+    return row[0] if row else 0
+
+
+def migrate(conn, name, shared=False):
+    '''
+     Brings one database up to the latest schema version.
+
+     Each pending version runs in its own transaction together with the
+     version bump, so a failed migration leaves the previous version intact.
+
+     @param conn - Connection to the database.
+     @param name - Key of MIGRATIONS, "users", "clients" or "items".
+     @param shared - The file holds other entities too, versions are then kept
+                     per entity in schema_versions instead of PRAGMA user_version.
+
+     @return The schema version after migrating.
+    '''
+    if shared:
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS schema_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    current = version(conn, name if shared else None)
+
+    for number, statements in MIGRATIONS[name]:
+        if number <= current:
+            continue
+
+        with conn:
+            # sqlite3 only opens a transaction by itself before DML, DDL would be committed statement by statement
+            conn.execute("BEGIN")
+
+            for statement in statements:
+                conn.execute(statement)
+
+            if shared:
+                conn.execute('''INSERT INTO schema_versions (name, version) VALUES (?,?)
+                                ON CONFLICT (name) DO UPDATE SET version = excluded.version''', (name, number))
+
+            else:
+                conn.execute(f"PRAGMA user_version = {int(number)}")
+
+        current = number
+
+    return current
+
+
+def duplicates(path=None):
+    '''
+     Clients moved aside by clients migration 2 because another client had the same cpf.
+
+     @param path - Path of the clients database, defaults to the configured one.
+
+     @return A list of (id, id of the client kept with that cpf, name, cpf).
+    '''
+    conn = c(path or config.path("clients"))
+
+    return conn.execute("SELECT id, kept_id, name, cpf FROM clients_duplicates ORDER BY kept_id, id").fetchall()
+
+
+def databases():
+    '''
+     Returns the database path of every entity, as configured on the controllers from database.config.
+    '''
+    from users.controller.user_controller import User
+    from clients.controller.client_controller import Client
+    from inventory.controller.items_controller import Items
+
+    return {"users": User.DB, "clients": Client.DB, "items": Items.DB}
+
+
+def create_all(paths=None):
+    '''
+     Creates or migrates every database.
+
+     @param paths - Mapping of entity to database path, defaults to databases().
+
+     @return A dictionary with the schema version of each database, None on a server backend which isn't versioned.
+    '''
+    paths = paths or databases()
+
+    if config.BACKEND != "sqlite":
+        create_schema(c(config.DSN))
+        return {name: None for name in paths}
+
+    files = [os.path.abspath(path) for path in paths.values()]
+
+    return {name: migrate(c(path), name, files.count(os.path.abspath(path)) > 1) for name, path in paths.items()}
+
+
+def consolidate(target=None, paths=None):
+    '''
+     Copies the split databases into one file, for the single layout of database.config.
+
+     The target gets the schema of every entity first, then every table of each
+     file is copied in one transaction per file. Rows go through the triggers,
+     so the search indexes and the normalised client columns are rebuilt, and
+     the change log gets an insert per row for the exporters to resend.
+     The target must not hold any data yet.
+
+     @param target - Path of the new file, defaults to config.SINGLE in config.DIRECTORY.
+     @param paths - Mapping of entity to the split database paths, defaults to databases().
+
+     @return A dictionary with the number of rows copied per table.
+    '''
+    paths = paths or databases()
+    target = target or os.path.join(config.DIRECTORY, config.SINGLE)
+    create_all(paths)
+    create_all({name: target for name in paths})
+
+    conn = c(target)
+    copied = {}
+
+    for path in paths.values():
+        conn.execute("ATTACH DATABASE ? AS source", (path,))
+
+        try:
+            # the search indexes and the change log are rebuilt by the triggers, not copied
+            tables = [row[0] for row in conn.execute('''SELECT name FROM source.sqlite_master WHERE type = 'table'
+                                                         AND name NOT LIKE 'sqlite%' AND name NOT LIKE 'items_search%'
+                                                         AND name NOT LIKE 'items_trigram%'
+                                                         AND name NOT IN ('changes', 'changes_checkpoint')''')]
+
+            with conn:
+                for table in tables:
+                    columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA source.table_info({table})"))
+                    copied[table] = conn.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table}").rowcount
+
+        finally:
+            conn.execute("DETACH DATABASE source")
+
+    return copied
+
+
+def check_indexes(paths=None):
+    '''
+     Runs EXPLAIN QUERY PLAN on every controller query.
+
+     @param paths - Mapping of entity to database path, defaults to databases().
+
+     @return A list of (query, plan) for the queries that scan a table instead of using an index, empty when all are indexed.
+    '''
+    paths = paths or databases()
+    scans = []
+
+    for name, path in paths.items():
+        conn = c(path)
+
+        for query in QUERIES[name]:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", (None,) * query.count("?"))]
+
+            if any(detail.startswith("SCAN") for detail in plan):
+                scans.append((query, plan))
+
+    return scans
+
+
+if __name__ == "__main__":
+    print(create_all())
+
+    for client_id, kept_id, name, cpf in duplicates():
+        print(f"client {client_id} {name} moved to clients_duplicates, {kept_id} has the same cpf {cpf}")
+
+    for query, plan in check_indexes():
+        print(f"not indexed: {query} -> {plan}")
@@ -0,0 +1,134 @@
+from database import bulk, rows
+
+
+def update_query(table, allowed, fields):
+    '''
+     Builds one parameterised UPDATE covering every supplied column.
+
+     @param table - Name of the table to update.
+     @param allowed - Columns that may be updated on this table.
+     @param fields - Mapping of column to new value, None values are skipped.
+
+     @return A tuple (query, columns) or None when there is nothing to update.
+    '''
+    columns = tuple(column for column, value in fields.items() if value is not None)
+
+    for column in columns:
+        if column not in allowed:
+            raise ValueError(f"column {column} can't be updated on {table}")
+
+    if not columns:
+        return None
+
+    assignments = ", ".join(f"{column}=?" for column in columns)
+
+    return f"UPDATE {table} SET {assignments} WHERE id=?", columns
+
+
+def bulk_update(conn, table, allowed, updates):
+    '''
+     Applies a list of partial updates in a single transaction.
+
+     Updates touching the same set of columns share one statement and are sent
+     with executemany.
+
+     @param conn - Connection to run the updates on.
+     @param table - Name of the table to update.
+     @param allowed - Columns that may be updated on this table.
+     @param updates - Iterable of (row_id, fields) pairs.
+
+     @return The number of rows changed.
+    '''
+    groups = {}
+
+    for row_id, fields in updates:
+        built = update_query(table, allowed, fields)
+
+        if built is None:
+            continue
+
+        query, columns = built
+        groups.setdefault(query, []).append(tuple(fields[column] for column in columns) + (row_id,))
+
+    changed = 0
+
+    with conn:
+        for query, params in groups.items():
+            changed += conn.executemany(query, params).rowcount
+
+    return changed
+
+
+def paginate(conn, table, columns, orders, allowed, order_by="id", filters=None, after=None, limit=None, page_size=1000, row_type=None):
+    '''
+     Streams a table with keyset (seek) pagination.
+
+     Rows come ordered by (order_by, id). Each page is a fresh query starting
+     right after the last row seen, so the cost of a page doesn't grow with
+     its depth and no read transaction is held across pages.
+
+     @param conn - Connection to read from.
+     @param table - Name of the table.
+     @param columns - Columns to select, must include id and every column of orders.
+     @param orders - Indexed NOT NULL columns the table may be sorted on.
+     @param allowed - Indexed columns the table may be filtered on.
+     @param order_by - Column to sort on.
+     @param filters - Mapping of column to the value it must be equal to.
+     @param after - Cursor (order_by value, id) of the last row already seen.
+     @param limit - Maximum number of rows, None for all.
+     @param page_size - Rows per query, fetched with fetchmany.
+     @param row_type - Row class from database.rows, None for plain tuples.
+
+     @return A generator of rows, the query only runs as it is consumed.
+    '''
+    filters = filters or {}
+
+    if order_by not in orders:
+        raise ValueError(f"{table} can't be sorted by {order_by}")
+
+    for column in filters:
+        if column not in allowed:
+            raise ValueError(f"{table} can't be filtered by {column}")
+
+    return _pages(conn, table, columns, order_by, filters, after, limit, page_size, row_type)
+
+
+def _pages(conn, table, columns, order_by, filters, after, limit, page_size, row_type):
+    where = [f"{column} = ?" for column in filters]
+    order = "id" if order_by == "id" else f"{order_by}, id"
+    select = f"SELECT {', '.join(columns)} FROM {table}"
+    served = 0
+
+    while limit is None or served < limit:
+        clauses, params = list(where), list(filters.values())
+
+        if after is not None:
+            if order_by == "id":
+                clauses.append("id > ?")
+                params.append(after[1])
+
+            else:
+                clauses.append(f"({order_by}, id) > (?, ?)")
+                params.extend(after)
+
+        size = page_size if limit is None else min(page_size, limit - served)
+        query = select + (" WHERE " + " AND ".join(clauses) if clauses else "")
+
+        cursor = conn.cursor() if row_type is None else rows.cursor(conn, row_type)
+        cursor.execute(f"{query} ORDER BY {order} LIMIT ?", params + [size])
+        fetched = 0
+
+        for row in bulk.stream(cursor, size):
+            fetched += 1
+            yield row
+
+        if fetched < size:
+            return
+
+        served += fetched
+
+        if row_type is None:
+            after = (row[columns.index(order_by)], row[columns.index("id")])
+
+        else:
+            after = (getattr(row, order_by), row.id)
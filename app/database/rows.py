@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class UserRow:
+    id: int = None
+    name: str = None
+    username: str = None
+    password: str = None
+    salt: str = None
+    perm_level: int = None
+
+
+@dataclass(slots=True)
+class ClientRow:
+    id: int = None
+    name: str = None
+    cpf: str = None
+    address: str = None
+    telephone: str = None
+    email: str = None
+
+
+@dataclass(slots=True)
+class ItemRow:
+    id: int = None
+    code: str = None
+    name: str = None
+    manufacturer: str = None
+    barcode: str = None
+    quantity_in_stock: int = None
+    value: float = None
+    reorder_point: int = None
+
+
+def row_factory(cls):
+    '''
+     Builds a sqlite3 row_factory that turns each row into an instance of cls.
+
+     Rows selecting every column in table order are built positionally, partial
+     selects are matched by column name and leave the other fields as None.
+
+     @param cls - One of the row classes above.
+    '''
+    fields = cls.__slots__
+
+    def factory(cursor, row):
+        names = tuple(column[0] for column in cursor.description)
+
+        if names == fields:
+            return cls(*row)
+
+        return cls(**dict(zip(names, row)))
+
+    return factory
+
+
+def cursor(conn, cls):
+    '''
+     Returns a cursor of conn that produces cls rows, leaving the connection itself on plain tuples.
+    '''
+    result = conn.cursor()
+    result.row_factory = row_factory(cls)
+
+    return result
@@ -0,0 +1,83 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeReceiver:
+    '''
+     Local stand-in for the accounting or CRM endpoint, for development and tests.
+
+     Keeps every change it accepted and ignores a batch whose Idempotency-Key
+     it already saw, as the real systems are expected to.
+
+     @param busy_every - Answer 429 to every nth post, 0 never.
+     @param max_changes - Answer 413 to batches with more changes, None no limit.
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0, busy_every=0, max_changes=None, retry_after=0):
+        self.busy_every = busy_every
+        self.max_changes = max_changes
+        self.retry_after = retry_after
+        self.changes = []
+        self.keys = set()
+        self.posts = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/changes"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-receiver", daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def receive(self, key, batch):
+        with self._lock:
+            self.posts += 1
+
+            if self.busy_every and self.posts % self.busy_every == 0:
+                return 429
+
+            if self.max_changes is not None and len(batch["changes"]) > self.max_changes:
+                return 413
+
+            if key not in self.keys:
+                self.keys.add(key)
+                self.changes.extend(batch["changes"])
+
+            return 200
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                batch = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                status = receiver.receive(self.headers.get("Idempotency-Key"), batch)
+                self.send_response(status)
+
+                if status == 429:
+                    self.send_header("Retry-After", str(receiver.retry_after))
+
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    receiver = FakeReceiver(port=8098).start()
+    print(f"fake receiver on {receiver.url}")
+    receiver._thread.join()
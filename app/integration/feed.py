@@ -0,0 +1,206 @@
+import os
+
+from database.connection import conn as c
+
+
+# current state of a changed row, password hashes never leave the till
+READERS = {
+    "users": "SELECT id, name, username, perm_level FROM users WHERE id IN ({})",
+    "clients": "SELECT id, name, cpf, address, telephone, email FROM clients WHERE id IN ({})",
+    "items": "SELECT id, code, name, manufacturer, barcode, quantity_in_stock, value, reorder_point FROM items WHERE id IN ({})",
+    "sales": "SELECT id, created_at, user_id, client_id, total_cents, shift, discount_cents, tax_cents FROM sales WHERE id IN ({})",
+}
+
+LINES = "SELECT sale_id, item_id, quantity, unit_cents FROM sale_lines WHERE sale_id IN ({})"
+
+
+class Feed:
+    '''
+     Change feed of one database, read from the changes table that the
+     triggers of database.create.change_log fill.
+
+     Each target, e.g. "accounting" or "crm", has its own checkpoint in
+     changes_checkpoint, so every external system resumes where it stopped.
+     prune only deletes what every registered target acknowledged, a reader
+     that isn't registered may find the changes it needs gone, see behind.
+    '''
+
+    def __init__(self, name, path):
+        '''
+         @param name - Name of the feed, "users", "clients" or "items", "users+clients+items" in the single layout.
+         @param path - Path of its database.
+        '''
+        self.name = name
+        self.path = path
+
+    def checkpoint(self, target):
+        '''
+         @return The last seq target acknowledged, 0 if it never did.
+        '''
+        row = c(self.path).execute("SELECT seq FROM changes_checkpoint WHERE target = ?", (target,)).fetchone()
+
+        return row[0] if row else 0
+
+    def register(self, target):
+        '''
+         Makes prune wait for target, from the oldest change still kept if it has no checkpoint yet.
+        '''
+        conn = c(self.path)
+
+        with conn:
+            conn.execute("INSERT INTO changes_checkpoint (target, seq) VALUES (?,?) ON CONFLICT (target) DO NOTHING",
+                         (target, self.floor()))
+
+    def unregister(self, target):
+        '''
+         Stops prune from waiting for target, e.g. a system or a till taken out of service.
+        '''
+        conn = c(self.path)
+
+        with conn:
+            conn.execute("DELETE FROM changes_checkpoint WHERE target = ?", (target,))
+
+    def floor(self):
+        '''
+         @return The last seq pruned, 0 if nothing was.
+        '''
+        first = c(self.path).execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+
+        return 0 if first is None else first - 1
+
+    def behind(self, after):
+        '''
+         True when changes past after were already pruned, the reader then needs a snapshot.
+        '''
+        return after < self.floor()
+
+    def advance(self, target, seq):
+        conn = c(self.path)
+
+        with conn:
+            conn.execute('''INSERT INTO changes_checkpoint (target, seq) VALUES (?,?)
+                            ON CONFLICT (target) DO UPDATE SET seq = MAX(seq, excluded.seq)''', (target, seq))
+
+    def pending(self, target):
+        return c(self.path).execute("SELECT COUNT(*) FROM changes WHERE seq > ?", (self.checkpoint(target),)).fetchone()[0]
+
+    def read(self, after, limit):
+        '''
+         Reads the changes past a seq.
+
+         Changes to the same row within the batch are merged into one carrying
+         the row as it is now, a row deleted since is sent as a delete.
+
+         @param after - Seq to read after.
+         @param limit - Maximum number of change log entries to read.
+
+         @return A tuple (last seq read, changes), changes is a list of dicts with seq, entity, id, op and data.
+        '''
+        conn = c(self.path)
+        entries = conn.execute("SELECT seq, entity, row_id, op FROM changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                               (after, limit)).fetchall()
+
+        if not entries:
+            return after, []
+
+        latest = {}
+
+        for seq, entity, row_id, op in entries:
+            latest.pop((entity, row_id), None)
+            latest[(entity, row_id)] = (seq, op)
+
+        ids = {}
+
+        for (entity, row_id), (_, op) in latest.items():
+            if op != "delete":
+                ids.setdefault(entity, []).append(row_id)
+
+        current = {entity: self.rows(conn, entity, row_ids) for entity, row_ids in ids.items()}
+        changes = []
+
+        for (entity, row_id), (seq, op) in latest.items():
+            data = current.get(entity, {}).get(row_id)
+            changes.append({"seq": seq, "entity": entity, "id": row_id, "op": op if data is not None else "delete", "data": data})
+
+        return entries[-1][0], changes
+
+    @staticmethod
+    def rows(conn, entity, row_ids):
+        '''
+         @return A dictionary of id to row as a dict, sales carry their lines.
+        '''
+        result = {}
+
+        for start in range(0, len(row_ids), 500):
+            chunk = row_ids[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            cursor = conn.execute(READERS[entity].format(marks), chunk)
+            names = [column[0] for column in cursor.description]
+
+            for row in cursor:
+                result[row[0]] = dict(zip(names, row))
+
+            if entity == "sales":
+                for sale_id, item_id, quantity, unit_cents in conn.execute(LINES.format(marks), chunk):
+                    result[sale_id].setdefault("lines", []).append([item_id, quantity, unit_cents])
+
+        return result
+
+    def snapshot(self, entities):
+        '''
+         Reads every row of the given entities, for a reader that is behind.
+
+         @return A tuple (seq the rows are current at, changes), changes are dicts like those of read with op "snapshot".
+        '''
+        conn = c(self.path)
+
+        # one read transaction, so the rows and the seq agree
+        conn.execute("BEGIN")
+
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            changes = []
+
+            for entity in entities:
+                row_ids = [row[0] for row in conn.execute(f"SELECT id FROM {entity} ORDER BY id")]
+                changes += [{"seq": seq, "entity": entity, "id": row_id, "op": "snapshot", "data": data}
+                            for row_id, data in self.rows(conn, entity, row_ids).items()]
+
+        finally:
+            conn.rollback()
+
+        return seq, changes
+
+    def prune(self):
+        '''
+         Deletes the changes every registered target has acknowledged.
+
+         The last one acknowledged by all is kept, it marks how far the log
+         was pruned, see floor. While no target is registered nobody needs the
+         log, e.g. on a till, and all but the last change are deleted; a
+         target registered later starts from there.
+
+         @return The number of entries deleted.
+        '''
+        conn = c(self.path)
+
+        with conn:
+            return conn.execute('''DELETE FROM changes WHERE seq < COALESCE((SELECT MIN(seq) FROM changes_checkpoint),
+                                                                (SELECT MAX(seq) FROM changes))''').rowcount
+
+
+def feeds(paths=None):
+    '''
+     One Feed per database, paths default to database.create.databases().
+    '''
+    if paths is None:
+        from database.create import databases
+        paths = databases()
+
+    names = {}
+
+    # in the single layout every entity shares one file and one change log
+    for name, path in paths.items():
+        names.setdefault(os.path.abspath(path), []).append(name)
+
+    return [Feed("+".join(entities), path) for path, entities in names.items()]
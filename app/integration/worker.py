@@ -0,0 +1,192 @@
+import email.utils
+import http.client
+import json
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from integration.feed import feeds as default_feeds
+
+
+class PushError(Exception):
+    '''
+     A batch wasn't accepted. retry_after is the delay the receiver asked for, None if it didn't.
+    '''
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after(value):
+    '''
+     Reads a Retry-After header, in seconds or as an HTTP date.
+
+     @return Seconds to wait, None if the header is missing or unreadable.
+    '''
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+
+    except (TypeError, ValueError):
+        return None
+
+
+class Exporter:
+    '''
+     Pushes the change feeds to an external system, e.g. accounting or a CRM.
+
+     Every batch is POSTed as JSON {"target", "feed", "from", "to", "changes"}
+     with an Idempotency-Key of target, feed and last seq, and the checkpoint
+     only moves once the receiver answered 2xx, so a crash or a failed post
+     resends the same batch and nothing is skipped.
+
+     Each feed is registered for the target on the first sync, so Feed.prune
+     keeps the changes it hasn't shipped yet, and pruned once it is caught up.
+
+     Backpressure: only one batch is in memory at a time, a 429 or 503 waits
+     for the receiver's Retry-After, a 413 halves the batch size, which then
+     grows back a step per accepted post. Other failures back off
+     exponentially up to max_backoff.
+    '''
+
+    def __init__(self, target, url, feeds=None, batch_size=500, interval=5, timeout=10, backoff=1, max_backoff=300):
+        '''
+         @param target - Name of the external system, its checkpoints are kept under it.
+         @param url - Endpoint receiving the batches.
+         @param feeds - Feeds to push, defaults to integration.feed.feeds().
+         @param batch_size - Maximum change log entries per post.
+         @param interval - Seconds between polls once every feed is caught up.
+         @param timeout - Seconds each post may take.
+        '''
+        self.target = target
+        self.url = url
+        self.feeds = default_feeds() if feeds is None else feeds
+        self.max_batch = batch_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.shipped = 0
+        self.failures = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._registered = set()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"export-{self.target}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._stop.clear()
+
+    def _run(self):
+        delay = self.backoff
+
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                delay = self.backoff
+                self._stop.wait(self.interval)
+
+            except (PushError, sqlite3.Error, http.client.HTTPException, ValueError) as e:
+                # a refused batch or a busy database, the checkpoint didn't move so the batch is sent again
+                self.failures += 1
+                self.last_error = e
+                retry_after = getattr(e, "retry_after", None)
+
+                if retry_after is None:
+                    wait, delay = delay * random.uniform(0.5, 1.5), min(delay * 2, self.max_backoff)
+
+                else:
+                    wait = retry_after
+
+                self._stop.wait(wait)
+
+    def sync(self):
+        '''
+         Pushes every feed until it is caught up. Raises PushError when the receiver refuses a batch.
+
+         @return The number of changes shipped.
+        '''
+        shipped = 0
+
+        for feed in self.feeds:
+            if feed.path not in self._registered:
+                feed.register(self.target)
+                self._registered.add(feed.path)
+
+            while not self._stop.is_set():
+                sent = self.push(feed)
+
+                if not sent:
+                    break
+
+                shipped += sent
+
+            feed.prune()
+
+        return shipped
+
+    def push(self, feed):
+        '''
+         Posts the next batch of a feed and moves its checkpoint.
+
+         @return The number of changes shipped, 0 when the feed is caught up.
+        '''
+        after = feed.checkpoint(self.target)
+        last, changes = feed.read(after, self.batch_size)
+
+        if last == after:
+            return 0
+
+        self.post({"target": self.target, "feed": feed.name, "from": after, "to": last, "changes": changes},
+                  f"{self.target}:{feed.name}:{last}")
+        feed.advance(self.target, last)
+        self.shipped += len(changes)
+        # grow back slowly after a 413 shrank the batches, halving and doubling would hit the limit every other post
+        self.batch_size = min(self.batch_size + max(1, self.max_batch // 16), self.max_batch)
+
+        return len(changes)
+
+    def post(self, batch, key):
+        request = urllib.request.Request(self.url, data=json.dumps(batch, separators=(",", ":")).encode(), method="POST",
+                                         headers={"Content-Type": "application/json", "Idempotency-Key": key})
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+
+        except urllib.error.HTTPError as e:
+            if e.code in (429, 503):
+                raise PushError(f"{self.target} is busy", retry_after(e.headers.get("Retry-After")))
+
+            if e.code == 413:
+                self.batch_size = max(1, self.batch_size // 2)
+                raise PushError(f"batch too large for {self.target}", 0)
+
+            raise PushError(f"{self.target} answered {e.code}")
+
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            # HTTPException covers answers cut short, e.g. IncompleteRead, which isn't an OSError
+            raise PushError(f"{self.target} unreachable: {e!r}")
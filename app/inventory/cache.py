@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ItemCache:
+    '''
+     LRU cache of item rows keyed by barcode and by code, with a time to live.
+
+     Both keys of a row point to the same entry and are tracked per item id, so
+     an update or delete of the id drops every key it was cached under.
+    '''
+
+    def __init__(self, maxsize=100_000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, kind, key):
+        '''
+         Returns the cached row for ("barcode", value) or ("code", value), None on a miss or an expired entry.
+        '''
+        with self._lock:
+            entry = self._entries.get((kind, key))
+
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._drop(entry[0])
+
+                self.misses += 1
+                return None
+
+            # the item was used, whichever key it was found by, so none of its keys is evicted first
+            for used in self._keys[entry[0]]:
+                self._entries.move_to_end(used)
+
+            self.hits += 1
+
+            return entry[1]
+
+    def put(self, item_id, code, barcode, row):
+        '''
+         Caches a row under its code and barcode, evicting the least recently used entries past maxsize.
+        '''
+        with self._lock:
+            self._drop(item_id)
+            expires = time.monotonic() + self.ttl
+            keys = [("code", code)]
+
+            if barcode is not None:
+                keys.append(("barcode", barcode))
+
+            for key in keys:
+                self._entries[key] = (item_id, row, expires)
+
+            self._keys[item_id] = keys
+
+            while len(self._entries) > self.maxsize:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._drop(evicted)
+
+    def invalidate(self, item_id):
+        with self._lock:
+            self._drop(item_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+    def stats(self):
+        '''
+         Returns the counters used for monitoring.
+        '''
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def _drop(self, item_id):
+        for key in self._keys.pop(item_id, ()):
+            self._entries.pop(key, None)
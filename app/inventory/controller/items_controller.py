@@ -1,9 +1,20 @@
 from database.connection import conn as c
+from database.queries import update_query, bulk_update, paginate
+from database import bulk, config
+from database.rows import ItemRow, cursor as row_cursor
+from inventory.cache import ItemCache
+from inventory.replenishment import LowStock
 import sqlite3
 
 
 class Items:
-    DB = "app/database/items.db"
+    DB = config.path("items")
+    COLUMNS = ("code", "name", "manufacturer", "barcode", "quantity_in_stock", "value", "reorder_point")
+    cache = ItemCache()
+    low_stock = LowStock(lambda: c(Items.DB))
+    # indexed columns Items.list can sort and filter on
+    ORDER_BY = ("id", "code", "name")
+    FILTERS = ("manufacturer",)
 
     def __init__(self, code, name, manufacturer, barcode, quantity_in_stock,  value):
         self.name = name
@@ -19,23 +30,65 @@ class Items:
     def create(code, name, manufacturer, quantity_in_stock, value, barcode=None):
         query = '''
                 INSERT INTO items (code, name, manufacturer, barcode, quantity_in_stock, value)
-                VALUES (?,?,?,?,?)
+                VALUES (?,?,?,?,?,?)
                 '''
         
         try:
             conn = c(Items.DB)
             cursor = conn.cursor()
 
-            cursor.execute(query, (code, name, manufacturer, barcode, quantity_in_stock, value,))
-            conn.commit()
+            with conn:
+                cursor.execute(query, (code, name, manufacturer, barcode, quantity_in_stock, value,))
+
+            Items.low_stock.refresh([cursor.lastrowid])
 
             
         
         except sqlite3.Error as e:
             return e
         
-        finally:
-            conn.close()
+
+
+    def validate(row):
+        '''
+         Turns an imported row into the values of Items.COLUMNS, raising ValueError on bad data.
+        '''
+        if not row.get("code") or not row.get("name"):
+            raise ValueError("code and name are required")
+
+        return (row["code"], row["name"], row.get("manufacturer") or None, row.get("barcode") or None,
+                int(row.get("quantity_in_stock") or 0), float(row["value"]), int(row.get("reorder_point") or 0))
+
+
+    def import_file(path, batch_size=bulk.BATCH_SIZE):
+        '''
+         Loads a supplier catalogue from CSV or JSON Lines in chunked transactions.
+
+         @return A tuple (loaded, rejected) as returned by database.bulk.load.
+        '''
+        try:
+            loaded = bulk.load(c(Items.DB), "items", Items.COLUMNS, bulk.read_rows(path), Items.validate, batch_size)
+            Items.low_stock.load()
+
+            return loaded
+
+        except sqlite3.Error as e:
+            return e
+
+
+    def export_file(path, batch_size=bulk.BATCH_SIZE):
+        '''
+         Streams the items table into a CSV file.
+
+         @return The number of items written.
+        '''
+        columns = ("id",) + Items.COLUMNS
+
+        try:
+            return bulk.export_csv(path, columns, bulk.export(c(Items.DB), "items", columns, batch_size))
+
+        except sqlite3.Error as e:
+            return e
 
 
     def read(item_id):
@@ -45,7 +98,7 @@ class Items:
         
         try:
             conn = c(Items.DB)
-            cursor = conn.cursor()
+            cursor = row_cursor(conn, ItemRow)
 
             cursor.execute(query, (item_id,))
             
@@ -55,68 +108,157 @@ class Items:
         except sqlite3.Error as e:
             return e
         
-        finally:
-            conn.close()
 
     
-    def update(item_id, name=None, manufacturer=None, barcode=None, quantity_in_stock=None, value=None):
-        
+    def lookup(barcode=None, code=None):
+        '''
+         Resolves a scanned barcode or a typed code, going to the database only on a cache miss.
+
+         @return The ItemRow or None if there is no such item.
+        '''
+        kind, key = ("barcode", barcode) if barcode is not None else ("code", code)
+        row = Items.cache.get(kind, key)
+
+        if row is not None:
+            return row
+
+        try:
+            row = row_cursor(c(Items.DB), ItemRow).execute(f"SELECT * FROM items WHERE {kind}=?", (key,)).fetchone()
+
+        except sqlite3.Error as e:
+            return e
+
+        if row is not None:
+            Items.cache.put(row.id, row.code, row.barcode, row)
+
+        return row
+
+
+    def warm_cache(batch_size=bulk.BATCH_SIZE):
+        '''
+         Fills the lookup cache from the items table, up to its maxsize, e.g. when the till starts.
+
+         @return The number of items cached.
+        '''
+        warmed = 0
+
+        try:
+            for row in bulk.export(c(Items.DB), "items", ("id",) + Items.COLUMNS, batch_size, ItemRow):
+                if warmed * 2 >= Items.cache.maxsize:
+                    break
+
+                Items.cache.put(row.id, row.code, row.barcode, row)
+                warmed += 1
+
+        except sqlite3.Error as e:
+            return e
+
+        return warmed
+
+
+    def search(text, limit=20):
+        '''
+         Finds items by partial name or manufacturer, for when a barcode won't scan.
+
+         Every word is matched as a prefix on the items_search index and every match
+         is ranked by bm25, so the best ones come first however many there are.
+         When that finds nothing, the text is looked up anywhere inside the words
+         through the trigram index, which needs at least 3 characters.
+
+         @return A list of ItemRow, best match first.
+        '''
+        words = [word.replace('"', "") for word in str(text).split()]
+        words = [word for word in words if word]
+
+        if not words:
+            return []
+
+        # ORDER BY rank with a LIMIT in the FTS query lets FTS5 keep only the best matches as it ranks them
+        query = '''SELECT items.* FROM (SELECT rowid, rank FROM {index} WHERE {index} MATCH ? ORDER BY rank LIMIT ?) AS found
+                   JOIN items ON items.id = found.rowid ORDER BY found.rank'''
+
+        try:
+            cursor = row_cursor(c(Items.DB), ItemRow)
+            result = cursor.execute(query.format(index="items_search"), (" ".join(f'"{word}"*' for word in words), limit)).fetchall()
+
+            if not result and all(len(word) >= 3 for word in words):
+                result = cursor.execute(query.format(index="items_trigram"), (" ".join(f'"{word}"' for word in words), limit)).fetchall()
+
+            return result
+
+        except sqlite3.Error as e:
+            return e
+
+
+    def list(order_by="id", after=None, limit=None, page_size=bulk.BATCH_SIZE, **filters):
+        '''
+         Lists items page by page for the back office.
+
+         @param order_by - One of Items.ORDER_BY.
+         @param after - (order_by value, id) of the last item already seen, None to start from the beginning.
+         @param limit - Maximum number of items, None for all of them.
+         @param page_size - Items read per query.
+         @param filters - Columns of Items.FILTERS and the value they must have, e.g. manufacturer="ACME".
+
+         @return A generator of ItemRow or the exception raised.
+        '''
+        try:
+            return paginate(c(Items.DB), "items", ItemRow.__slots__, Items.ORDER_BY, Items.FILTERS,
+                            order_by, filters, after, limit, page_size, ItemRow)
+
+        except (sqlite3.Error, ValueError) as e:
+            return e
+
+
+    def update(item_id, name=None, manufacturer=None, barcode=None, quantity_in_stock=None, value=None, reorder_point=None):
+        fields = {"name": name, "manufacturer": manufacturer, "barcode": barcode, "quantity_in_stock": quantity_in_stock, "value": value,
+                  "reorder_point": reorder_point}
+        built = update_query("items", Items.COLUMNS, fields)
+
+        if built is None:
+            return
+
+        query, columns = built
+
         try:
             conn = c(Items.DB)
-            cursor = conn.cursor()
-            
-            if name is not None:
-                query = '''
-                        UPDATE items SET name=?  WHERE id=?
-                        '''
-
-
-                cursor.execute(query, (name,))
-                conn.commit()
-                
-            if manufacturer is not None:
-                query = '''
-                        UPDATE items SET manufacturer=?  WHERE id=?
-                        '''
-                
-
-                cursor.execute(query, (manufacturer,))
-                conn.commit()
-            
-            if barcode is not None:
-                query = '''
-                        UPDATE items SET barcode=?  WHERE id=?
-                        '''
-                
 
+            with conn:
+                conn.execute(query, tuple(fields[column] for column in columns) + (item_id,))
 
-                cursor.execute(query, (barcode,))
-                conn.commit()
-            
-            if quantity_in_stock is not None:
-                query = '''
-                        UPDATE items SET quantity_in_stock=?  WHERE id=?
-                        '''
+            Items.cache.invalidate(item_id)
 
+            if quantity_in_stock is not None or reorder_point is not None:
+                Items.low_stock.refresh([item_id])
 
-                cursor.execute(query, (quantity_in_stock,))
-                conn.commit()
-            
-            if value is not None:
-                query = '''
-                        UPDATE items SET value=?  WHERE id=?
-                        '''
-                
+        except sqlite3.Error as e:
+            return e
 
 
-                cursor.execute(query, (value,))
-                conn.commit()
-            
+    def bulk_update(updates):
+        '''
+         Applies many partial updates, e.g. an overnight repricing, in one transaction.
+
+         @param updates - Iterable of (item_id, fields) pairs where fields maps column names to new values.
+
+         @return The number of items changed.
+        '''
+        updates = list(updates)
+
+        try:
+            changed = bulk_update(c(Items.DB), "items", Items.COLUMNS, updates)
+
         except sqlite3.Error as e:
             return e
+
+        for item_id, _ in updates:
+            Items.cache.invalidate(item_id)
+
+        Items.low_stock.refresh(item_id for item_id, fields in updates
+                                if "quantity_in_stock" in fields or "reorder_point" in fields)
+
+        return changed
         
-        finally:
-            conn.close()
         
 
     def delete(item_id):
@@ -128,11 +270,12 @@ class Items:
             conn = c(Items.DB)
             cursor = conn.cursor()
 
-            cursor.execute(query, (item_id))
-            return conn.commit()
+            with conn:
+                cursor.execute(query, (item_id,))
+
+            Items.cache.invalidate(item_id)
+            Items.low_stock.discard(item_id)
 
         except sqlite3.Error as e:
             return e
-        
-        finally:
-            conn.close()
\ No newline at end of file
+        
\ No newline at end of file
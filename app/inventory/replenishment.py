@@ -0,0 +1,105 @@
+import heapq
+import math
+import threading
+import time
+
+
+class LowStock:
+    '''
+     Indexed set of the items at or below their reorder point.
+
+     It is loaded once through the partial index items_low_stock and then
+     kept current by refresh(), which Items and the sales writers call with
+     the ids whose stock changed, so opening the dashboard never scans the
+     items table. The most urgent items come first: lowest stock relative to
+     the reorder point.
+    '''
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._items = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        rows = self._connect().execute('''SELECT id, quantity_in_stock, reorder_point FROM items
+                                          WHERE quantity_in_stock <= reorder_point''').fetchall()
+
+        with self._lock:
+            self._items = {row[0]: (row[1], row[2]) for row in rows}
+            self._loaded = True
+
+    def refresh(self, item_ids):
+        '''
+         Re-reads the stock of the given items by primary key and adds or drops them from the set.
+        '''
+        if not self._loaded:
+            return
+
+        item_ids = list(item_ids)
+        conn = self._connect()
+
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            rows = conn.execute(f'''SELECT id, quantity_in_stock, reorder_point FROM items
+                                    WHERE id IN ({",".join("?" * len(chunk))})''', chunk).fetchall()
+            found = {row[0]: (row[1], row[2]) for row in rows}
+
+            with self._lock:
+                for item_id in chunk:
+                    stock = found.get(item_id)
+
+                    if stock is not None and stock[0] <= stock[1]:
+                        self._items[item_id] = stock
+
+                    else:
+                        self._items.pop(item_id, None)
+
+    def discard(self, item_id):
+        with self._lock:
+            self._items.pop(item_id, None)
+
+    def items(self, n=None):
+        '''
+         @return Up to n tuples (item_id, quantity_in_stock, reorder_point), most urgent first.
+        '''
+        if not self._loaded:
+            self.load()
+
+        with self._lock:
+            entries = [(item_id,) + stock for item_id, stock in self._items.items()]
+
+        return heapq.nsmallest(n or len(entries), entries, key=lambda entry: (entry[1] - entry[2], entry[1]))
+
+    def suggestions(self, days=28, lead_days=7, cover_days=14, n=None):
+        '''
+         Reorder quantities for the low items from their sales velocity over the last days.
+
+         Enough is ordered to cover the lead time plus cover_days at the current
+         velocity, and never less than what brings the item back above its reorder point.
+
+         @return A list of (item_id, quantity_in_stock, units per day, quantity to order), most urgent first.
+        '''
+        low = self.items(n)
+
+        if not low:
+            return []
+
+        since = time.strftime("%Y-%m-%d", time.localtime(time.time() - days * 86400))
+        sold = {}
+        conn = self._connect()
+
+        for start in range(0, len(low), 500):
+            chunk = [entry[0] for entry in low[start:start + 500]]
+            sold.update(conn.execute(f'''SELECT item_id, SUM(quantity) FROM report_items
+                                         WHERE item_id IN ({",".join("?" * len(chunk))}) AND day >= ?
+                                         GROUP BY item_id''', chunk + [since]).fetchall())
+
+        result = []
+
+        for item_id, stock, reorder_point in low:
+            velocity = sold.get(item_id, 0) / days
+            target = math.ceil(velocity * (lead_days + cover_days))
+            result.append((item_id, stock, velocity, max(target - stock, reorder_point - stock + 1, 0)))
+
+        return result
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+from payments.providers import Payment, PaymentError, new_key
+
+
+class Dispatcher:
+    '''
+     Runs the payments of a sale on its own event loop thread.
+
+     Every tender of a split payment is charged concurrently, each call is cut
+     off after timeout seconds and retried with the same idempotency key, so a
+     retry after a lost answer never charges twice. When one tender fails the
+     ones already approved are refunded and the sale stays unpaid. A tender
+     where any attempt timed out or failed after reaching the acquirer is
+     "unknown": the acquirer may have charged it, so it is reversed by its
+     idempotency key like an approved one.
+
+     The till calls submit, which returns a concurrent.futures.Future right
+     away, so a slow acquirer never holds the till thread.
+    '''
+
+    def __init__(self, providers, timeout=15, retries=2, backoff=0.5):
+        '''
+         @param providers - Iterable of Provider, one per payment method.
+         @param timeout - Seconds each attempt may take.
+         @param retries - Attempts after the first one for retryable failures.
+         @param backoff - Seconds before the first retry, doubled on every retry.
+        '''
+        self.providers = {provider.name: provider for provider in providers}
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="payments", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = self._thread = None
+
+    def submit(self, total_cents, tenders, key=None):
+        '''
+         Schedules pay on the dispatcher's loop, starting it if needed.
+
+         @return A concurrent.futures.Future of the result of pay.
+        '''
+        self.start()
+
+        return asyncio.run_coroutine_threadsafe(self.pay(total_cents, tenders, key), self._loop)
+
+    async def pay(self, total_cents, tenders, key=None):
+        '''
+         Charges a sale split among one or more tenders.
+
+         Tenders must add up to the total, only cash may go over it and the
+         excess is given back as change.
+
+         @param total_cents - Amount due.
+         @param tenders - Iterable of (method, amount_cents).
+         @param key - Idempotency key of the sale, pass the same one to retry a whole sale.
+
+         @return A tuple (approved, payments, change_cents), payments is a list of Payment in tender order.
+        '''
+        key = key or new_key()
+        payments = [Payment(method, int(amount), f"{key}-{index}") for index, (method, amount) in enumerate(tenders)]
+        change = sum(payment.amount_cents for payment in payments) - total_cents
+        cash = sum(payment.amount_cents for payment in payments if payment.method == "cash")
+
+        for payment in payments:
+            if payment.method not in self.providers:
+                raise ValueError(f"no provider for {payment.method}")
+
+        if change < 0 or change > cash:
+            raise ValueError("tenders don't add up to the total")
+
+        await asyncio.gather(*(self.charge(payment) for payment in payments), return_exceptions=True)
+
+        for payment in payments:
+            if payment.status == "pending":
+                # charge itself blew up, the request may have reached the acquirer
+                payment.status = "unknown"
+
+        if all(payment.status == "approved" for payment in payments):
+            return True, payments, change
+
+        await asyncio.gather(*(self.refund(payment) for payment in payments if payment.status in ("approved", "unknown")))
+
+        return False, payments, 0
+
+    async def charge(self, payment):
+        provider = self.providers[payment.method]
+        delay = self.backoff
+        # once an attempt may have reached the acquirer the tender stays unknown, whatever later attempts answer
+        uncertain = False
+
+        while True:
+            payment.attempts += 1
+
+            try:
+                payment.reference = await asyncio.wait_for(provider.charge(payment.amount_cents, payment.key), self.timeout)
+                payment.status, payment.error = "approved", None
+                return payment
+
+            except asyncio.TimeoutError:
+                payment.error, retryable, uncertain = f"{payment.method} timed out", True, True
+
+            except PaymentError as e:
+                payment.error, retryable, uncertain = str(e), e.retryable, uncertain or e.uncertain
+
+            except Exception as e:
+                # a provider bug or a malformed answer, tried again like any transient failure
+                payment.error, retryable, uncertain = f"{payment.method} failed: {e!r}", True, True
+
+            if not retryable or payment.attempts > self.retries:
+                payment.status = "unknown" if uncertain else "failed"
+                return payment
+
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    async def refund(self, payment):
+        '''
+         Refunds an approved payment, keeping its reference so a failed refund can be done by hand.
+        '''
+        provider = self.providers[payment.method]
+        delay = self.backoff
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+            try:
+                await asyncio.wait_for(provider.refund(payment.reference, f"{payment.key}-refund", payment.key), self.timeout)
+                payment.status = "refunded"
+                return payment
+
+            except Exception as e:
+                payment.error = f"refund failed: {str(e) or 'timed out'}"
+
+        payment.status = "refund_failed"
+
+        return payment
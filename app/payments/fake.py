@@ -0,0 +1,143 @@
+import asyncio
+import itertools
+import json
+
+from payments.providers import close
+
+
+class FakeAcquirer:
+    '''
+     Local stand-in for the card and PIX acquirers, for development and tests.
+
+     Speaks the protocol HttpProvider expects and remembers every idempotency
+     key, so a repeated request gets the first answer and charges once.
+
+     @param delay - Seconds before answering, to try timeouts.
+     @param fail_every - Answer 503 to every nth request, 0 never.
+     @param drop_every - Process every nth request but close the connection without answering, 0 never.
+     @param decline_over - Decline charges above this amount in cents, None never.
+    '''
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0, fail_every=0, drop_every=0, decline_over=None):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.fail_every = fail_every
+        self.drop_every = drop_every
+        self.decline_over = decline_over
+        self.answers = {}
+        self.charges = {}
+        self.reversed = set()
+        self.requests = 0
+        self._references = itertools.count(1)
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, headers, body = await read_request(reader)
+            self.requests += 1
+
+            if self.delay:
+                await asyncio.sleep(self.delay)
+
+            if self.fail_every and self.requests % self.fail_every == 0:
+                status, answer = 503, {"reason": "try again"}
+
+            else:
+                status, answer = self.answer(path, headers.get("idempotency-key"), body)
+
+                if self.drop_every and self.requests % self.drop_every == 0:
+                    return
+
+            data = json.dumps(answer).encode()
+            writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                         "Connection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            await close(writer)
+
+    def answer(self, path, key, body):
+        if key in self.answers:
+            return self.answers[key]
+
+        if path == "/charges":
+            if key in self.reversed:
+                result = 402, {"reason": "reversed"}
+
+            elif self.decline_over is not None and body["amount_cents"] > self.decline_over:
+                result = 402, {"reason": "insufficient funds"}
+
+            else:
+                reference = f"{body['method']}-{next(self._references)}"
+                self.charges[reference] = body["amount_cents"]
+                result = 200, {"reference": reference}
+
+        elif path == "/refunds":
+            charge = self.answers.get(body.get("charge_key"))
+            reference = body.get("reference") or (charge[1].get("reference") if charge else None)
+
+            if reference is None:
+                # the charge hasn't arrived, make sure it never goes through
+                self.reversed.add(body.get("charge_key"))
+
+            self.charges.pop(reference, None)
+            result = 200, {"reference": reference}
+
+        else:
+            result = 404, {"reason": "not found"}
+
+        if key is not None:
+            self.answers[key] = result
+
+        return result
+
+
+async def read_request(reader):
+    '''
+     @return A tuple (method, path, headers, decoded JSON body) of one HTTP request.
+    '''
+    method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+    headers = {}
+
+    while True:
+        line = await reader.readline()
+
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    data = await reader.readexactly(length) if length else b""
+
+    return method, path, headers, json.loads(data) if data else {}
+
+
+async def serve(port=8099):
+    acquirer = await FakeAcquirer(port=port).start()
+    print(f"fake acquirer on {acquirer.url}")
+
+    await acquirer._server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
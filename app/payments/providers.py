@@ -0,0 +1,206 @@
+import abc
+import asyncio
+import json
+import uuid
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+
+class PaymentError(Exception):
+    '''
+     A provider couldn't process a payment. retryable tells whether trying again with the same key may succeed,
+     uncertain whether the acquirer may have processed the request anyway, e.g. the connection dropped after it was sent.
+    '''
+
+    def __init__(self, message, retryable=True, uncertain=False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.uncertain = uncertain
+
+
+class Declined(PaymentError):
+    '''
+     The acquirer refused the payment, trying again won't change that.
+    '''
+
+    def __init__(self, message):
+        super().__init__(message, retryable=False)
+
+
+@dataclass(slots=True)
+class Payment:
+    method: str = None
+    amount_cents: int = 0
+    key: str = None
+    status: str = "pending"
+    reference: str = None
+    error: str = None
+    attempts: int = 0
+
+
+class Provider(abc.ABC):
+    '''
+     Interface of a payment method. Providers are used from the dispatcher's
+     event loop, so charge and refund must never block.
+    '''
+    name = None
+
+    @abc.abstractmethod
+    async def charge(self, amount_cents, key):
+        '''
+         Charges amount_cents. A second call with the same key must not charge twice.
+
+         @return The provider's reference of the payment. Raises PaymentError.
+        '''
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def refund(self, reference, key, charge_key):
+        '''
+         Gives back a payment made through charge.
+
+         reference is None when the charge timed out, the provider then reverses
+         whatever charge_key did, or makes sure a late charge_key won't go through.
+        '''
+        raise NotImplementedError
+
+
+class Cash(Provider):
+    '''
+     Cash goes into the drawer, nothing to call.
+    '''
+    name = "cash"
+
+    async def charge(self, amount_cents, key):
+        return f"cash-{key}"
+
+    async def refund(self, reference, key, charge_key):
+        return reference
+
+
+class HttpProvider(Provider):
+    '''
+     Provider behind an acquirer's HTTP API.
+
+     Requests are JSON over HTTP/1.1 with asyncio streams, one connection per
+     request. The idempotency key travels in the Idempotency-Key header, the
+     acquirer answers a repeated key with the first result.
+     Responses: 200 approved, 402 declined, anything else is retried.
+    '''
+    name = None
+
+    def __init__(self, url):
+        self.url = urlsplit(url)
+
+        if self.url.scheme not in ("http", "https"):
+            raise ValueError(f"acquirer url must be http or https, not {url}")
+
+    async def charge(self, amount_cents, key):
+        body = await self.post("/charges", {"method": self.name, "amount_cents": amount_cents}, key)
+
+        if not isinstance(body, dict) or not body.get("reference"):
+            raise PaymentError(f"{self.name} acquirer approved without a reference", uncertain=True)
+
+        return body["reference"]
+
+    async def refund(self, reference, key, charge_key):
+        body = await self.post("/refunds", {"method": self.name, "reference": reference, "charge_key": charge_key}, key)
+        return body.get("reference")
+
+    async def post(self, path, payload, key):
+        data = json.dumps(payload).encode()
+        head = (f"POST {self.url.path.rstrip('/')}{path} HTTP/1.1\r\n"
+                f"Host: {self.url.netloc}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Idempotency-Key: {key}\r\n"
+                "Connection: close\r\n\r\n")
+
+        secure = self.url.scheme == "https"
+
+        try:
+            reader, writer = await asyncio.open_connection(self.url.hostname, self.url.port or (443 if secure else 80),
+                                                           ssl=True if secure else None)
+
+        except OSError as e:
+            raise PaymentError(f"{self.name} acquirer unreachable: {e}")
+
+        try:
+            writer.write(head.encode() + data)
+            await writer.drain()
+            status, body = await read_response(reader)
+
+        except Exception as e:
+            # the request may have been processed, e.g. the acquirer closed the connection without answering
+            raise PaymentError(f"{self.name} acquirer failed: {e!r}", uncertain=True)
+
+        finally:
+            await close(writer)
+
+        if status == 200:
+            return body
+
+        if status == 402:
+            raise Declined(body.get("reason", "declined") if isinstance(body, dict) else "declined")
+
+        raise PaymentError(f"{self.name} acquirer answered {status}", uncertain=status >= 500)
+
+
+class Card(HttpProvider):
+    name = "card"
+
+
+class Pix(HttpProvider):
+    '''
+     PIX style instant transfer, the acquirer only answers once the transfer settled.
+    '''
+    name = "pix"
+
+
+async def read_response(reader):
+    '''
+     Reads one HTTP response with a Content-Length body.
+
+     @return A tuple (status, decoded JSON body).
+    '''
+    status_line = await reader.readline()
+    parts = status_line.split()
+
+    if len(parts) < 2 or not parts[1].isdigit():
+        raise ValueError(f"no HTTP status in {status_line[:80]!r}")
+
+    status = int(parts[1])
+    length = 0
+
+    while True:
+        line = await reader.readline()
+
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        name, _, value = line.decode("latin-1").partition(":")
+
+        if name.strip().lower() == "content-length":
+            length = int(value)
+
+    data = await reader.readexactly(length) if length else b""
+
+    return status, json.loads(data) if data else {}
+
+
+async def close(writer):
+    '''
+     Closes a stream and waits until the transport let go of the socket. A peer
+     that already dropped the connection is not an error here.
+    '''
+    writer.close()
+
+    try:
+        await writer.wait_closed()
+
+    except OSError:
+        pass
+
+
+def new_key():
+    return uuid.uuid4().hex
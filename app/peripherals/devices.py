@@ -0,0 +1,196 @@
+import asyncio
+import collections
+import struct
+import time
+
+
+class Latency:
+    '''
+     Rolling record of the time from a scan reaching the till to its item being resolved.
+    '''
+
+    def __init__(self, size=1000):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        '''
+         @return A dictionary with count and the p50, p95, p99 and max of the recent samples in milliseconds.
+        '''
+        samples = sorted(self.samples)
+
+        if not samples:
+            return {"count": self.count}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return {"count": self.count, "p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99),
+                "max": round(samples[-1] * 1000, 3)}
+
+
+class Scanner:
+    '''
+     Barcode scanner in serial mode, each code ends with a carriage return or a line feed.
+
+     Every code is resolved as soon as it is read and handed to on_item
+     together with the item, None when the code is unknown.
+    '''
+
+    def __init__(self, port, resolve, on_item, latency=None):
+        '''
+         @param port - Port of the scanner.
+         @param resolve - Callable turning a barcode into an item, e.g. lambda code: Items.lookup(barcode=code),
+                          called on the loop's default executor.
+         @param on_item - Callable receiving (barcode, item).
+         @param latency - Latency to record scan to resolve times in.
+        '''
+        self.port = port
+        self.resolve = resolve
+        self.on_item = on_item
+        self.latency = latency or Latency()
+        self._pending = bytearray()
+
+    async def run(self):
+        '''
+         Reads codes until the device is gone.
+        '''
+        loop = asyncio.get_running_loop()
+
+        while True:
+            data = await self.port.read()
+
+            if not data:
+                return
+
+            codes = self.codes(data)
+
+            for code, arrived in zip(codes, self.arrivals(len(codes))):
+                # a cache miss reads the database, which may wait on a lock or the disk, so it runs
+                # on an executor thread and the other scanners, the scale and the printer go on
+                item = await loop.run_in_executor(None, self.resolve, code)
+                self.latency.record(time.perf_counter() - arrived)
+                self.on_item(code, item)
+
+    def arrivals(self, count):
+        '''
+         @return The perf_counter() time each of the last count codes reached the till.
+        '''
+        return [self.port.read_at] * count
+
+    def codes(self, data):
+        '''
+         Splits the input into complete codes, keeping a partial one for the next read.
+        '''
+        self._pending += data.replace(b"\n", b"\r")
+        *complete, self._pending[:] = self._pending.split(b"\r")
+
+        return [code.decode("ascii", "replace").strip() for code in complete if code.strip()]
+
+
+class HidScanner(Scanner):
+    '''
+     Scanner in HID keyboard mode, read from its evdev node, e.g. /dev/input/by-id/...-event-kbd.
+
+     Key presses are turned back into characters, Enter ends a code. A code
+     arrived when the kernel stamped its Enter event, so latency also counts
+     the time the event waited for the loop.
+    '''
+    EVENT = struct.Struct("llHHi")
+    KEY_DOWN = 1
+    ENTER = (28, 96)
+    SHIFT = (42, 54)
+    KEYS = {2: "1", 3: "2", 4: "3", 5: "4", 6: "5", 7: "6", 8: "7", 9: "8", 10: "9", 11: "0", 12: "-", 52: ".", 53: "/"}
+    KEYS.update(zip(range(16, 26), "qwertyuiop"))
+    KEYS.update(zip(range(30, 39), "asdfghjkl"))
+    KEYS.update(zip(range(44, 51), "zxcvbnm"))
+
+    def __init__(self, port, resolve, on_item, latency=None):
+        super().__init__(port, resolve, on_item, latency)
+        self._raw = bytearray()
+        self._shift = False
+        self._typed = 0
+        self._ends = []
+
+    def codes(self, data):
+        self._raw += data
+        size = HidScanner.EVENT.size
+        usable = len(self._raw) - len(self._raw) % size
+        text = []
+
+        for seconds, microseconds, kind, key, value in HidScanner.EVENT.iter_unpack(self._raw[:usable]):
+            if kind != 1:
+                continue
+
+            if key in HidScanner.SHIFT:
+                self._shift = value != 0
+
+            elif value == HidScanner.KEY_DOWN:
+                if key in HidScanner.ENTER:
+                    # an Enter with nothing typed before it doesn't make a code
+                    if self._typed:
+                        text.append("\r")
+                        # evdev stamps events with the wall clock, moved onto perf_counter
+                        self._ends.append(time.perf_counter() - (time.time() - seconds - microseconds / 1e6))
+                        self._typed = 0
+
+                elif key in HidScanner.KEYS:
+                    char = HidScanner.KEYS[key]
+                    text.append(char.upper() if self._shift else char)
+                    self._typed += 1
+
+        del self._raw[:usable]
+
+        return super().codes("".join(text).encode("ascii"))
+
+    def arrivals(self, count):
+        ends, self._ends = self._ends[:count], self._ends[count:]
+
+        return ends
+
+
+class Scale:
+    '''
+     Checkout scale answering weight requests, Toledo style: ENQ is sent and
+     the scale answers STX, the weight in kilograms, ETX. Answers made of I
+     or N mean the weight isn't stable yet.
+    '''
+    ENQ, STX, ETX = b"\x05", b"\x02", b"\x03"
+
+    def __init__(self, port, timeout=2):
+        self.port = port
+        self.timeout = timeout
+        self._lock = asyncio.Lock()
+        self._pending = bytearray()
+
+    async def weigh(self):
+        '''
+         @return The weight in grams, None if the scale isn't stable. Raises asyncio.TimeoutError if the scale didn't answer.
+        '''
+        async with self._lock:
+            self._pending.clear()
+            await self.port.write(Scale.ENQ)
+
+            return await asyncio.wait_for(self._answer(), self.timeout)
+
+    async def _answer(self):
+        while Scale.ETX not in self._pending:
+            data = await self.port.read()
+
+            if not data:
+                raise EOFError("scale is gone")
+
+            self._pending += data
+
+        frame = self._pending[:self._pending.index(Scale.ETX)]
+        frame = frame[frame.rfind(Scale.STX) + 1:].decode("ascii", "replace").strip()
+
+        try:
+            return round(float(frame.replace(",", ".")) * 1000)
+
+        except ValueError:
+            return None
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import termios
+import time
+import tty
+
+
+BAUDRATES = {1200: termios.B1200, 2400: termios.B2400, 4800: termios.B4800, 9600: termios.B9600,
+             19200: termios.B19200, 38400: termios.B38400, 57600: termios.B57600, 115200: termios.B115200}
+
+
+class Port:
+    '''
+     Non-blocking device file read and written from an asyncio loop.
+
+     Works with serial ports, USB CDC devices, pseudo-terminals and evdev
+     nodes alike: the descriptor is opened with O_NONBLOCK and the loop is
+     only asked to wake us up when it is readable or writable, so a silent
+     or slow device never holds the loop. Terminals are put in raw mode.
+    '''
+
+    def __init__(self, path, baudrate=None):
+        '''
+         @param path - Device file, e.g. /dev/ttyUSB0, /dev/input/event3 or a pty slave.
+         @param baudrate - Speed of a serial port, None to leave it as it is.
+        '''
+        self.path = path
+        # perf_counter() of the moment the data last read was known to be there, see read
+        self.read_at = None
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+
+        if os.isatty(self.fd):
+            tty.setraw(self.fd)
+
+            if baudrate is not None:
+                attributes = termios.tcgetattr(self.fd)
+                attributes[4] = attributes[5] = BAUDRATES[baudrate]
+                termios.tcsetattr(self.fd, termios.TCSANOW, attributes)
+
+    async def read(self, size=4096):
+        '''
+         Waits for data.
+
+         read_at is set to when the loop was woken up by the device, so time
+         the loop spent on other tasks before getting to us is counted, or to
+         now when the data was already waiting.
+
+         @return The bytes read, empty once the device is gone.
+        '''
+        loop = asyncio.get_running_loop()
+        woken = None
+
+        while True:
+            try:
+                data = os.read(self.fd, size)
+                self.read_at = woken or time.perf_counter()
+
+                return data
+
+            except BlockingIOError:
+                woken = await self._wait(loop.add_reader, loop.remove_reader)
+
+            except OSError:
+                # EIO once the other side of a pty or an unplugged device is gone
+                return b""
+
+    async def write(self, data):
+        '''
+         Writes all of data, waiting whenever the device's buffer is full.
+        '''
+        view = memoryview(data)
+        loop = asyncio.get_running_loop()
+
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+
+            except BlockingIOError:
+                await self._wait(loop.add_writer, loop.remove_writer)
+
+    async def _wait(self, add, remove):
+        ready = asyncio.get_running_loop().create_future()
+        add(self.fd, lambda: ready.done() or ready.set_result(time.perf_counter()))
+
+        try:
+            return await ready
+
+        finally:
+            remove(self.fd)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
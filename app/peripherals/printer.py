@@ -0,0 +1,176 @@
+import asyncio
+
+
+class Receipt:
+    '''
+     ESC/POS renderer writing in place into a buffer allocated up front, so a
+     long receipt never grows or copies a bytes object while it is built.
+
+     @param buffer - bytearray the receipt is rendered into, see Printer.
+     @param width - Characters per line, 48 on 80mm paper with font A, 32 on 58mm.
+    '''
+    INIT = b"\x1b@"
+    CODEPAGE = b"\x1bt\x02"
+    BOLD_ON, BOLD_OFF = b"\x1bE\x01", b"\x1bE\x00"
+    ALIGN = {"left": b"\x1ba\x00", "center": b"\x1ba\x01", "right": b"\x1ba\x02"}
+    CUT = b"\x1dVB\x00"
+    ENCODING = "cp850"
+
+    def __init__(self, buffer, width=48):
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        self.width = width
+        self.length = 0
+        self.put(Receipt.INIT + Receipt.CODEPAGE)
+
+    def put(self, data):
+        end = self.length + len(data)
+
+        if end > len(self.buffer):
+            raise OverflowError("receipt doesn't fit the printer buffer")
+
+        self.view[self.length:end] = data
+        self.length = end
+
+        return self
+
+    def text(self, text, bold=False, align="left"):
+        self.put(Receipt.ALIGN[align])
+
+        if bold:
+            self.put(Receipt.BOLD_ON)
+
+        self.put(text.encode(Receipt.ENCODING, "replace"))
+        self.put(b"\n")
+
+        if bold:
+            self.put(Receipt.BOLD_OFF)
+
+        return self
+
+    def columns(self, left, right):
+        '''
+         One line with left aligned to the left and right to the right, left is cut if both don't fit
+         and right is cut to the width when it doesn't fit by itself.
+        '''
+        right = right[:self.width]
+        room = self.width - len(right) - 1
+
+        if room < 0:
+            return self.text(right)
+
+        return self.text(f"{left[:room]:<{room}} {right}")
+
+    def rule(self):
+        return self.text("-" * self.width)
+
+    def cut(self, feed=4):
+        return self.put(b"\n" * feed + Receipt.CUT)
+
+    def data(self):
+        return self.view[:self.length]
+
+
+class Printer:
+    '''
+     Receipt printer fed from a queue on the peripherals loop.
+
+     print() renders the receipt into one of a few buffers allocated up front
+     and returns as soon as it is queued, a single writer task sends queued
+     receipts to the port in order. When every buffer is still waiting to be
+     printed, print() waits for one, so a jammed printer can't pile receipts
+     up in memory.
+    '''
+
+    def __init__(self, port, buffers=4, size=32 * 1024, width=48):
+        self.port = port
+        self.width = width
+        self.buffers = [bytearray(size) for _ in range(buffers)]
+        self.printed = 0
+        self._free = None
+        self._jobs = None
+        self._writer = None
+
+    def start(self):
+        '''
+         Starts the writer task, must run on the loop the printer is used from.
+        '''
+        self._free = asyncio.Queue()
+        self._jobs = asyncio.Queue()
+
+        for buffer in self.buffers:
+            self._free.put_nowait(buffer)
+
+        self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    async def stop(self):
+        '''
+         Waits for the queued receipts and stops the writer task.
+        '''
+        await self._jobs.join()
+        self._writer.cancel()
+
+    async def print(self, render):
+        '''
+         Queues a receipt.
+
+         @param render - Callable filling the Receipt it is given.
+
+         @return A future done once the receipt was sent to the printer.
+        '''
+        buffer = await self._free.get()
+
+        try:
+            receipt = Receipt(buffer, self.width)
+            render(receipt)
+
+        except Exception:
+            self._free.put_nowait(buffer)
+            raise
+
+        done = asyncio.get_running_loop().create_future()
+        self._jobs.put_nowait((receipt, done))
+
+        return done
+
+    async def _write(self):
+        while True:
+            receipt, done = await self._jobs.get()
+
+            try:
+                await self.port.write(receipt.data())
+                self.printed += 1
+
+                if not done.done():
+                    done.set_result(receipt.length)
+
+            except Exception as e:
+                # whatever went wrong belongs to this receipt, the writer carries on with the next one
+                if not done.done():
+                    done.set_exception(e)
+
+            finally:
+                self._free.put_nowait(receipt.buffer)
+                self._jobs.task_done()
+
+
+def sale_receipt(sale, lines, names, store="POS"):
+    '''
+     Builds the render callable of a sale for Printer.print.
+
+     @param sale - Sale header as returned by Sales.read.
+     @param lines - Sale lines as returned by Sales.read, (id, sale_id, item_id, quantity, unit_cents).
+     @param names - Mapping of item id to the name printed.
+    '''
+    def money(cents):
+        return f"{cents / 100:.2f}"
+
+    def render(receipt):
+        receipt.text(store, bold=True, align="center").text(f"Sale {sale[0]}", align="center").rule()
+
+        for _, _, item_id, quantity, unit_cents in lines:
+            receipt.columns(f"{quantity} x {names.get(item_id, item_id)}", money(quantity * unit_cents))
+
+        receipt.rule().columns("TOTAL", money(sale[4])).cut()
+
+    return render
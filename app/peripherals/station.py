@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from peripherals.devices import Latency
+
+
+class Station:
+    '''
+     Runs the devices of one till on their own event loop thread.
+
+     Scanners, the scale and the printer are tasks on that loop, so a long
+     receipt or a scale that takes its time never delays the next scan. The
+     till thread talks to them through the thread safe methods below, which
+     return concurrent.futures.Future.
+    '''
+
+    def __init__(self):
+        self.latency = Latency()
+        self.scanners = []
+        self.scale = None
+        self.printer = None
+        self._loop = None
+        self._thread = None
+        self._tasks = []
+
+    def start(self, scanners=(), scale=None, printer=None):
+        '''
+         @param scanners - Scanner or HidScanner objects, their latency is recorded in Station.latency.
+         @param scale - Scale or None.
+         @param printer - Printer or None.
+        '''
+        self.scanners, self.scale, self.printer = list(scanners), scale, printer
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="peripherals", daemon=True)
+        self._thread.start()
+
+        for scanner in self.scanners:
+            scanner.latency = self.latency
+
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self):
+        self._tasks = [asyncio.get_running_loop().create_task(scanner.run()) for scanner in self.scanners]
+
+        if self.printer is not None:
+            self.printer.start()
+
+    def stop(self):
+        '''
+         Lets the printer finish its queue, then stops the loop and closes the ports.
+        '''
+        if self._loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = None
+
+        for device in self.scanners + [self.scale, self.printer]:
+            if device is not None:
+                device.port.close()
+
+    async def _stop(self):
+        if self.printer is not None:
+            await self.printer.stop()
+
+        for task in self._tasks:
+            task.cancel()
+
+    def print(self, render):
+        '''
+         Queues a receipt, see Printer.print.
+
+         @return A Future of the number of bytes sent, done once the receipt is printed.
+        '''
+        return asyncio.run_coroutine_threadsafe(self._print(render), self._loop)
+
+    async def _print(self, render):
+        return await (await self.printer.print(render))
+
+    def weigh(self):
+        '''
+         @return A Future of the weight in grams, see Scale.weigh.
+        '''
+        return asyncio.run_coroutine_threadsafe(self.scale.weigh(), self._loop)
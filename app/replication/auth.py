@@ -0,0 +1,55 @@
+import hashlib
+import hmac
+import time
+
+
+# seconds a signed request stays valid, tills need a clock within this of HQ's
+WINDOW = 300
+
+
+def signature(secret, method, path, timestamp, body=b""):
+    '''
+     HMAC-SHA256 of a request, sent by the till in X-Signature along with X-Till and X-Timestamp.
+
+     @param secret - The till's secret, as bytes or str, known to the till and to HQ.
+     @param path - Path with the query string, e.g. "/deltas?till=t1&after=...".
+    '''
+    secret = secret.encode() if isinstance(secret, str) else secret
+    message = f"{method}\n{path}\n{timestamp}\n".encode() + hashlib.sha256(body).hexdigest().encode()
+
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def headers(till, secret, method, path, body=b""):
+    timestamp = str(int(time.time()))
+
+    return {"X-Till": till, "X-Timestamp": timestamp, "X-Signature": signature(secret, method, path, timestamp, body)}
+
+
+def verify(secrets, headers, method, path, body=b""):
+    '''
+     @param secrets - Mapping of till name to its secret.
+     @param headers - Headers of the request.
+
+     @return The name of the till that signed the request, None if it isn't signed by a known till within WINDOW.
+    '''
+    till = headers.get("X-Till")
+    timestamp = headers.get("X-Timestamp", "")
+    secret = secrets.get(till)
+
+    if secret is None or not timestamp.isdigit() or abs(time.time() - int(timestamp)) > WINDOW:
+        return None
+
+    expected = signature(secret, method, path, timestamp, body)
+
+    if not hmac.compare_digest(headers.get("X-Signature", "").encode("utf-8", "replace"), expected.encode()):
+        return None
+
+    return till
+
+
+def parse(text):
+    '''
+     Reads the till secrets from "t1=secret1,t2=secret2", the format of POS_REPLICATION_TILLS.
+    '''
+    return dict(pair.strip().split("=", 1) for pair in text.split(",") if "=" in pair)
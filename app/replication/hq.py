@@ -0,0 +1,263 @@
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from database.connection import conn as c
+from integration.feed import feeds as default_feeds
+from replication import auth
+from inventory.controller.items_controller import Items
+from sales.controller.sales_controller import Sales
+
+
+# what the tills keep a replica of, users and sales stay at HQ
+REPLICATED = ("items", "clients")
+
+
+class HQ:
+    '''
+     Replication endpoint the tills sync with.
+
+     GET /deltas?till=<name>&after=<json vector> answers the changes to items
+     and clients past the till's version vector, one change log seq per feed,
+     so a till only downloads the rows changed since its last pull. The vector
+     a till sends is what it applied, it becomes the till's checkpoint in the
+     feed, so Feed.prune keeps what the till hasn't pulled yet. A till behind
+     the pruned log, e.g. new or back after a long time offline, gets a
+     snapshot of every item and client of that feed instead.
+
+     POST /sales takes a gzip compressed batch of sales made at a till. Each
+     till's last uploaded local sale id is kept in replica_uploads within the
+     same transaction as the sales, so a batch sent twice is applied once.
+     Stock conflicts are avoided rather than resolved: a sale carries the
+     quantities sold, not the resulting stock, and HQ decrements its own count,
+     so sales of several tills add up whatever order they arrive in. A sale
+     HQ can't apply, e.g. of an item deleted at HQ since, is set aside in
+     replica_rejected for someone to look at, so it doesn't hold back the
+     till's later sales, see rejected.
+
+     Every request must be signed by a till with its secret, see
+     replication.auth. Requests from unknown tills, with a bad signature or
+     a timestamp out of the window are answered 401.
+    '''
+
+    def __init__(self, secrets, host="127.0.0.1", port=0, feeds=None, limit=1000):
+        '''
+         @param secrets - Mapping of till name to its secret.
+         @param host - Address to listen on, only this machine by default.
+        '''
+        if not secrets:
+            raise ValueError("the replication endpoint needs the secret of at least one till")
+
+        self.secrets = dict(secrets)
+        self.feeds = default_feeds() if feeds is None else feeds
+        self.limit = limit
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="replication-hq", daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def deltas(self, vector, till=None):
+        '''
+         @param vector - Mapping of feed name to the last seq the till applied.
+         @param till - Name of the till, its checkpoints are kept under "till:<name>".
+
+         @return A tuple (vector after these changes, changes, whether more are waiting, entities sent as a snapshot).
+        '''
+        vector = dict(vector)
+        changes = []
+        more = False
+        snapshot = []
+
+        for feed in self.feeds:
+            after = vector.get(feed.name, 0)
+
+            if till is not None:
+                feed.advance(f"till:{till}", after)
+
+            if feed.behind(after):
+                entities = [entity for entity in feed.name.split("+") if entity in REPLICATED]
+                vector[feed.name], rows = feed.snapshot(entities)
+                changes += rows
+                snapshot += entities
+                continue
+
+            last, batch = feed.read(after, self.limit)
+            vector[feed.name] = last
+            changes += [change for change in batch if change["entity"] in REPLICATED]
+            more = more or last - after >= self.limit
+
+        for feed in self.feeds:
+            feed.prune()
+
+        return vector, changes, more, snapshot
+
+    def receive(self, till, sales):
+        '''
+         Applies a batch of sales from a till, skipping those already applied.
+
+         @param sales - List of dicts with the local id, lines and the arguments of Sales.write.
+
+         @return A tuple (last local sale id of the till applied, local ids of the sales set aside).
+        '''
+        conn = c(Items.DB)
+        items = set()
+        rejected = []
+        committed = False
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT last_sale FROM replica_uploads WHERE till = ?", (till,)).fetchone()
+            done = row[0] if row else 0
+
+            for sale in sales:
+                if sale["id"] <= done:
+                    continue
+
+                conn.execute("SAVEPOINT sale")
+
+                try:
+                    sale_id = Sales.write(conn, sale["lines"], sale["user_id"], sale["client_id"], sale["shift"],
+                                          sale["discount_cents"], sale["tax_cents"], sale["created_at"])
+                    conn.execute("UPDATE sales SET till = ? WHERE id = ?", (till, sale_id))
+                    items.update(item_id for item_id, _, _ in Sales.check(sale["lines"]))
+
+                except sqlite3.OperationalError:
+                    # the database, not the sale, the whole batch is tried again
+                    raise
+
+                except Exception as e:
+                    # already sold at the till, set aside instead of blocking every later sale of the till
+                    conn.execute("ROLLBACK TO sale")
+                    conn.execute('''INSERT OR IGNORE INTO replica_rejected (till, sale, data, reason, at) VALUES (?,?,?,?,?)''',
+                                 (till, sale["id"], json.dumps(sale), str(e) or type(e).__name__, time.time()))
+                    rejected.append(sale["id"])
+
+                conn.execute("RELEASE sale")
+                done = sale["id"]
+
+            conn.execute('''INSERT INTO replica_uploads (till, last_sale) VALUES (?,?)
+                            ON CONFLICT (till) DO UPDATE SET last_sale = excluded.last_sale''', (till, done))
+            conn.commit()
+            committed = True
+
+        finally:
+            if not committed:
+                conn.rollback()
+
+        for item_id in items:
+            Items.cache.invalidate(item_id)
+
+        Items.low_stock.refresh(items)
+
+        return done, rejected
+
+    @staticmethod
+    def rejected(till=None):
+        '''
+         Sales of the tills set aside by receive.
+
+         @return A list of (till, local sale id, sale as a dict, reason, time it was set aside).
+        '''
+        query = "SELECT till, sale, data, reason, at FROM replica_rejected"
+        params = ()
+
+        if till is not None:
+            query, params = query + " WHERE till = ?", (till,)
+
+        rows = c(Items.DB).execute(query + " ORDER BY id", params).fetchall()
+
+        return [(till, sale, json.loads(data), reason, at) for till, sale, data, reason, at in rows]
+
+    def _handler(self):
+        hq = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                till = auth.verify(hq.secrets, self.headers, "GET", self.path)
+
+                if till is None:
+                    return self.answer(401, {"reason": "unknown till or bad signature"})
+
+                if url.path != "/deltas":
+                    return self.answer(404, {})
+
+                try:
+                    vector = dict(json.loads(parse_qs(url.query).get("after", ["{}"])[0]))
+
+                except (ValueError, TypeError) as e:
+                    return self.answer(400, {"reason": str(e)})
+
+                vector, changes, more, snapshot = hq.deltas(vector, till)
+                self.answer(200, {"vector": vector, "changes": changes, "more": more, "snapshot": snapshot})
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                till = auth.verify(hq.secrets, self.headers, "POST", self.path, data)
+
+                if till is None:
+                    return self.answer(401, {"reason": "unknown till or bad signature"})
+
+                if self.path != "/sales":
+                    return self.answer(404, {})
+
+                try:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        data = gzip.decompress(data)
+
+                    sales = json.loads(data)["sales"]
+
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    return self.answer(400, {"reason": str(e)})
+
+                try:
+                    # the till signing the request, whatever the body says
+                    last, rejected = hq.receive(till, sales)
+                    self.answer(200, {"last_sale": last, "rejected": rejected})
+
+                except (sqlite3.Error, KeyError, TypeError) as e:
+                    self.answer(503 if isinstance(e, sqlite3.OperationalError) else 422, {"reason": str(e)})
+
+            def answer(self, status, body):
+                data = json.dumps(body, separators=(",", ":")).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+
+                if "gzip" in self.headers.get("Accept-Encoding", "") and len(data) > 1024:
+                    data = gzip.compress(data)
+                    self.send_header("Content-Encoding", "gzip")
+
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # POS_REPLICATION_TILLS="t1=secret1,t2=secret2", POS_REPLICATION_HOST to listen beyond this machine
+    hq = HQ(auth.parse(os.environ.get("POS_REPLICATION_TILLS", "")),
+            host=os.environ.get("POS_REPLICATION_HOST", "127.0.0.1"), port=8097).start()
+    print(f"replication endpoint on {hq.url}")
+    hq._thread.join()
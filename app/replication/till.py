@@ -0,0 +1,334 @@
+import gzip
+import json
+import os
+import random
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from clients.controller.client_controller import Client
+from database.connection import conn as c
+from integration.feed import feeds as default_feeds
+from inventory.controller.items_controller import Items
+from replication import auth
+
+
+ITEM_COLUMNS = ("id", "code", "name", "manufacturer", "barcode", "quantity_in_stock", "value", "reorder_point")
+CLIENT_COLUMNS = ("id", "name", "cpf", "address", "telephone", "email")
+
+# unique keys besides id, and how a row gives them up while a batch from HQ is written
+UNIQUE = {"items": ("code", "barcode"), "clients": ("cpf",)}
+RELEASE = {"items": "code = '~' || id, barcode = NULL", "clients": "cpf = '~' || id"}
+
+# rows created at a till get ids from here up, HQ's rows stay below
+LOCAL_IDS = 1 << 40
+
+
+def upsert(table, columns):
+    assignments = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {assignments}")
+
+
+def holders(conn, entity, columns, rows):
+    '''
+     Finds the local rows holding a unique key that rows from HQ are about to take.
+
+     @param rows - Rows from HQ as lists of the values of columns, id first.
+
+     @return A dictionary of the id of each holder to the id of the row from HQ taking its key.
+    '''
+    taken = {}
+
+    for key in UNIQUE[entity]:
+        index = columns.index(key)
+        wanted = {row[index]: row[0] for row in rows if row[index] is not None}
+        values = list(wanted)
+
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+
+            for row_id, value in conn.execute(f"SELECT id, {key} FROM {entity} WHERE {key} IN ({','.join('?' * len(chunk))})", chunk):
+                if row_id != wanted[value]:
+                    taken[row_id] = wanted[value]
+
+    return taken
+
+
+def write(conn, entity, columns, changes, taken):
+    '''
+     Deletes and upserts a batch of rows from HQ, within the caller's transaction.
+
+     The rows of the batch and the rows of HQ holding their keys give them up
+     first, so keys swapped between rows at HQ, e.g. two barcodes exchanged
+     through a temporary one, apply in any order. A row of HQ giving up its
+     key changed at HQ too, its own change sets the key again. Rows created
+     at the till holding a key of HQ are the same client or item registered
+     twice, they are merged into HQ's, see Replica.apply.
+    '''
+    rows = [[change["data"][column] for column in columns] for change in changes if change["op"] != "delete"]
+    gone = [change["id"] for change in changes if change["op"] == "delete"]
+    gone += [row_id for row_id in taken if row_id >= LOCAL_IDS]
+    released = [row[0] for row in rows] + [row_id for row_id in taken if row_id < LOCAL_IDS]
+
+    conn.executemany(f"DELETE FROM {entity} WHERE id = ?", [(row_id,) for row_id in gone])
+    conn.executemany(f"UPDATE {entity} SET {RELEASE[entity]} WHERE id = ?", [(row_id,) for row_id in released])
+    conn.executemany(upsert(entity, columns), rows)
+
+
+def reserve(conn, table):
+    '''
+     Makes the rows created at the till take their ids from LOCAL_IDS up, see Replica.
+    '''
+    with conn:
+        conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?", (LOCAL_IDS - 1, table, LOCAL_IDS - 1))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                     (table, LOCAL_IDS - 1, table))
+
+
+class Replica:
+    '''
+     Keeps the till's items and clients in step with HQ and sends it the till's sales.
+
+     The till rings sales on its own databases as always, so it keeps selling
+     with the network down. pull() downloads only the items and clients changed
+     since the version vector kept in replica_state. push() uploads the sales
+     made since the last acknowledged one in gzip batches.
+
+     Items and clients are owned by HQ, a change from HQ overwrites the local
+     row. Stock is the exception: HQ's count doesn't know about the sales the
+     till hasn't uploaded yet, so the local count is HQ's minus the quantities
+     of those sales.
+
+     Items and clients created at the till, e.g. a client registered at the
+     counter, get ids from LOCAL_IDS up so they never collide with HQ's, and
+     a snapshot from HQ leaves them alone. They stay at the till, HQ sets
+     aside an uploaded sale of an item it doesn't know. When HQ sends a row
+     with the CPF, code or barcode of one of them, it is the same client or
+     item: the local row is dropped and the sales not uploaded yet follow
+     HQ's id.
+    '''
+
+    def __init__(self, url, till, secret=None, batch_size=500, interval=30, timeout=10, backoff=5, max_backoff=300):
+        '''
+         @param url - Address of replication.hq.HQ.
+         @param till - Name of this till, unique per store.
+         @param secret - Secret HQ knows this till by, defaults to POS_REPLICATION_SECRET.
+         @param batch_size - Sales per upload.
+         @param interval - Seconds between syncs.
+        '''
+        self.url = url.rstrip("/")
+        self.till = till
+        self.secret = secret or os.environ.get("POS_REPLICATION_SECRET")
+
+        if not self.secret:
+            raise ValueError("the till needs its replication secret")
+
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.online = False
+        self.last_error = None
+        self.rejected = []
+        self._stop = threading.Event()
+        self._thread = None
+
+        for table, path in (("items", Items.DB), ("clients", Client.DB)):
+            reserve(c(path), table)
+
+    def state(self, name):
+        row = c(Items.DB).execute("SELECT seq FROM replica_state WHERE name = ?", (name,)).fetchone()
+
+        return row[0] if row else 0
+
+    def vector(self):
+        rows = c(Items.DB).execute("SELECT name, seq FROM replica_state WHERE name LIKE 'feed:%'").fetchall()
+
+        return {name[5:]: seq for name, seq in rows}
+
+    def _request(self, request):
+        path = request.selector
+        body = request.data or b""
+
+        for name, value in auth.headers(self.till, self.secret, request.get_method(), path, body).items():
+            request.add_header(name, value)
+
+        request.add_header("Accept-Encoding", "gzip")
+
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = response.read()
+
+            if response.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+
+        return json.loads(data)
+
+    def pull(self):
+        '''
+         Applies the item and client changes from HQ until caught up.
+
+         @return The number of rows changed.
+        '''
+        applied = 0
+
+        while True:
+            query = urllib.parse.urlencode({"after": json.dumps(self.vector())})
+            answer = self._request(urllib.request.Request(f"{self.url}/deltas?{query}"))
+            applied += self.apply(answer["changes"], answer["vector"], answer.get("snapshot", ()))
+
+            if not answer["more"]:
+                return applied
+
+    def apply(self, changes, vector, snapshot=()):
+        '''
+         Writes a batch of changes and the new version vector in one transaction.
+
+         @param snapshot - Entities whose every row is in changes, see HQ.deltas, rows missing from it are deleted.
+        '''
+        items = [change for change in changes if change["entity"] == "items"]
+        clients = [change for change in changes if change["entity"] == "clients"]
+        items_db, clients_db = c(Items.DB), c(Client.DB)
+
+        for entity, conn, rows in (("items", items_db, items), ("clients", clients_db, clients)):
+            if entity in snapshot:
+                kept = {change["id"] for change in rows}
+                gone = [row_id for (row_id,) in conn.execute(f"SELECT id FROM {entity} WHERE id < ?", (LOCAL_IDS,)) if row_id not in kept]
+                rows += [{"entity": entity, "id": row_id, "op": "delete", "data": None} for row_id in gone]
+
+        taken = holders(clients_db, "clients", CLIENT_COLUMNS,
+                        [[change["data"][column] for column in CLIENT_COLUMNS] for change in clients if change["op"] != "delete"])
+        merged = [(hq_id, row_id) for row_id, hq_id in taken.items() if row_id >= LOCAL_IDS]
+
+        # sales first, a crash before the clients commit only makes the next pull merge them again
+        if merged:
+            with items_db:
+                items_db.executemany("UPDATE sales SET client_id = ? WHERE client_id = ?", merged)
+
+        # clients before items, a crash in between only makes the next pull send them again
+        with clients_db:
+            write(clients_db, "clients", CLIENT_COLUMNS, clients, taken)
+
+        with items_db:
+            taken = holders(items_db, "items", ITEM_COLUMNS,
+                            [[change["data"][column] for column in ITEM_COLUMNS] for change in items if change["op"] != "delete"])
+            items_db.executemany("UPDATE sale_lines SET item_id = ? WHERE item_id = ?",
+                                 [(hq_id, row_id) for row_id, hq_id in taken.items() if row_id >= LOCAL_IDS])
+            pending = self.pending(items_db)
+            stocked = [change if change["op"] == "delete" else
+                       dict(change, data=dict(change["data"], quantity_in_stock=change["data"]["quantity_in_stock"] - pending.get(change["id"], 0)))
+                       for change in items]
+
+            write(items_db, "items", ITEM_COLUMNS, stocked, taken)
+            items_db.executemany('''INSERT INTO replica_state (name, seq) VALUES (?,?)
+                                    ON CONFLICT (name) DO UPDATE SET seq = excluded.seq''',
+                                 [(f"feed:{name}", seq) for name, seq in vector.items()])
+
+        changed = {change["id"] for change in items} | set(taken)
+
+        for item_id in changed:
+            Items.cache.invalidate(item_id)
+
+        if clients:
+            Client.recent.clear()
+
+        Items.low_stock.refresh(changed)
+
+        return len(changes)
+
+    def pending(self, conn):
+        '''
+         @return A dictionary of item id to the quantity sold in sales not uploaded yet.
+        '''
+        return dict(conn.execute("SELECT item_id, SUM(quantity) FROM sale_lines WHERE sale_id > ? GROUP BY item_id",
+                                 (self.state("uploaded"),)).fetchall())
+
+    def push(self):
+        '''
+         Uploads the sales HQ hasn't acknowledged yet.
+
+         @return The number of sales uploaded.
+        '''
+        conn = c(Items.DB)
+        uploaded = 0
+
+        while True:
+            after = self.state("uploaded")
+            sales = conn.execute('''SELECT id, user_id, client_id, shift, discount_cents, tax_cents, created_at FROM sales
+                                    WHERE id > ? ORDER BY id LIMIT ?''', (after, self.batch_size)).fetchall()
+
+            if not sales:
+                return uploaded
+
+            lines = {}
+
+            for sale_id, item_id, quantity, unit_cents in conn.execute('''SELECT sale_id, item_id, quantity, unit_cents FROM sale_lines
+                                                                         WHERE sale_id > ? AND sale_id <= ? ORDER BY id''',
+                                                                      (after, sales[-1][0])):
+                lines.setdefault(sale_id, []).append([item_id, quantity, unit_cents])
+
+            batch = {"sales": [{"id": sale[0], "user_id": sale[1], "client_id": sale[2], "shift": sale[3],
+                                                   "discount_cents": sale[4], "tax_cents": sale[5], "created_at": sale[6],
+                                                   "lines": lines.get(sale[0], [])} for sale in sales]}
+            request = urllib.request.Request(f"{self.url}/sales", method="POST",
+                                             data=gzip.compress(json.dumps(batch, separators=(",", ":")).encode()),
+                                             headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+            answer = self._request(request)
+            last = answer["last_sale"]
+            # set aside at HQ, see HQ.rejected, the till's stock follows HQ's on the next pull
+            self.rejected += answer.get("rejected", [])
+
+            with conn:
+                conn.execute('''INSERT INTO replica_state (name, seq) VALUES ('uploaded', ?)
+                                ON CONFLICT (name) DO UPDATE SET seq = MAX(seq, excluded.seq)''', (last,))
+
+            uploaded += len(sales)
+
+    def sync(self):
+        '''
+         Uploads the pending sales, then pulls HQ's changes, so the stock HQ sends already counts them.
+
+         Then prunes the till's own change log, which nothing reads unless an
+         integration.worker.Exporter registered for it.
+
+         @return A tuple (sales uploaded, rows changed).
+        '''
+        result = self.push(), self.pull()
+
+        for feed in default_feeds():
+            feed.prune()
+
+        return result
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replication", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._stop.clear()
+
+    def _run(self):
+        delay = self.backoff
+
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self.online, delay = True, self.backoff
+                self._stop.wait(self.interval)
+
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                # offline or HQ refused, the till keeps selling on its replica
+                self.online, self.last_error = False, e
+                self._stop.wait(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.max_backoff)
@@ -0,0 +1,127 @@
+import numpy as np
+
+from database.connection import conn as c
+from inventory.controller.items_controller import Items
+
+
+class Lines:
+    '''
+     Columns of the sale lines in a time range, as NumPy arrays.
+    '''
+    __slots__ = ("item_id", "quantity", "cents", "created_at")
+
+    def __init__(self, item_id, quantity, cents, created_at):
+        self.item_id = item_id
+        self.quantity = quantity
+        self.cents = cents
+        self.created_at = created_at
+
+    def __len__(self):
+        return len(self.item_id)
+
+
+class Analytics:
+    '''
+     Vectorised analytics over historical sale lines.
+
+     Lines are loaded in chunks straight into arrays; group-bys are
+     np.bincount over item ids and np.add.reduceat over time buckets, so no
+     Python loop runs per sale line.
+    '''
+
+    @staticmethod
+    def load(start, end, batch_size=100_000):
+        '''
+         Loads the sale lines of sales made between two unix timestamps, start included and end excluded.
+
+         @return A Lines object.
+        '''
+        cursor = c(Items.DB).execute('''SELECT l.item_id, l.quantity, l.quantity * l.unit_cents, s.created_at
+                                        FROM sales s JOIN sale_lines l ON l.sale_id = s.id
+                                        WHERE s.created_at >= ? AND s.created_at < ?
+                                        ORDER BY s.created_at''', (start, end))
+        chunks = []
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+
+            if not rows:
+                break
+
+            chunks.append(np.array(rows, dtype=np.float64))
+
+        data = np.concatenate(chunks) if chunks else np.empty((0, 4))
+
+        return Lines(data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2].astype(np.int64), data[:, 3])
+
+    @staticmethod
+    def by_item(lines):
+        '''
+         @return A tuple (quantity, cents) of arrays indexed by item id.
+        '''
+        if not len(lines):
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+
+        quantity = np.bincount(lines.item_id, weights=lines.quantity).astype(np.int64)
+        cents = np.bincount(lines.item_id, weights=lines.cents).astype(np.int64)
+
+        return quantity, cents
+
+    @staticmethod
+    def by_period(lines, seconds=86400, offset=0):
+        '''
+         Totals per time bucket, lines must be ordered by created_at as load returns them.
+
+         @param seconds - Size of a bucket, 3600 for hours, 86400 for days.
+         @param offset - Seconds added to the timestamps first, e.g. the UTC offset for local days.
+
+         @return A tuple (bucket starts, cents) of arrays, only buckets with sales are present.
+        '''
+        if not len(lines):
+            return np.zeros(0), np.zeros(0, np.int64)
+
+        buckets = np.floor((lines.created_at + offset) / seconds)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+        return buckets[starts] * seconds - offset, np.add.reduceat(lines.cents, starts)
+
+    @staticmethod
+    def moving_average(values, window):
+        '''
+         Trailing moving average, the first window - 1 values average what is available.
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        sums = np.cumsum(values)
+        sums[window:] = sums[window:] - sums[:-window]
+        counts = np.minimum(np.arange(1, len(values) + 1), window)
+
+        return sums / counts
+
+    @staticmethod
+    def top_items(lines, n=10, by="cents"):
+        '''
+         @return A list of (item_id, quantity, cents) of the n best selling items, by "cents" or "quantity".
+        '''
+        quantity, cents = Analytics.by_item(lines)
+        key = cents if by == "cents" else quantity
+        n = min(n, np.count_nonzero(key))
+        best = np.argpartition(-key, n - 1)[:n] if n else np.zeros(0, np.int64)
+        best = best[np.argsort(-key[best], kind="stable")]
+
+        return [(int(item_id), int(quantity[item_id]), int(cents[item_id])) for item_id in best]
+
+    @staticmethod
+    def compare_periods(first, second):
+        '''
+         Compares the sales per item of two periods.
+
+         @param first - Lines of the first period.
+         @param second - Lines of the second period.
+
+         @return An array of cents per item of second minus first, indexed by item id.
+        '''
+        _, before = Analytics.by_item(first)
+        _, after = Analytics.by_item(second)
+        size = max(len(before), len(after))
+
+        return np.pad(after, (0, size - len(after))) - np.pad(before, (0, size - len(before)))
@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+from database import bulk
+from database.connection import conn as c, joined
+from inventory.controller.items_controller import Items
+
+
+class Reports:
+    '''
+     Sales and inventory reports read from the rollup tables.
+
+     Every report returns a generator streaming rows with fetchmany, pass it
+     to Reports.to_csv to export it without holding it in memory. Ranges are
+     inclusive and use the keys of the rollups, "YYYY-MM-DD" or "YYYY-MM-DD HH".
+     Reports run on database.connection.joined, so names of cashiers, clients
+     and items are joined in the same statement.
+
+     total_cents is what the sales were paid, after the basket discount and
+     with tax, in by_hour, by_day, by_cashier, by_client and sales. by_item
+     can't split a basket's discount or tax among its lines, so its total_cents
+     is the gross quantity * unit_cents of the lines; the items of a day add
+     up to that day's total plus its discount_cents minus its tax_cents.
+    '''
+
+    COLUMNS = {
+        "by_hour": ("hour", "sales", "quantity", "total_cents"),
+        "by_day": ("day", "sales", "total_cents", "discount_cents", "tax_cents"),
+        "by_item": ("item_id", "name", "quantity", "total_cents"),
+        "by_cashier": ("user_id", "name", "sales", "total_cents"),
+        "by_client": ("client_id", "name", "sales", "total_cents"),
+        "sales": ("id", "created_at", "cashier", "client", "cpf", "total_cents"),
+        "inventory_valuation": ("id", "code", "name", "quantity_in_stock", "value", "valuation"),
+    }
+
+    @staticmethod
+    def _stream(query, params=(), batch_size=bulk.BATCH_SIZE):
+        '''
+         Runs a report query. A failing query raises its sqlite3.Error here rather
+         than being handed back in place of the rows, which to_csv would iterate.
+        '''
+        return bulk.stream(joined().execute(query, params), batch_size)
+
+    @staticmethod
+    def by_hour(start, end):
+        '''
+         Streams sales, quantity sold and net total_cents per hour.
+        '''
+        return Reports._stream("SELECT hour, sales, quantity, total_cents FROM report_hourly WHERE hour BETWEEN ? AND ? ORDER BY hour",
+                               (start, end))
+
+    @staticmethod
+    def by_day(start, end):
+        return Reports._stream('''SELECT key, sales, total_cents, discount_cents, tax_cents FROM sales_totals
+                                  WHERE period = 'day' AND key BETWEEN ? AND ? ORDER BY key''', (start, end))
+
+    @staticmethod
+    def by_item(start, end):
+        '''
+         Streams quantity sold and gross total_cents per item, best sellers first.
+        '''
+        return Reports._stream('''SELECT r.item_id, i.name, r.quantity, r.total_cents
+                                  FROM (SELECT item_id, SUM(quantity) AS quantity, SUM(total_cents) AS total_cents FROM report_items
+                                        WHERE day BETWEEN ? AND ? GROUP BY item_id) AS r
+                                  LEFT JOIN items i ON i.id = r.item_id ORDER BY r.total_cents DESC''', (start, end))
+
+    @staticmethod
+    def by_cashier(start, end):
+        return Reports._stream('''SELECT r.user_id, u.name, r.sales, r.total_cents
+                                  FROM (SELECT user_id, SUM(sales) AS sales, SUM(total_cents) AS total_cents FROM report_cashiers
+                                        WHERE day BETWEEN ? AND ? GROUP BY user_id) AS r
+                                  LEFT JOIN users u ON u.id = r.user_id ORDER BY r.total_cents DESC''', (start, end))
+
+    @staticmethod
+    def by_client(start, end):
+        return Reports._stream('''SELECT r.client_id, cl.name, r.sales, r.total_cents
+                                  FROM (SELECT client_id, SUM(sales) AS sales, SUM(total_cents) AS total_cents FROM report_clients
+                                        WHERE day BETWEEN ? AND ? GROUP BY client_id) AS r
+                                  LEFT JOIN clients cl ON cl.id = r.client_id ORDER BY r.total_cents DESC''', (start, end))
+
+    @staticmethod
+    def sales(start, end):
+        '''
+         Streams every sale of the days from start to end with its cashier and client.
+        '''
+        first = time.mktime(time.strptime(start, "%Y-%m-%d"))
+        year, month, day = time.strptime(end, "%Y-%m-%d")[:3]
+        # midnight after end, mktime rolls day + 1 over months and follows DST
+        after = time.mktime((year, month, day + 1, 0, 0, 0, 0, 0, -1))
+
+        return Reports._stream('''SELECT s.id, datetime(s.created_at, 'unixepoch', 'localtime'), u.name, cl.name, cl.cpf, s.total_cents
+                                  FROM sales s LEFT JOIN users u ON u.id = s.user_id LEFT JOIN clients cl ON cl.id = s.client_id
+                                  WHERE s.created_at >= ? AND s.created_at < ? ORDER BY s.created_at''', (first, after))
+
+    @staticmethod
+    def inventory_valuation():
+        '''
+         Streams every item with its stock valuation, quantity_in_stock * value.
+        '''
+        return Reports._stream("SELECT id, code, name, quantity_in_stock, value, quantity_in_stock * value FROM items ORDER BY id")
+
+    @staticmethod
+    def inventory_total():
+        try:
+            return c(Items.DB).execute("SELECT COALESCE(SUM(quantity_in_stock * value), 0) FROM items").fetchone()[0]
+
+        except sqlite3.Error as e:
+            return e
+
+    @staticmethod
+    def to_csv(path, report, *args):
+        '''
+         Writes a report to CSV, e.g. Reports.to_csv("march.csv", "by_item", "2026-03-01", "2026-03-31").
+
+         @return The number of rows written.
+        '''
+        return bulk.export_csv(path, Reports.COLUMNS[report], getattr(Reports, report)(*args))
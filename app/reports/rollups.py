@@ -0,0 +1,89 @@
+import time
+
+
+class Rollups:
+    '''
+     Rollup tables behind the reports, kept in the items database next to the sales.
+
+     apply() runs inside the transaction of every sale (see Sales.write), so
+     the rollups always match the sales; rebuild() recomputes them from
+     scratch, e.g. after importing historical sales. Sales by day and by
+     shift are the sales_totals counters of sales_sum_controller.
+
+     report_hourly, report_cashiers and report_clients sum the sales' net
+     total_cents; report_items sums the gross value of the lines, since a
+     basket's discount and tax aren't split among its lines.
+    '''
+
+    @staticmethod
+    def apply(conn, created_at, user_id, client_id, lines, total_cents):
+        '''
+         Adds one sale to the rollups.
+
+         @param conn - Connection with the sale transaction open.
+         @param lines - List of (item_id, quantity, unit_cents).
+        '''
+        local = time.localtime(created_at)
+        hour, day = time.strftime("%Y-%m-%d %H", local), time.strftime("%Y-%m-%d", local)
+        quantity = sum(line[1] for line in lines)
+        items = {}
+
+        for item_id, line_quantity, unit_cents in lines:
+            sold = items.setdefault(item_id, [0, 0])
+            sold[0] += line_quantity
+            sold[1] += line_quantity * unit_cents
+
+        conn.execute('''INSERT INTO report_hourly (hour, sales, quantity, total_cents) VALUES (?,1,?,?)
+                        ON CONFLICT (hour) DO UPDATE SET sales = sales + 1, quantity = quantity + excluded.quantity,
+                                                         total_cents = total_cents + excluded.total_cents''',
+                     (hour, quantity, total_cents))
+
+        conn.executemany('''INSERT INTO report_items (day, item_id, quantity, total_cents) VALUES (?,?,?,?)
+                            ON CONFLICT (day, item_id) DO UPDATE SET quantity = quantity + excluded.quantity,
+                                                                     total_cents = total_cents + excluded.total_cents''',
+                         [(day, item_id, sold[0], sold[1]) for item_id, sold in items.items()])
+
+        conn.execute('''INSERT INTO report_cashiers (day, user_id, sales, total_cents) VALUES (?,?,1,?)
+                        ON CONFLICT (day, user_id) DO UPDATE SET sales = sales + 1, total_cents = total_cents + excluded.total_cents''',
+                     (day, user_id or 0, total_cents))
+
+        if client_id is not None:
+            conn.execute('''INSERT INTO report_clients (day, client_id, sales, total_cents) VALUES (?,?,1,?)
+                            ON CONFLICT (day, client_id) DO UPDATE SET sales = sales + 1, total_cents = total_cents + excluded.total_cents''',
+                         (day, client_id, total_cents))
+
+    @staticmethod
+    def rebuild(conn):
+        '''
+         Recomputes every rollup and the day and shift totals from the sales tables, in one transaction.
+        '''
+        hour = "strftime('%Y-%m-%d %H', s.created_at, 'unixepoch', 'localtime')"
+        day = "strftime('%Y-%m-%d', s.created_at, 'unixepoch', 'localtime')"
+
+        with conn:
+            for table in ("report_hourly", "report_items", "report_cashiers", "report_clients", "sales_totals"):
+                conn.execute(f"DELETE FROM {table}")
+
+            conn.execute(f'''INSERT INTO report_hourly (hour, sales, quantity, total_cents)
+                             SELECT {hour}, COUNT(*), SUM((SELECT COALESCE(SUM(quantity), 0) FROM sale_lines WHERE sale_id = s.id)),
+                                    SUM(s.total_cents)
+                             FROM sales s GROUP BY 1''')
+
+            conn.execute(f'''INSERT INTO report_items (day, item_id, quantity, total_cents)
+                             SELECT {day}, l.item_id, SUM(l.quantity), SUM(l.quantity * l.unit_cents)
+                             FROM sale_lines l JOIN sales s ON s.id = l.sale_id GROUP BY 1, 2''')
+
+            conn.execute(f'''INSERT INTO report_cashiers (day, user_id, sales, total_cents)
+                             SELECT {day}, COALESCE(s.user_id, 0), COUNT(*), SUM(s.total_cents) FROM sales s GROUP BY 1, 2''')
+
+            conn.execute(f'''INSERT INTO report_clients (day, client_id, sales, total_cents)
+                             SELECT {day}, s.client_id, COUNT(*), SUM(s.total_cents) FROM sales s
+                             WHERE s.client_id IS NOT NULL GROUP BY 1, 2''')
+
+            conn.execute(f'''INSERT INTO sales_totals (period, key, sales, total_cents, discount_cents, tax_cents)
+                             SELECT 'day', {day}, COUNT(*), SUM(s.total_cents), SUM(s.discount_cents), SUM(s.tax_cents)
+                             FROM sales s GROUP BY 2''')
+
+            conn.execute('''INSERT INTO sales_totals (period, key, sales, total_cents, discount_cents, tax_cents)
+                            SELECT 'shift', s.shift, COUNT(*), SUM(s.total_cents), SUM(s.discount_cents), SUM(s.tax_cents)
+                            FROM sales s WHERE s.shift IS NOT NULL GROUP BY 2''')
@@ -1,5 +1,105 @@
+import sqlite3
+import time
+
 from database.connection import conn as c
+from inventory.controller.items_controller import Items
+from sales.controller.sales_sum_controller import Totals
+from reports.rollups import Rollups
+
+
+class Sales:
+    # sales live in the items database (Items.DB) so the stock decrement commits with the sale
+
+    @staticmethod
+    def check(lines):
+        '''
+         Normalises the lines of a sale.
+
+         @param lines - Iterable of (item_id, quantity, unit_cents).
+
+         @return A list of tuples of ints. Raises ValueError if a line isn't three numbers.
+        '''
+        try:
+            return [(int(item_id), int(quantity), int(unit_cents)) for item_id, quantity, unit_cents in lines]
+
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"bad sale line: {e}") from None
+
+    @staticmethod
+    def write(conn, lines, user_id=None, client_id=None, shift=None, discount_cents=0, tax_cents=0, created_at=None):
+        '''
+         Writes one sale, its lines, the stock decrement of every item, the day and shift totals and the report rollups.
+
+         Runs inside a transaction opened by the caller, see record and sales.journal.
+
+         @return The id of the sale. Raises ValueError if a line is malformed or names an item that doesn't exist.
+        '''
+        lines = Sales.check(lines)
+        total = sum(quantity * unit_cents for _, quantity, unit_cents in lines) - discount_cents + tax_cents
+        created_at = time.time() if created_at is None else created_at
+
+        sale_id = conn.execute('''INSERT INTO sales (created_at, user_id, client_id, total_cents, shift, discount_cents, tax_cents)
+                                  VALUES (?,?,?,?,?,?,?)''',
+                               (created_at, user_id, client_id, total, shift, discount_cents, tax_cents)).lastrowid
+
+        conn.executemany("INSERT INTO sale_lines (sale_id, item_id, quantity, unit_cents) VALUES (?,?,?,?)",
+                         [(sale_id,) + line for line in lines])
+
+        changed = conn.executemany("UPDATE items SET quantity_in_stock = quantity_in_stock - ? WHERE id = ?",
+                                   [(quantity, item_id) for item_id, quantity, _ in lines]).rowcount
+
+        if changed != len(lines):
+            raise ValueError("sale has lines for items that don't exist")
+
+        Totals.apply(conn, created_at, shift, total, discount_cents, tax_cents)
+        Rollups.apply(conn, created_at, user_id, client_id, lines, total)
+
+        return sale_id
+
+    @staticmethod
+    def record(lines, user_id=None, client_id=None, shift=None, discount_cents=0, tax_cents=0):
+        '''
+         Rings up a basket with Sales.write in one BEGIN IMMEDIATE transaction.
+
+         @param lines - Iterable of (item_id, quantity, unit_cents).
+         @param user_id - The cashier ringing the sale.
+         @param client_id - The client, if identified.
+         @param shift - The shift the sale is counted in, see Totals.
+         @param discount_cents - Discount over the whole basket.
+         @param tax_cents - Tax added to the basket.
+
+         @return The id of the sale, or the exception raised, in which case nothing was written.
+        '''
+        conn = c(Items.DB)
+
+        try:
+            lines = Sales.check(lines)
+            conn.execute("BEGIN IMMEDIATE")
+            sale_id = Sales.write(conn, lines, user_id, client_id, shift, discount_cents, tax_cents)
+            conn.commit()
+
+        except (sqlite3.Error, ValueError) as e:
+            conn.rollback()
+            return e
+
+        for item_id, _, _ in lines:
+            Items.cache.invalidate(item_id)
+
+        Items.low_stock.refresh({item_id for item_id, _, _ in lines})
+
+        return sale_id
+
+    @staticmethod
+    def read(sale_id):
+        '''
+         Returns the sale header and its lines as a tuple (sale, lines), sale is None if there is no such sale.
+        '''
+        try:
+            conn = c(Items.DB)
+            sale = conn.execute("SELECT * FROM sales WHERE id = ?", (sale_id,)).fetchone()
+            lines = conn.execute("SELECT * FROM sale_lines WHERE sale_id = ?", (sale_id,)).fetchall()
 
+            return sale, lines
 
-class Items:
-    def
\ No newline at end of file
+        except sqlite3.Error as e:
+            return e
@@ -0,0 +1,153 @@
+import sqlite3
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from database.connection import conn as c
+from inventory.controller.items_controller import Items
+
+
+class Basket:
+    '''
+     The basket being rung up at the till.
+
+     Subtotal, discount and item count are kept up to date on every change,
+     so showing the total after a scan never walks the lines again. Amounts
+     are integer cents.
+    '''
+
+    def __init__(self, tax_rate=Decimal("0"), user_id=None, client_id=None, shift=None):
+        self.tax_rate = Decimal(tax_rate)
+        self.user_id = user_id
+        self.client_id = client_id
+        self.shift = shift
+        self.lines = {}
+        self.subtotal_cents = 0
+        self.discount_cents = 0
+        self.quantity = 0
+
+    def _set(self, item_id, quantity, unit_cents, discount_cents):
+        old = self.lines.pop(item_id, None)
+
+        if old is not None:
+            self.subtotal_cents -= old[0] * old[1]
+            self.discount_cents -= old[2]
+            self.quantity -= old[0]
+
+        if quantity > 0:
+            self.lines[item_id] = (quantity, unit_cents, discount_cents)
+            self.subtotal_cents += quantity * unit_cents
+            self.discount_cents += discount_cents
+            self.quantity += quantity
+
+    def add(self, item_id, unit_cents, quantity=1):
+        '''
+         Adds a scanned item, or more of an item already in the basket.
+        '''
+        line = self.lines.get(item_id)
+
+        if line is None:
+            self._set(item_id, quantity, unit_cents, 0)
+
+        else:
+            self._set(item_id, line[0] + quantity, line[1], line[2])
+
+    def set_quantity(self, item_id, quantity):
+        '''
+         Changes the quantity of a line, 0 removes it.
+        '''
+        _, unit_cents, discount_cents = self.lines[item_id]
+        self._set(item_id, quantity, unit_cents, min(discount_cents, quantity * unit_cents))
+
+    def remove(self, item_id):
+        self._set(item_id, 0, 0, 0)
+
+    def discount(self, item_id, discount_cents):
+        '''
+         Sets the discount of a line, in cents for the whole line.
+        '''
+        quantity, unit_cents, _ = self.lines[item_id]
+
+        if not 0 <= discount_cents <= quantity * unit_cents:
+            raise ValueError("discount must be between 0 and the value of the line")
+
+        self._set(item_id, quantity, unit_cents, discount_cents)
+
+    @property
+    def tax_cents(self):
+        return int((Decimal(self.subtotal_cents - self.discount_cents) * self.tax_rate).quantize(Decimal(1), ROUND_HALF_UP))
+
+    @property
+    def total_cents(self):
+        return self.subtotal_cents - self.discount_cents + self.tax_cents
+
+    def checkout(self):
+        '''
+         Records the basket with Sales.record and empties it.
+
+         @return The id of the sale, or the exception raised, in which case the basket is kept.
+        '''
+        from sales.controller.sales_controller import Sales
+
+        if not self.lines:
+            return ValueError("basket is empty")
+
+        sale_id = Sales.record([(item_id, line[0], line[1]) for item_id, line in self.lines.items()],
+                               user_id=self.user_id, client_id=self.client_id, shift=self.shift,
+                               discount_cents=self.discount_cents, tax_cents=self.tax_cents)
+
+        if not isinstance(sale_id, Exception):
+            self.lines.clear()
+            self.subtotal_cents = self.discount_cents = self.quantity = 0
+
+        return sale_id
+
+
+class Totals:
+    '''
+     Per day and per shift counters, updated in the transaction of each sale so closing a day reads one row.
+    '''
+
+    @staticmethod
+    def day_of(timestamp):
+        return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+    @staticmethod
+    def apply(conn, created_at, shift, total_cents, discount_cents, tax_cents):
+        '''
+         Adds one sale to its day and shift counters. Must run inside the transaction of the sale.
+        '''
+        keys = [("day", Totals.day_of(created_at))]
+
+        if shift is not None:
+            keys.append(("shift", str(shift)))
+
+        conn.executemany('''INSERT INTO sales_totals (period, key, sales, total_cents, discount_cents, tax_cents)
+                            VALUES (?,?,1,?,?,?)
+                            ON CONFLICT (period, key) DO UPDATE SET
+                                sales = sales + 1,
+                                total_cents = total_cents + excluded.total_cents,
+                                discount_cents = discount_cents + excluded.discount_cents,
+                                tax_cents = tax_cents + excluded.tax_cents''',
+                         [(period, key, total_cents, discount_cents, tax_cents) for period, key in keys])
+
+    @staticmethod
+    def read(period, key):
+        '''
+         Returns (sales, total_cents, discount_cents, tax_cents) of a day ("day", "YYYY-MM-DD") or a shift ("shift", id).
+        '''
+        try:
+            row = c(Items.DB).execute("SELECT sales, total_cents, discount_cents, tax_cents FROM sales_totals WHERE period = ? AND key = ?",
+                                      (period, str(key))).fetchone()
+
+            return row or (0, 0, 0, 0)
+
+        except sqlite3.Error as e:
+            return e
+
+    @staticmethod
+    def day(date=None):
+        return Totals.read("day", date or Totals.day_of(time.time()))
+
+    @staticmethod
+    def shift(shift):
+        return Totals.read("shift", shift)
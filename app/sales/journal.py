@@ -0,0 +1,256 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+from database.connection import conn as c
+from inventory.controller.items_controller import Items
+from sales.controller.sales_controller import Sales
+
+
+class Journal:
+    '''
+     Write-behind journal of completed sales.
+
+     append() writes the sale to an append-only local file, one line of
+     "<seq>\\t<crc32>\\t<json>" per sale, and returns at once. A background
+     thread applies the queued sales to the database in group commits and
+     records the last applied seq in journal_checkpoint within the same
+     transaction. start() replays whatever the file holds past that
+     checkpoint, so sales acknowledged before a crash are not lost. A line
+     with a bad checksum, e.g. torn by a crash mid-write, ends the replay.
+
+     A sale the database refuses, e.g. of an item deleted since, is set aside
+     in journal_rejected in the same transaction, see rejected. When the
+     database itself keeps failing, the writer gives up after retries
+     attempts and keeps the error in error; the sales stay in the file and
+     the next start replays them.
+    '''
+
+    def __init__(self, path, batch_size=100, interval=0.05, sync=False, retries=10):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sync = sync
+        self.retries = retries
+        self.error = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._applied_event = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._seq = 0
+        self._applied = 0
+        self._file = None
+        self._thread = None
+        self._valid = 0
+
+    @staticmethod
+    def _checksum(seq, payload):
+        return format(zlib.crc32(("%s\t%s" % (seq, payload)).encode()), "08x")
+
+    def entries(self):
+        '''
+         Reads the journal file, yielding (seq, sale) up to the first damaged line.
+        '''
+        self._valid = 0
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as file:
+            for raw in file:
+                line = raw.decode("utf-8", "replace")
+                seq, _, rest = line.rstrip("\n").partition("\t")
+                checksum, _, payload = rest.partition("\t")
+
+                if not line.endswith("\n") or not seq.isdigit() or checksum != Journal._checksum(seq, payload):
+                    return
+
+                self._valid += len(raw)
+                yield int(seq), json.loads(payload)
+
+    def start(self):
+        '''
+         Replays the sales not applied yet and starts the writer thread.
+
+         @return The number of sales queued for replay.
+        '''
+        row = c(Items.DB).execute("SELECT seq FROM journal_checkpoint WHERE name = ?", (self.name,)).fetchone()
+        self._applied = self._seq = row[0] if row else 0
+        pending = 0
+
+        for seq, sale in self.entries():
+            self._seq = max(self._seq, seq)
+
+            if seq > self._applied:
+                self._queue.put((seq, sale))
+                pending += 1
+
+        self._file = open(self.path, "a", encoding="utf-8")
+        # drop a torn tail so new sales don't get appended to a damaged line
+        self._file.truncate(self._valid)
+        self._stop.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="sales-journal", daemon=True)
+        self._thread.start()
+
+        return pending
+
+    def append(self, lines, user_id=None, client_id=None, shift=None, discount_cents=0, tax_cents=0):
+        '''
+         Journals a completed sale, same arguments as Sales.record.
+
+         @return The seq of the sale in the journal. Once this returns the sale is written to
+                 the file and flushed to the OS, which survives the process crashing, and with
+                 sync=True also fsynced, which survives a power cut. Raises ValueError for a
+                 malformed line, before anything is journaled.
+        '''
+        sale = {"lines": [list(line) for line in Sales.check(lines)], "user_id": user_id, "client_id": client_id, "shift": shift,
+                "discount_cents": discount_cents, "tax_cents": tax_cents, "created_at": time.time()}
+        payload = json.dumps(sale, separators=(",", ":"))
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._file.write(f"{seq}\t{Journal._checksum(seq, payload)}\t{payload}\n")
+            self._file.flush()
+
+            if self.sync:
+                os.fsync(self._file.fileno())
+
+        self._queue.put((seq, sale))
+
+        return seq
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.interval)]
+
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+
+                except queue.Empty:
+                    break
+
+            for attempt in range(self.retries + 1):
+                error = self._apply(batch)
+
+                if error is None:
+                    break
+
+                if attempt < self.retries:
+                    time.sleep(self.interval * 2 ** min(attempt, 6))
+
+            else:
+                # the sales are still in the file, stop here and let wait and the next start deal with them
+                with self._lock:
+                    self.error = error
+                    self._applied_event.notify_all()
+
+                return
+
+    def _apply(self, batch):
+        '''
+         @return None once the batch is committed, the database error otherwise.
+        '''
+        conn = c(Items.DB)
+        items = set()
+        committed = False
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+
+            for seq, sale in batch:
+                conn.execute("SAVEPOINT sale")
+
+                try:
+                    Sales.write(conn, sale["lines"], sale["user_id"], sale["client_id"], sale["shift"],
+                                sale["discount_cents"], sale["tax_cents"], sale["created_at"])
+                    items.update(item_id for item_id, _, _ in Sales.check(sale["lines"]))
+
+                except sqlite3.OperationalError:
+                    # the database, not the sale, e.g. a full disk, the whole batch is tried again
+                    raise
+
+                except Exception as e:
+                    # already acknowledged at the till, keep it aside for a manager instead of losing the batch
+                    conn.execute("ROLLBACK TO sale")
+                    conn.execute('''INSERT OR IGNORE INTO journal_rejected (journal, seq, data, reason, at) VALUES (?,?,?,?,?)''',
+                                 (self.name, seq, json.dumps(sale), str(e) or type(e).__name__, time.time()))
+
+                conn.execute("RELEASE sale")
+
+            conn.execute('''INSERT INTO journal_checkpoint (name, seq) VALUES (?,?)
+                            ON CONFLICT (name) DO UPDATE SET seq = excluded.seq''', (self.name, batch[-1][0]))
+            conn.commit()
+            committed = True
+
+        except sqlite3.Error as e:
+            return e
+
+        finally:
+            # whatever went wrong, the write lock of BEGIN IMMEDIATE must not outlive this batch
+            if not committed:
+                conn.rollback()
+
+        for item_id in items:
+            Items.cache.invalidate(item_id)
+
+        Items.low_stock.refresh(items)
+
+        with self._lock:
+            self._applied = batch[-1][0]
+
+            # everything journaled is in the database, start the file over
+            if self._applied == self._seq:
+                self._file.truncate(0)
+
+            self._applied_event.notify_all()
+
+        return None
+
+    def rejected(self):
+        '''
+         Sales of this journal set aside by the writer.
+
+         @return A list of (seq, sale as a dict, reason, time it was set aside).
+        '''
+        rows = c(Items.DB).execute("SELECT seq, data, reason, at FROM journal_rejected WHERE journal = ? ORDER BY seq",
+                                   (self.name,)).fetchall()
+
+        return [(seq, json.loads(data), reason, at) for seq, data, reason, at in rows]
+
+    def wait(self, timeout=None):
+        '''
+         Blocks until every sale appended so far is in the database.
+
+         @return True if the journal caught up before the timeout. Raises the database error the writer gave up on.
+        '''
+        with self._lock:
+            caught_up = self._applied_event.wait_for(lambda: self._applied >= self._seq or self.error is not None, timeout)
+
+            if self.error is not None:
+                raise self.error
+
+            return caught_up
+
+    def stop(self):
+        '''
+         Applies what is queued, stops the writer thread and closes the file.
+        '''
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        if self._file is not None:
+            self._file.close()
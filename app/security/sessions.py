@@ -0,0 +1,190 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+
+from database.connection import conn as c
+
+
+@dataclass(slots=True)
+class Session:
+    id: str
+    user_id: int
+    username: str
+    perm_level: int
+    expires: float
+
+
+class Sessions:
+    '''
+     Issues signed session tokens and keeps the open sessions in memory.
+
+     A token is "<session id>.<hmac>", the signature is checked before the
+     dictionary lookup so forged tokens never reach the store. When db is set,
+     sessions are also written to sqlite and reloaded by load(), which lets a
+     till restart without logging everybody out; the secret must then be kept
+     too, e.g. in POS_SESSION_SECRET.
+    '''
+
+    def __init__(self, secret=None, ttl=8 * 3600, db=None):
+        secret = secret or os.environ.get("POS_SESSION_SECRET")
+        self.secret = secret.encode() if isinstance(secret, str) else secret or secrets.token_bytes(32)
+        self.ttl = ttl
+        self.db = db
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        if db is not None:
+            with c(db) as conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS sessions (
+                                    id TEXT PRIMARY KEY,
+                                    user_id INTEGER NOT NULL,
+                                    username TEXT NOT NULL,
+                                    perm_level INTEGER NOT NULL,
+                                    expires REAL NOT NULL
+                                )''')
+
+    def _sign(self, session_id):
+        return hmac.new(self.secret, session_id.encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, user_id, username, perm_level):
+        '''
+         Opens a session for an authenticated user.
+
+         @return The signed token to hand to the till.
+        '''
+        session = Session(secrets.token_urlsafe(24), user_id, username, int(perm_level), time.time() + self.ttl)
+
+        with self._lock:
+            self._sessions[session.id] = session
+
+        if self.db is not None:
+            with c(self.db) as conn:
+                conn.execute("INSERT INTO sessions VALUES (?,?,?,?,?)",
+                             (session.id, session.user_id, session.username, session.perm_level, session.expires))
+
+        return f"{session.id}.{self._sign(session.id)}"
+
+    def get(self, token):
+        '''
+         Returns the Session of a token, None if it is forged, unknown or expired.
+        '''
+        session_id, _, signature = str(token).partition(".")
+
+        # compare_digest refuses str with non-ASCII characters, bytes compare whatever the token holds
+        if not hmac.compare_digest(signature.encode("utf-8", "replace"), self._sign(session_id).encode()):
+            return None
+
+        session = self._sessions.get(session_id)
+
+        if session is None:
+            return None
+
+        if session.expires < time.time():
+            self._drop(session_id)
+            return None
+
+        return session
+
+    def check_permission(self, token, perm_level):
+        '''
+         True when the token belongs to an open session whose perm_level is at least the one required.
+        '''
+        session = self.get(token)
+
+        return session is not None and session.perm_level >= perm_level
+
+    def revoke(self, token):
+        session = self.get(token)
+
+        if session is not None:
+            self._drop(session.id)
+
+    def user_changed(self, user_id, username=None, perm_level=None, password=False):
+        '''
+         Keeps the open sessions of a user in step with an update of the user, see User.update.
+
+         A new password closes them, a new username or perm_level is applied to
+         them, so a demoted user loses the rights of the old level at once.
+
+         @return The number of sessions changed or closed.
+        '''
+        if password:
+            return self.user_deleted(user_id=user_id)
+
+        with self._lock:
+            sessions = [session for session in self._sessions.values() if session.user_id == user_id]
+
+            for session in sessions:
+                session.username = session.username if username is None else username
+                session.perm_level = session.perm_level if perm_level is None else int(perm_level)
+
+        if self.db is not None and sessions:
+            with c(self.db) as conn:
+                conn.execute('''UPDATE sessions SET username = coalesce(?, username), perm_level = coalesce(?, perm_level)
+                                WHERE user_id = ?''', (username, None if perm_level is None else int(perm_level), user_id))
+
+        return len(sessions)
+
+    def user_deleted(self, user_id=None, username=None):
+        '''
+         Closes every session of a user, by id or by username.
+
+         @return The number of sessions closed.
+        '''
+        with self._lock:
+            closed = [session.id for session in self._sessions.values()
+                      if (user_id is not None and session.user_id == user_id) or (username is not None and session.username == username)]
+
+        for session_id in closed:
+            self._drop(session_id)
+
+        return len(closed)
+
+    def purge(self):
+        '''
+         Drops every expired session.
+
+         @return The number of sessions dropped.
+        '''
+        now = time.time()
+
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items() if session.expires < now]
+
+        for session_id in expired:
+            self._drop(session_id)
+
+        return len(expired)
+
+    def load(self):
+        '''
+         Reloads the unexpired sessions stored in sqlite, after a restart.
+
+         @return The number of sessions loaded.
+        '''
+        if self.db is None:
+            return 0
+
+        now = time.time()
+
+        with c(self.db) as conn:
+            conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+            rows = conn.execute("SELECT id, user_id, username, perm_level, expires FROM sessions").fetchall()
+
+        with self._lock:
+            for row in rows:
+                self._sessions[row[0]] = Session(*row)
+
+        return len(rows)
+
+    def _drop(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+        if self.db is not None:
+            with c(self.db) as conn:
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+# database.config reads these once on import, point it away from the till's files before any controller is imported
+os.environ["POS_DB_DIR"] = tempfile.mkdtemp(prefix="pos-tests-")
+os.environ["POS_DB_LAYOUT"] = "split"
+os.environ["POS_DB_BACKEND"] = "sqlite"
+
+import pytest
+
+from authentication.password import Password
+from database import connection
+from database.backend import ServerPool
+from database.create import create_all
+from users.controller.user_controller import User
+from clients.controller.client_controller import Client
+from inventory.controller.items_controller import Items
+from tests import standin
+
+
+@pytest.fixture(params=["sqlite", "server"])
+def backend(request, tmp_path, monkeypatch):
+    '''
+     Fresh databases for one test, on the sqlite pool or on ServerPool over the stand-in driver.
+
+     The server backend keeps every entity in one database like a real server,
+     its tables are built by the sqlite migrations since the stand-in is a sqlite file.
+
+     @return "sqlite" or "server".
+    '''
+    if request.param == "sqlite":
+        paths = {entity: str(tmp_path / f"{entity}.db") for entity in ("users", "clients", "items")}
+
+    else:
+        paths = dict.fromkeys(("users", "clients", "items"), str(tmp_path / "server.db"))
+
+    # the cheapest bcrypt work factor, the suite checks behaviour not hashing cost
+    monkeypatch.setattr(Password, "ROUNDS", 4)
+    monkeypatch.setattr(User, "DB", paths["users"])
+    monkeypatch.setattr(Client, "DB", paths["clients"])
+    monkeypatch.setattr(Items, "DB", paths["items"])
+    create_all(paths)
+    connection.pool.close_all()
+
+    if request.param == "server":
+        monkeypatch.setattr(connection, "pool", ServerPool(paths["items"], driver=standin))
+
+    Client.recent.clear()
+    Items.cache.clear()
+    Items.low_stock.load()
+
+    yield request.param
+
+    connection.pool.close_all()
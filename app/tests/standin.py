@@ -0,0 +1,140 @@
+'''
+ Local stand-in for a server driver, a DB-API module over a sqlite file
+ that behaves the way database.backend expects psycopg to: format style
+ parameters, autocommit with explicit BEGIN, results fetched on execute
+ and errors of its own classes. It lets the shared suite run every
+ controller through ServerPool, ServerConnection and ServerCursor without
+ a server; the PostgreSQL schema and SQL dialect are not covered.
+'''
+
+import re
+import sqlite3
+
+from database.connection import digits
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+def qmarks(query):
+    '''
+     Turns format parameters back into sqlite's qmark style.
+
+     Like psycopg, a percent sign is read anywhere in the query, inside string
+     literals too, so a literal one must be doubled.
+    '''
+    parts = re.split(r"('(?:[^']|'')*')", query)
+
+    for index, part in enumerate(parts):
+        literal = index % 2 == 1
+
+        def token(match):
+            if match.group() == "%%":
+                return "%"
+
+            if match.group() == "%s" and not literal:
+                return "?"
+
+            raise ProgrammingError(f"{match.group()!r} in a format style query: {query}")
+
+        if not literal and "?" in part:
+            raise ProgrammingError(f"qmark left in a format style query: {query}")
+
+        parts[index] = re.sub(r"%.?", token, part, flags=re.DOTALL)
+
+    return "".join(parts)
+
+
+def raised(error):
+    return globals().get(type(error).__name__, DatabaseError)(str(error))
+
+
+class Cursor:
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, query, params=()):
+        try:
+            cursor = self.raw.execute(qmarks(query), params)
+            # a server sends the whole result back, which also leaves no sqlite statement running
+            self._rows = cursor.fetchall()
+            self.description = cursor.description
+            self.rowcount = cursor.rowcount if cursor.description is None else len(self._rows)
+
+        except sqlite3.Error as e:
+            raise raised(e) from e
+
+    def executemany(self, query, params):
+        try:
+            self.rowcount = self.raw.executemany(qmarks(query), params).rowcount
+            self.description, self._rows = None, []
+
+        except sqlite3.Error as e:
+            raise raised(e) from e
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.raw.execute("PRAGMA foreign_keys=ON")
+        self.raw.execute("PRAGMA busy_timeout=5000")
+        self.raw.create_function("digits", 1, digits, deterministic=True)
+        self.closed = False
+
+    def cursor(self):
+        return Cursor(self.raw)
+
+    def execute(self, query, params=()):
+        cursor = self.cursor()
+        cursor.execute(query, params)
+
+        return cursor
+
+    def close(self):
+        self.closed = True
+        self.raw.close()
+
+
+def connect(dsn, autocommit=True, prepare_threshold=None):
+    '''
+     @param dsn - Path of the sqlite file standing in for the server database.
+    '''
+    return Connection(dsn)
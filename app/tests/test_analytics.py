@@ -0,0 +1,96 @@
+import random
+
+import numpy as np
+import pytest
+
+from database.connection import conn
+from inventory.controller.items_controller import Items
+from reports.analytics import Analytics
+from sales.controller.sales_controller import Sales
+
+
+START = 1_700_000_000
+
+
+def history(sales=300, items=12, seed=3):
+    '''
+     Rings up random sales over ten days and returns their lines as (item_id, quantity, cents, created_at).
+    '''
+    rng = random.Random(seed)
+
+    for n in range(items):
+        Items.create(f"SKU{n}", f"item {n}", None, 10_000, 1.0)
+
+    ids = [item.id for item in Items.list()]
+    lines = []
+
+    for _ in range(sales):
+        at = START + rng.randrange(10 * 86400)
+        basket = [(item_id, rng.randint(1, 4), rng.randint(50, 900)) for item_id in rng.sample(ids, rng.randint(1, 3))]
+
+        with conn(Items.DB) as connection:
+            Sales.write(connection, basket, created_at=at)
+
+        lines += [(item_id, quantity, quantity * unit_cents, at) for item_id, quantity, unit_cents in basket]
+
+    return lines
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_group_bys_match_a_plain_loop(backend):
+    lines = history()
+    data = Analytics.load(START + 86400, START + 8 * 86400)
+    kept = [line for line in lines if START + 86400 <= line[3] < START + 8 * 86400]
+
+    assert len(data) == len(kept)
+
+    quantity, cents = Analytics.by_item(data)
+    days = {}
+
+    for item_id, line_quantity, line_cents, at in kept:
+        quantity[item_id] -= line_quantity
+        cents[item_id] -= line_cents
+        days[(at // 86400) * 86400] = days.get((at // 86400) * 86400, 0) + line_cents
+
+    assert not quantity.any() and not cents.any()
+
+    starts, per_day = Analytics.by_period(data)
+    assert dict(zip(starts.astype(int).tolist(), per_day.tolist())) == days
+
+    top = Analytics.top_items(data, 3)
+    totals = {}
+
+    for item_id, _, line_cents, _ in kept:
+        totals[item_id] = totals.get(item_id, 0) + line_cents
+
+    assert [item_id for item_id, _, _ in top] == sorted(totals, key=lambda item_id: -totals[item_id])[:3]
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_an_empty_range(backend):
+    data = Analytics.load(START, START + 1)
+
+    assert len(data) == 0
+    assert Analytics.top_items(data) == []
+    assert [len(array) for array in Analytics.by_period(data)] == [0, 0]
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_top_items_asks_for_more_than_were_sold(backend):
+    history(sales=2, items=5)
+    data = Analytics.load(START, START + 10 * 86400)
+
+    assert 1 <= len(Analytics.top_items(data, 50)) <= 5
+
+
+def test_moving_average_and_compare_periods():
+    assert Analytics.moving_average([2, 4, 6, 8], 3).tolist() == [2, 3, 4, 6]
+
+    class Period:
+        def __init__(self, item_id, cents):
+            self.item_id, self.quantity, self.cents = np.array(item_id), np.ones(len(item_id), np.int64), np.array(cents)
+
+        def __len__(self):
+            return len(self.item_id)
+
+    assert Analytics.compare_periods(Period([1, 1], [100, 50]), Period([3], [70])).tolist() == [0, -150, 0, 70]
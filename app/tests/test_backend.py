@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+from database import connection
+from database.backend import ServerConnection, placeholders
+from inventory.controller.items_controller import Items
+
+
+pytestmark = pytest.mark.parametrize("backend", ["server"], indirect=True)
+
+
+def test_controllers_run_on_the_server_pool(backend):
+    conn = connection.conn(Items.DB)
+    assert isinstance(conn, ServerConnection)
+
+    with conn:
+        item_id = conn.execute("INSERT INTO items (code, name, value) VALUES (?,?,?)", ("SKU001", "50% off?", 1.0)).lastrowid
+
+    assert conn.execute("SELECT name FROM items WHERE id = ? AND name LIKE '50% off?'", (item_id,)).fetchone() == ("50% off?",)
+
+
+def test_driver_errors_become_sqlite_errors(backend):
+    conn = connection.conn(Items.DB)
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with conn:
+            conn.execute("INSERT INTO items (code, name, value) VALUES (?,?,?)", ("SKU001", "one", 1.0))
+            conn.execute("INSERT INTO items (code, name, value) VALUES (?,?,?)", ("SKU001", "two", 1.0))
+
+    # the failed transaction was rolled back as a whole
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone() == (0,)
+
+
+def test_placeholders_double_every_percent_sign(backend):
+    assert placeholders("SELECT '?%' WHERE a = ? AND b LIKE '%x' || ? AND c % 2 = 0") == \
+        "SELECT '?%%' WHERE a = %s AND b LIKE '%%x' || %s AND c %% 2 = 0"
@@ -0,0 +1,86 @@
+import time
+
+from inventory.cache import ItemCache
+from inventory.controller.items_controller import Items
+
+
+def test_both_keys_of_an_item_go_together():
+    cache = ItemCache(maxsize=4)
+    cache.put(1, "A", "789001", "one")
+    cache.put(2, "B", None, "two")
+
+    assert cache.get("barcode", "789001") == cache.get("code", "A") == "one"
+
+    # a new barcode replaces the old one
+    cache.put(1, "A", "789002", "one again")
+    assert cache.get("barcode", "789001") is None
+    assert cache.get("barcode", "789002") == "one again"
+
+    cache.invalidate(1)
+    assert cache.get("code", "A") is None and cache.get("barcode", "789002") is None
+    assert len(cache) == 1
+
+
+def test_the_least_recently_used_item_is_evicted_with_all_its_keys():
+    cache = ItemCache(maxsize=4)
+    cache.put(1, "A", "789001", "one")
+    cache.put(2, "B", "789002", "two")
+    cache.get("code", "A")
+    cache.put(3, "C", None, "three")
+
+    assert cache.get("barcode", "789002") is None and cache.get("code", "B") is None
+    assert cache.get("barcode", "789001") == "one"
+    assert len(cache) == 3
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ItemCache(ttl=10)
+    cache.put(1, "A", "789001", "one")
+    now[0] += 9
+
+    assert cache.get("code", "A") == "one"
+
+    now[0] += 2
+
+    assert cache.get("code", "A") is None
+    # the other key of the expired item went with it
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lookup_is_served_from_the_cache_until_the_item_changes(backend):
+    Items.create("A", "apple", None, 10, 1.0, barcode="789001")
+    item = Items.lookup(barcode="789001")
+    hits = Items.cache.stats()["hits"]
+
+    assert Items.lookup(barcode="789001") is item
+    assert Items.cache.stats()["hits"] == hits + 1
+
+    Items.update(item.id, barcode="789002", value=2.0)
+
+    assert Items.lookup(barcode="789001") is None
+    assert Items.lookup(barcode="789002").value == 2.0
+
+    Items.delete(item.id)
+
+    assert Items.lookup(code="A") is None
+
+
+def test_warm_cache_fills_up_to_half_the_entries(backend):
+    for n in range(6):
+        Items.create(f"SKU{n}", f"item {n}", None, 1, 1.0, barcode=f"78900{n}")
+
+    Items.cache.clear()
+    Items.cache.maxsize = 8
+
+    try:
+        assert Items.warm_cache(batch_size=4) == 4
+        misses = Items.cache.stats()["misses"]
+
+        assert Items.lookup(barcode="789003").code == "SKU3"
+        assert Items.cache.stats()["misses"] == misses
+
+    finally:
+        Items.cache.maxsize = ItemCache().maxsize
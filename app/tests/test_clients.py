@@ -0,0 +1,133 @@
+from database import connection
+from clients.controller.client_controller import Client
+
+
+def add(count):
+    for n in range(count):
+        Client.create(f"client {n}", f"{n:03d}.456.789-{n:02d}", f"rua {n}", f"(11) 9{n:04d}-0000", f"Client{n}@Example.com")
+
+
+def test_create_and_read(backend):
+    Client.create("Ana Souza", "123.456.789-00", "rua A", "(11) 91234-5678", "ana@example.com")
+
+    client = Client.read(cpf="123.456.789-00")
+    assert (client.name, client.address, client.telephone) == ("Ana Souza", "rua A", "(11) 91234-5678")
+    assert Client.read(client_id=client.id) == client
+    assert Client.read(cpf="000.000.000-00") is None
+
+
+def test_duplicate_cpf_is_refused(backend, capsys):
+    Client.create("Ana Souza", "123.456.789-00", None, None, None)
+    Client.create("Ana Lima", "123.456.789-00", None, None, None)
+
+    assert "UNIQUE" in capsys.readouterr().out.upper()
+    assert [client.name for client in Client.list()] == ["Ana Souza"]
+
+
+def test_update_reaches_readers(backend):
+    Client.create("Ana Souza", "123.456.789-00", None, None, None)
+    client_id = Client.read(cpf="123.456.789-00").id
+
+    assert Client.update(client_id, name="Ana Lima", telephone="(21) 99999-0000") is True
+    assert Client.update(client_id + 100, name="nobody") is False
+
+    client = Client.read(client_id=client_id)
+    assert (client.name, client.telephone) == ("Ana Lima", "(21) 99999-0000")
+    assert Client.search(phone="2199999")[0] == [client]
+
+
+def test_bulk_update(backend):
+    add(3)
+    ids = [client.id for client in Client.list()]
+
+    assert Client.bulk_update([(ids[0], {"address": "rua Z"}), (ids[2], {"address": "rua Y", "name": "renamed"})]) == 2
+    assert [(client.name, client.address) for client in Client.list()] == [("client 0", "rua Z"), ("client 1", "rua 1"), ("renamed", "rua Y")]
+
+
+def test_delete(backend):
+    add(2)
+
+    assert Client.delete(cpf="000.456.789-00") is True
+    assert Client.delete(client_id=Client.read(cpf="001.456.789-01").id) is True
+    assert Client.delete(cpf="001.456.789-01") is False
+    assert list(Client.list()) == []
+
+
+def test_list_pages_and_sorts(backend):
+    add(7)
+
+    clients = list(Client.list(page_size=3))
+    assert [client.name for client in clients] == [f"client {n}" for n in range(7)]
+
+    by_cpf = list(Client.list(order_by="cpf", limit=4, page_size=3))
+    assert by_cpf == clients[:4]
+    assert list(Client.list(order_by="cpf", after=(by_cpf[-1].cpf, by_cpf[-1].id))) == clients[4:]
+
+
+def test_search_ignores_punctuation_and_case(backend):
+    add(12)
+
+    found, after = Client.search(cpf="001.45")
+    assert [client.name for client in found] == ["client 1"] and after is None
+
+    found, _ = Client.search(cpf="00")
+    assert len(found) == 10
+
+    found, _ = Client.search(phone="11 90003")
+    assert [client.name for client in found] == ["client 3"]
+
+    # emails sort byte by byte, "client10@" comes before "client1@"
+    found, _ = Client.search(email=" CLIENT1")
+    assert [client.name for client in found] == ["client 10", "client 11", "client 1"]
+
+    assert Client.search() == ([], None)
+
+
+def test_search_pages(backend):
+    add(12)
+
+    first, after = Client.search(cpf="0", limit=5)
+    second, after = Client.search(cpf="0", limit=5, after=after)
+    third, after = Client.search(cpf="0", limit=5, after=after)
+
+    assert [client.name for client in first + second + third] == [f"client {n}" for n in range(12)]
+    assert after is None
+
+
+def test_search_without_anything_to_match_finds_nobody(backend):
+    add(3)
+
+    assert Client.search(cpf="abc") == ([], None)
+    assert Client.search(phone="--") == ([], None)
+    assert Client.search(email="  ") == ([], None)
+
+
+def test_recent_clients_expire(backend, monkeypatch):
+    monkeypatch.setattr(Client.recent, "ttl", 0)
+    add(1)
+    client = Client.read(cpf="000.456.789-00")
+
+    # changed behind the cache's back, e.g. by another till
+    conn = connection.conn(Client.DB)
+
+    with conn:
+        conn.execute("UPDATE clients SET name = 'renamed' WHERE id = ?", (client.id,))
+
+    assert Client.read(client_id=client.id).name == "renamed"
+
+
+def test_import_jsonl_keeps_the_first_client_of_a_cpf(backend, tmp_path):
+    path = tmp_path / "clients.jsonl"
+    path.write_text('{"name": "Ana", "cpf": "111.222.333-44", "telephone": "(11) 91234-5678"}\n'
+                    "\n"
+                    '{"name": "Ana again", "cpf": "111.222.333-44"}\n'
+                    '{"name": "", "cpf": "555"}\n'
+                    '{"name": "Bia", "cpf": 99988877766}\n', encoding="utf-8")
+
+    loaded, rejected = Client.import_file(str(path))
+
+    assert loaded == 2
+    assert [number for number, _ in rejected] == [2, 3]
+    assert Client.read(cpf="111.222.333-44").name == "Ana"
+    # imported rows get their normalised columns like created ones
+    assert [client.name for client in Client.search("9998887")[0]] == ["Bia"]
@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from database import create
+from database.connection import conn
+
+
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def test_duplicate_cpfs_are_moved_aside_when_clients_migrate(backend, tmp_path):
+    path = str(tmp_path / "old-clients.db")
+    old = sqlite3.connect(path)
+    old.executescript(create.MIGRATIONS["clients"][0][1][0] + ";PRAGMA user_version = 1;")
+    old.executemany("INSERT INTO clients (name, cpf, telephone) VALUES (?,?,?)",
+                    [("Ana", "111.222.333-44", "11 91234-5678"), ("Ana Maria", "111.222.333-44", None), ("Bia", "999", None)])
+    old.commit()
+    old.close()
+
+    assert create.migrate(conn(path), "clients") == create.MIGRATIONS["clients"][-1][0]
+
+    assert conn(path).execute("SELECT id, name, cpf_digits, phone_digits FROM clients ORDER BY id").fetchall() == \
+        [(1, "Ana", "11122233344", "11912345678"), (3, "Bia", "999", None)]
+    assert create.duplicates(path) == [(2, 1, "Ana Maria", "111.222.333-44")]
+
+    with pytest.raises(sqlite3.IntegrityError):
+        conn(path).execute("INSERT INTO clients (name, cpf) VALUES ('again', '999')")
+
+
+def test_a_failed_migration_keeps_the_previous_version(backend, tmp_path, monkeypatch):
+    path = str(tmp_path / "users.db")
+    latest = create.migrate(conn(path), "users")
+    broken = create.MIGRATIONS["users"] + [(latest + 1, ["CREATE TABLE half (id INTEGER)", "CREATE TABLE half (id INTEGER)"])]
+    monkeypatch.setitem(create.MIGRATIONS, "users", broken)
+
+    with pytest.raises(sqlite3.OperationalError):
+        create.migrate(conn(path), "users")
+
+    assert create.version(conn(path)) == latest
+    assert conn(path).execute("SELECT name FROM sqlite_master WHERE name = 'half'").fetchall() == []
+
+
+def test_a_shared_file_versions_each_entity(backend, tmp_path):
+    path = str(tmp_path / "pos.db")
+    paths = dict.fromkeys(("users", "clients", "items"), path)
+    latest = {name: migrations[-1][0] for name, migrations in create.MIGRATIONS.items()}
+
+    assert create.create_all(paths) == latest
+    assert create.create_all(paths) == latest
+    assert create.version(conn(path)) == 0
+    assert {name: create.version(conn(path), name) for name in paths} == latest
+
+
+def test_every_controller_query_uses_an_index(backend):
+    assert create.check_indexes() == []
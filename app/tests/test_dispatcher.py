@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from payments.dispatcher import Dispatcher
+from payments.fake import FakeAcquirer
+from payments.providers import Card, Cash, Provider
+
+
+class Broken(Provider):
+    '''
+     A card provider whose charges blow up with something that isn't a PaymentError.
+    '''
+    name = "card"
+
+    def __init__(self):
+        self.charges = 0
+        self.refunds = []
+
+    async def charge(self, amount_cents, key):
+        self.charges += 1
+        raise RuntimeError("malformed answer")
+
+    async def refund(self, reference, key, charge_key):
+        self.refunds.append(charge_key)
+
+
+def test_an_unexpected_provider_error_reverses_the_charge():
+    card = Broken()
+    dispatcher = Dispatcher([Cash(), card], timeout=1, retries=1, backoff=0)
+
+    approved, payments, change = asyncio.run(dispatcher.pay(1000, [("cash", 400), ("card", 600)], key="sale-1"))
+
+    assert not approved and change == 0
+    assert card.charges == 2
+    # the acquirer may have charged the card, so it is reversed by its key like the cash
+    assert card.refunds == ["sale-1-1"]
+    assert [payment.status for payment in payments] == ["refunded", "refunded"]
+
+
+def test_a_provider_must_implement_charge_and_refund():
+    class Half(Provider):
+        async def charge(self, amount_cents, key):
+            return key
+
+    with pytest.raises(TypeError):
+        Half()
+
+
+def test_a_card_charge_goes_through_the_fake_acquirer_once():
+    async def run():
+        acquirer = await FakeAcquirer().start()
+
+        try:
+            card = Card(acquirer.url)
+            first = await card.charge(500, "sale-1")
+            again = await card.charge(500, "sale-1")
+
+            return first, again, acquirer.charges
+
+        finally:
+            await acquirer.stop()
+
+    first, again, charges = asyncio.run(run())
+
+    assert first == again
+    assert charges == {first: 500}
@@ -0,0 +1,118 @@
+import email.utils
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from integration.feed import Feed
+from integration.worker import Exporter, PushError, retry_after
+from inventory.controller.items_controller import Items
+
+
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def test_prune_keeps_what_a_registered_target_hasnt_read(backend):
+    feed = Feed("items", Items.DB)
+    feed.register("crm")
+    feed.register("accounting")
+
+    for n in range(3):
+        Items.create(f"SKU{n:03d}", f"item {n}", None, 1, 1.0)
+
+    feed.advance("crm", 3)
+    feed.advance("accounting", 2)
+
+    # the last change both acknowledged stays, it marks how far the log was pruned
+    assert feed.prune() == 1
+    assert feed.floor() == 1
+    assert feed.read(feed.checkpoint("accounting"), 10)[0] == 3
+    assert not feed.behind(1) and feed.behind(0)
+
+
+def test_prune_without_readers_keeps_only_the_last_change(backend):
+    feed = Feed("items", Items.DB)
+
+    for n in range(3):
+        Items.create(f"SKU{n:03d}", f"item {n}", None, 1, 1.0)
+
+    # e.g. a till, where nothing reads the log, it must not grow for ever
+    assert feed.prune() == 2
+    assert feed.floor() == 2
+
+    feed.register("crm")
+    Items.create("SKU003", "item 3", None, 1, 1.0)
+    assert feed.prune() == 0
+    assert [change["id"] for change in feed.read(feed.checkpoint("crm"), 10)[1]] == [3, 4]
+
+
+def test_a_reader_behind_the_floor_gets_a_snapshot(backend):
+    feed = Feed("items", Items.DB)
+    feed.register("crm")
+
+    for n in range(3):
+        Items.create(f"SKU{n:03d}", f"item {n}", None, 1, 1.0)
+
+    Items.delete(Items.lookup(code="SKU000").id)
+    feed.advance("crm", 4)
+    feed.prune()
+
+    assert feed.behind(0)
+    seq, changes = feed.snapshot(["items"])
+    assert seq == 4
+    assert [change["data"]["code"] for change in changes] == ["SKU001", "SKU002"]
+
+
+def test_retry_after_reads_seconds_and_dates(backend):
+    assert retry_after("120") == 120
+    assert retry_after(None) is None
+    assert retry_after("soon") is None
+    assert 50 < retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0
+
+
+def receiver(status, headers=(), body=b"", length=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(status)
+
+            for name, value in headers:
+                self.send_header(name, value)
+
+            self.send_header("Content-Length", str(len(body) if length is None else length))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+@pytest.mark.parametrize("answer", [dict(status=503, headers=[("Retry-After", "Wed, 21 Oct 2099 07:28:00 GMT")]),
+                                    dict(status=200, body=b"{}", length=100)], ids=["date", "cut short"])
+def test_the_exporter_survives_odd_answers(backend, answer):
+    Items.create("SKU001", "one", None, 1, 1.0)
+    server = receiver(**answer)
+    exporter = Exporter("crm", f"http://127.0.0.1:{server.server_address[1]}/", feeds=[Feed("items", Items.DB)], timeout=2)
+
+    try:
+        with pytest.raises(PushError):
+            exporter.sync()
+
+        exporter.start()
+        time.sleep(0.3)
+        # still running, waiting to send the batch again
+        assert exporter._thread.is_alive() and exporter.failures >= 1
+
+    finally:
+        exporter.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert Feed("items", Items.DB).checkpoint("crm") == 0
@@ -0,0 +1,123 @@
+import pytest
+
+from inventory.controller.items_controller import Items
+
+
+def add(count):
+    for n in range(count):
+        Items.create(f"SKU{n:03d}", f"item {n}", "ACME" if n % 2 else "Globex", 10 * n, 1.5 + n)
+
+
+def test_create_read_and_lookup(backend):
+    assert Items.create("SKU001", "Café torrado 500g", "Pilão", 12, 18.9, barcode="7891234567890") is None
+
+    item = Items.lookup(barcode="7891234567890")
+    assert (item.code, item.name, item.manufacturer, item.quantity_in_stock, item.value) == ("SKU001", "Café torrado 500g", "Pilão", 12, 18.9)
+    assert Items.read(item.id) == [item]
+    assert Items.lookup(code="SKU001") == item
+    assert Items.lookup(code="nothing") is None
+
+
+def test_duplicate_code_is_refused(backend):
+    Items.create("SKU001", "one", None, 1, 1.0)
+
+    assert isinstance(Items.create("SKU001", "two", None, 1, 1.0), Exception)
+    assert [item.name for item in Items.list()] == ["one"]
+
+
+def test_update_reaches_lookup_and_low_stock(backend):
+    Items.create("SKU001", "one", None, 10, 1.0)
+    item = Items.lookup(code="SKU001")
+
+    assert Items.update(item.id, name="renamed", quantity_in_stock=2, reorder_point=5) is None
+
+    assert Items.lookup(code="SKU001").name == "renamed"
+    assert [row[0] for row in Items.low_stock.items()] == [item.id]
+
+
+def test_bulk_update(backend):
+    add(3)
+    ids = [item.id for item in Items.list()]
+
+    assert Items.bulk_update([(ids[0], {"value": 9.0}), (ids[1], {"value": 9.0}), (ids[2], {"name": "renamed"})]) == 3
+    assert [(item.name, item.value) for item in Items.list()] == [("item 0", 9.0), ("item 1", 9.0), ("renamed", 3.5)]
+
+
+def test_delete(backend):
+    add(2)
+    item = Items.lookup(code="SKU000")
+
+    assert Items.delete(item.id) is None
+    assert Items.lookup(code="SKU000") is None
+    assert [item.code for item in Items.list()] == ["SKU001"]
+
+
+def test_list_pages_sorts_and_filters(backend):
+    add(7)
+
+    items = list(Items.list(page_size=2))
+    assert [item.code for item in items] == [f"SKU{n:03d}" for n in range(7)]
+
+    assert list(Items.list(order_by="code", after=(items[2].code, items[2].id), limit=3)) == items[3:6]
+    assert [item.code for item in Items.list(manufacturer="ACME")] == ["SKU001", "SKU003", "SKU005"]
+    assert isinstance(Items.list(order_by="value"), ValueError)
+
+
+# Items.search runs on SQLite's FTS5, the server schema has no search index yet
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_search(backend):
+    Items.create("SKU001", "Café torrado 500g", "Pilão", 1, 18.9)
+    Items.create("SKU002", "Café solúvel", "Nescafé", 1, 12.0)
+    Items.create("SKU003", "Açúcar refinado", "União", 1, 4.5)
+
+    assert {item.code for item in Items.search("cafe")} == {"SKU001", "SKU002"}
+    assert [item.code for item in Items.search("caf torr")] == ["SKU001"]
+    assert [item.code for item in Items.search("pilao")] == ["SKU001"]
+    # nothing starts with "efinad", the trigram index finds it inside a word
+    assert [item.code for item in Items.search("efinad")] == ["SKU003"]
+    assert Items.search("") == []
+
+    Items.update(Items.lookup(code="SKU003").id, name="Sal grosso")
+    assert Items.search("refinado") == []
+    assert [item.code for item in Items.search("grosso")] == ["SKU003"]
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_search_ranks_every_match(backend):
+    for n in range(1500):
+        Items.create(f"B{n:04d}", f"Biscoito recheado sabor {n} cafe", "Nestlé", 1, 3.0)
+
+    Items.create("C0001", "Cafe", "Pilão", 1, 18.9)
+
+    assert Items.search("cafe", limit=3)[0].code == "C0001"
+
+
+def test_import_rejects_only_the_bad_rows(backend, tmp_path):
+    Items.create("SKU000", "already here", None, 1, 1.0)
+    path = tmp_path / "catalogue.csv"
+    path.write_text("code,name,manufacturer,barcode,quantity_in_stock,value,reorder_point\n"
+                    "SKU001,one,ACME,789001,5,1.5,2\n"
+                    "SKU000,clashes with the table,,,1,1.0,\n"
+                    "SKU002,two,,,,2.5,\n"
+                    "SKU001,twice in the file,,,1,1.0,\n"
+                    ",no code,,,1,1.0,\n"
+                    "SKU003,three,,,1,not a price,\n", encoding="utf-8")
+
+    loaded, rejected = Items.import_file(str(path), batch_size=4)
+
+    assert loaded == 2
+    assert [number for number, _ in rejected] == [2, 4, 5, 6]
+    assert [(item.code, item.quantity_in_stock, item.value) for item in Items.list(order_by="code")] == \
+        [("SKU000", 1, 1.0), ("SKU001", 5, 1.5), ("SKU002", 0, 2.5)]
+    assert Items.lookup(barcode="789001").name == "one"
+
+
+def test_export_streams_every_item(backend, tmp_path):
+    add(5)
+    path = tmp_path / "items.csv"
+
+    assert Items.export_file(str(path), batch_size=2) == 5
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == ",".join(("id",) + Items.COLUMNS)
+    assert [line.split(",")[1] for line in lines[1:]] == [f"SKU{n:03d}" for n in range(5)]
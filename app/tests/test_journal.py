@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from database.connection import conn as c
+from inventory.controller.items_controller import Items
+from sales.journal import Journal
+
+
+# the journal, the change log and the sales tables are SQLite-only, see database.backend
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def test_a_sale_that_cant_be_applied_is_set_aside(backend, tmp_path):
+    Items.create("SKU001", "one", None, 10, 1.0)
+    item_id = Items.lookup(code="SKU001").id
+    journal = Journal(str(tmp_path / "sales.journal"), interval=0.01)
+    journal.start()
+
+    try:
+        bad = journal.append([(item_id + 100, 1, 100)])
+        good = journal.append([(item_id, 3, 100)])
+
+        assert journal.wait(5)
+
+    finally:
+        journal.stop()
+
+    assert good > bad
+    assert Items.lookup(code="SKU001").quantity_in_stock == 7
+    assert c(Items.DB).execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 1
+
+    # the file was started over, the sale set aside outlives the journal
+    restarted = Journal(str(tmp_path / "sales.journal"))
+    assert restarted.start() == 0
+    restarted.stop()
+
+    [(seq, sale, reason, _)] = restarted.rejected()
+    assert (seq, sale["lines"]) == (bad, [[item_id + 100, 1, 100]])
+    assert "don't exist" in reason
+
+
+def test_a_malformed_line_is_refused_before_it_is_journaled(backend, tmp_path):
+    journal = Journal(str(tmp_path / "sales.journal"))
+    journal.start()
+
+    try:
+        with pytest.raises(ValueError):
+            journal.append([("one", 1, 100)])
+
+    finally:
+        journal.stop()
+
+    assert list(journal.entries()) == []
+
+
+def test_the_writer_gives_up_on_a_failing_database_and_the_sales_are_replayed(backend, tmp_path):
+    Items.create("SKU001", "one", None, 10, 1.0)
+    item_id = Items.lookup(code="SKU001").id
+    conn = c(Items.DB)
+    journal = Journal(str(tmp_path / "sales.journal"), interval=0.001, retries=2)
+    journal.start()
+    # every batch now fails on the checkpoint, like a database that keeps failing
+    conn.execute("ALTER TABLE journal_checkpoint RENAME TO moved")
+
+    try:
+        journal.append([(item_id, 1, 100)])
+
+        with pytest.raises(sqlite3.OperationalError):
+            journal.wait(5)
+
+    finally:
+        journal.stop()
+
+    conn.execute("ALTER TABLE moved RENAME TO journal_checkpoint")
+    restarted = Journal(str(tmp_path / "sales.journal"), interval=0.01)
+
+    assert restarted.start() == 1
+    assert restarted.wait(5)
+    restarted.stop()
+    assert Items.lookup(code="SKU001").quantity_in_stock == 9
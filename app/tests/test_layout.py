@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from clients.controller.client_controller import Client
+from database import config, create
+from database.connection import conn, joined
+from integration.feed import feeds
+from inventory.controller.items_controller import Items
+from reports.report import Reports
+from sales.controller.sales_controller import Sales
+from users.controller.user_controller import User
+
+
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def ring_up():
+    User.create("Carla", "carla", "caixaum12", 1)
+    Client.create("Ana", "111.222.333-44", None, "11 91234-5678", "ana@example.com")
+    Items.create("A", "Café torrado", "Pilão", 10, 1.0)
+    user, client, item = User.read(username="carla"), Client.read(cpf="111.222.333-44"), Items.lookup(code="A")
+
+    return Sales.record([(item.id, 2, 1890)], user_id=user.id, client_id=client.id)
+
+
+def today():
+    return time.strftime("%Y-%m-%d")
+
+
+def test_config_paths_follow_the_layout(backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(config, "LAYOUT", "split")
+
+    assert config.paths() == {entity: str(tmp_path / name) for entity, name in config.FILES.items()}
+
+    monkeypatch.setattr(config, "LAYOUT", "single")
+
+    assert set(config.paths().values()) == {str(tmp_path / config.SINGLE)}
+
+
+def test_split_files_are_joined_through_attach(backend):
+    sale_id = ring_up()
+
+    assert [row[2:] for row in Reports.sales(today(), today())] == [("Carla", "Ana", "111.222.333-44", 3780)]
+    assert {row[1] for row in joined().execute("PRAGMA database_list")} == {"main", "users_db", "clients_db"}
+    # attached once per connection
+    assert len(joined().execute("PRAGMA database_list").fetchall()) == 3
+    assert list(Reports.by_cashier(today(), today()))[0][1:] == ("Carla", 1, 3780)
+    assert sale_id == 1
+
+
+def test_consolidate_copies_the_split_files_into_one(backend, tmp_path, monkeypatch):
+    ring_up()
+    target = str(tmp_path / "pos.db")
+    copied = create.consolidate(target)
+
+    assert (copied["users"], copied["clients"], copied["items"], copied["sales"], copied["sale_lines"]) == (1, 1, 1, 1, 1)
+
+    for controller in (User, Client, Items):
+        monkeypatch.setattr(controller, "DB", target)
+
+    Client.recent.clear()
+    Items.cache.clear()
+
+    assert [row[2:] for row in Reports.sales(today(), today())] == [("Carla", "Ana", "111.222.333-44", 3780)]
+    assert [row[1] for row in joined().execute("PRAGMA database_list")] == ["main"]
+    # the search indexes and the normalised client columns were rebuilt by the triggers
+    assert [item.code for item in Items.search("cafe")] == ["A"]
+    assert [client.name for client in Client.search("11122")[0]] == ["Ana"]
+    assert [feed.name for feed in feeds()] == ["users+clients+items"]
+    # every copied row is logged for the exporters to resend
+    assert conn(target).execute("SELECT entity FROM changes WHERE op = 'insert' ORDER BY entity").fetchall() == \
+        [("clients",), ("items",), ("sales",), ("users",)]
@@ -0,0 +1,41 @@
+import pytest
+
+from authentication.password import Password, Policy
+
+
+@pytest.mark.parametrize("password, accepted", [
+    ("caixaum12", True),
+    ("abcdef12", True),
+    ("abcdefgh", False),
+    ("abcde123", False),
+    ("abcdef1", False),
+    ("Abcdef12", False),
+    ("abcdef 12", False),
+    ("abcdéf12", False),
+    ("", False),
+])
+def test_the_default_policy_keeps_the_old_rules(password, accepted):
+    assert Password.policy.verify(password) is accepted
+
+
+def test_a_policy_allows_the_classes_it_requires():
+    policy = Policy(min_length=10, min_lower=2, min_upper=2, min_digits=2, min_symbols=1)
+
+    assert policy.verify("abCDef12!x")
+    assert not policy.verify("abcdef12!x")
+    assert not policy.verify("abCDef12xy")
+    assert not policy.verify("aB1!")
+    assert policy.invalid("abCD ef12!é") == " é"
+
+    with pytest.raises(ValueError):
+        Policy(min_upper=1, allowed="abc123")
+
+
+def test_verify_many_refuses_missing_passwords():
+    assert Password.policy.verify_many(["caixaum12", None, 12345678, "curta1"]) == [True, False, False, False]
+
+
+def test_req_verify_names_the_first_refused_character(capsys):
+    assert not Password.req_verify("caixa um 12")
+    assert capsys.readouterr().out == "invalid character:  \n"
+    assert Password.hash("caixa1") is None
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from peripherals.devices import Scanner
+from peripherals.printer import Printer, Receipt
+
+
+class Queued:
+    '''
+     Port handing out the chunks it was given, then reporting the device gone.
+    '''
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.read_at = None
+        self.written = []
+
+    async def read(self):
+        await asyncio.sleep(0)
+        self.read_at = time.perf_counter()
+
+        return self.chunks.pop(0) if self.chunks else b""
+
+    async def write(self, data):
+        if bytes(data).endswith(b"jam\n" + b"\n" * 4 + Receipt.CUT):
+            raise ValueError("paper jam")
+
+        self.written.append(bytes(data))
+
+
+def test_a_scanner_resolves_codes_off_the_loop_in_order():
+    threads, found = [], []
+
+    def resolve(code):
+        threads.append(threading.current_thread())
+        time.sleep(0.01)
+
+        return code.upper()
+
+    scanner = Scanner(Queued(b"ab\r", b"cd\ref\n"), resolve, lambda code, item: found.append((code, item)))
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.get_running_loop().create_task(tick())
+        await scanner.run()
+        ticker.cancel()
+
+        return ticks
+
+    ticks = asyncio.run(run())
+
+    assert found == [("ab", "AB"), ("cd", "CD"), ("ef", "EF")]
+    assert threading.main_thread() not in threads
+    # the loop kept running other tasks while the codes were resolved
+    assert ticks > 3
+    assert scanner.latency.count == 3
+
+
+@pytest.mark.parametrize("right", ["9" * 47, "9" * 48, "9" * 60])
+def test_receipt_columns_never_run_past_the_width(right):
+    receipt = Receipt(bytearray(1024), width=48)
+    start = receipt.length
+    receipt.columns("TOTAL", right)
+    line = bytes(receipt.data()[start:]).split(b"\n")[0][len(Receipt.ALIGN["left"]):]
+
+    assert len(line) <= 48
+    assert line.endswith(b"9" * min(len(right), 48))
+
+
+def test_a_failed_receipt_fails_its_future_and_the_next_one_prints():
+    port = Queued()
+    printer = Printer(port, buffers=2, size=1024)
+
+    async def run():
+        printer.start()
+        jammed = await printer.print(lambda receipt: receipt.text("jam").cut())
+        printed = await printer.print(lambda receipt: receipt.text("ok").cut())
+
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(jammed, 1)
+
+        length = await asyncio.wait_for(printed, 1)
+        await printer.stop()
+
+        return length
+
+    length = asyncio.run(run())
+
+    assert printer.printed == 1
+    assert len(port.written) == 1 and len(port.written[0]) == length
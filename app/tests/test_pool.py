@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database.connection import Pool
+
+
+def test_connections_of_ended_threads_are_closed(tmp_path):
+    pool = Pool()
+    path = str(tmp_path / "pool.db")
+    opened = []
+
+    def work():
+        connection = pool.get(path)
+        connection.execute("SELECT 1").fetchone()
+        opened.append(connection)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    # nothing is left once the threads are gone, no garbage collection needed
+    assert pool.opened() == 0
+    assert len(set(map(id, opened))) == 8
+
+    for connection in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+
+
+def test_close_all_reaches_live_threads_on_their_next_get(tmp_path):
+    pool = Pool()
+    path = str(tmp_path / "pool.db")
+    first, asked, done = [], threading.Event(), threading.Event()
+
+    def work():
+        first.append(pool.get(path))
+        asked.set()
+        done.wait()
+        first.append(pool.get(path))
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    asked.wait()
+    mine = pool.get(path)
+    pool.close_all()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        mine.execute("SELECT 1")
+
+    # the other thread's connection stays usable until it asks again
+    first[0].execute("SELECT 1")
+    done.set()
+    thread.join()
+
+    assert first[0] is not first[1]
+    assert pool.opened() == 0
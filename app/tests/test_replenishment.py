@@ -0,0 +1,50 @@
+import pytest
+
+from database.connection import conn
+from inventory.controller.items_controller import Items
+from sales.controller.sales_controller import Sales
+
+
+def scanned():
+    '''
+     The low items found the slow way, scanning the table.
+    '''
+    return sorted(conn(Items.DB).execute('''SELECT id, quantity_in_stock, reorder_point FROM items
+                                            WHERE quantity_in_stock <= reorder_point''').fetchall())
+
+
+def test_the_low_set_follows_every_stock_change(backend):
+    for n, (stock, reorder_point) in enumerate([(10, 5), (5, 5), (1, 4), (0, 0)]):
+        Items.create(f"SKU{n}", f"item {n}", None, stock, 1.0)
+        Items.update(Items.lookup(code=f"SKU{n}").id, reorder_point=reorder_point)
+
+    ids = [item.id for item in Items.list()]
+
+    # most urgent first: furthest below the reorder point, then lowest stock
+    assert Items.low_stock.items() == [(ids[2], 1, 4), (ids[3], 0, 0), (ids[1], 5, 5)]
+    assert Items.low_stock.items(1) == [(ids[2], 1, 4)]
+
+    Items.update(ids[0], quantity_in_stock=2)
+    Items.bulk_update([(ids[2], {"quantity_in_stock": 50}), (ids[3], {"reorder_point": -1})])
+    Items.delete(ids[1])
+
+    assert sorted(Items.low_stock.items()) == scanned() == [(ids[0], 2, 5)]
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_sales_add_items_and_suggestions_follow_velocity(backend):
+    Items.create("A", "apple", None, 31, 1.0)
+    apple = Items.lookup(code="A").id
+    Items.update(apple, reorder_point=5)
+
+    for _ in range(14):
+        Sales.record([(apple, 2, 100)])
+
+    assert Items.low_stock.items() == scanned() == [(apple, 3, 5)]
+
+    # 28 units over 28 days, one a day, cover 7 + 14 days: 21 minus the 3 left
+    (item_id, stock, velocity, order), = Items.low_stock.suggestions(days=28, lead_days=7, cover_days=14)
+    assert (item_id, stock, velocity, order) == (apple, 3, 1.0, 18)
+
+    # with no time to cover the order still brings the item back above its reorder point
+    assert Items.low_stock.suggestions(days=28, lead_days=0, cover_days=0)[0][3] == 3
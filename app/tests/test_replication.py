@@ -0,0 +1,123 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from clients.controller.client_controller import Client
+from database.connection import conn as c
+from inventory.controller.items_controller import Items
+from replication import auth
+from replication.hq import HQ
+from replication.till import LOCAL_IDS, Replica
+from sales.controller.sales_controller import Sales
+
+
+# replication runs on the SQLite tills, see database.backend
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def item(item_id, code, barcode=None, stock=10):
+    return {"entity": "items", "id": item_id, "op": "update",
+            "data": {"id": item_id, "code": code, "name": f"item {code}", "manufacturer": None, "barcode": barcode,
+                     "quantity_in_stock": stock, "value": 1.0, "reorder_point": 0}}
+
+
+def client(client_id, cpf):
+    return {"entity": "clients", "id": client_id, "op": "update",
+            "data": {"id": client_id, "name": f"client {cpf}", "cpf": cpf, "address": None, "telephone": None, "email": None}}
+
+
+def barcodes():
+    return dict(c(Items.DB).execute("SELECT id, barcode FROM items").fetchall())
+
+
+@pytest.fixture
+def replica(backend):
+    return Replica("http://127.0.0.1:9", "t1", secret="s1")
+
+
+def test_keys_swapped_at_hq_apply_in_any_order(replica):
+    replica.apply([item(1, "A", "111"), item(2, "B", "222"), client(1, "111"), client(2, "222")], {"items": 2})
+
+    # A -> tmp, B -> 111, A -> 222 at HQ reaches the till merged, B first
+    replica.apply([item(2, "B", "111"), item(1, "A", "222"), client(2, "111"), client(1, "222")], {"items": 5})
+
+    assert barcodes() == {1: "222", 2: "111"}
+    assert Client.read(client_id=1).cpf == "222"
+    assert replica.vector() == {"items": 5}
+
+
+def test_a_stale_row_gives_up_its_key_until_its_own_change_arrives(replica):
+    replica.apply([item(1, "A", "111"), item(2, "B", "222")], {"items": 2})
+
+    replica.apply([item(2, "B", "111")], {"items": 3})
+    assert barcodes() == {1: None, 2: "111"}
+    assert Items.lookup(barcode="111").id == 2
+
+    replica.apply([item(1, "A", "333")], {"items": 4})
+    assert barcodes() == {1: "333", 2: "111"}
+
+
+def test_rows_created_at_the_till_keep_their_own_ids(replica):
+    replica.apply([item(1, "A")], {"items": 1})
+    Items.create("LOCAL", "made here", None, 5, 2.0)
+    local = Items.lookup(code="LOCAL")
+
+    assert local.id >= LOCAL_IDS
+
+    # a snapshot of HQ's items leaves the till's own alone
+    replica.apply([dict(item(1, "A"), op="snapshot")], {"items": 9}, snapshot=["items"])
+    assert sorted(barcodes()) == [1, local.id]
+
+
+def test_a_row_registered_at_the_till_and_at_hq_is_merged(replica):
+    Items.create("SKU9", "made here", None, 5, 2.0)
+    Client.create("Ana", "123", None, None, None)
+    local_item, local_client = Items.lookup(code="SKU9").id, Client.read(cpf="123").id
+    sale_id = Sales.record([(local_item, 2, 100)], client_id=local_client)
+
+    replica.apply([item(7, "SKU9", stock=10), client(3, "123")], {"items": 1})
+
+    assert barcodes() == {7: None}
+    assert Client.read(cpf="123").id == 3
+    _, lines = Sales.read(sale_id)
+    assert [line[2] for line in lines] == [7]
+    assert c(Items.DB).execute("SELECT client_id FROM sales WHERE id = ?", (sale_id,)).fetchone() == (3,)
+    # the sale isn't uploaded yet, the local stock still counts it
+    assert Items.lookup(code="SKU9").quantity_in_stock == 8
+
+
+def test_hq_refuses_unsigned_requests_and_sets_aside_sales_it_cant_apply(backend):
+    Items.create("SKU1", "one", None, 10, 1.0)
+    hq = HQ({"t1": "s1"}).start()
+
+    try:
+        with pytest.raises(urllib.error.HTTPError) as refused:
+            urllib.request.urlopen(f"{hq.url}/deltas")
+
+        assert refused.value.code == 401
+
+        forged = urllib.request.Request(f"{hq.url}/deltas", headers=auth.headers("t1", "wrong", "GET", "/deltas"))
+
+        with pytest.raises(urllib.error.HTTPError) as refused:
+            urllib.request.urlopen(forged)
+
+        assert refused.value.code == 401
+
+        signed = urllib.request.Request(f"{hq.url}/deltas", headers=auth.headers("t1", "s1", "GET", "/deltas"))
+
+        with urllib.request.urlopen(signed) as response:
+            assert [change["data"]["code"] for change in json.loads(response.read())["changes"]] == ["SKU1"]
+
+    finally:
+        hq.stop()
+
+    item_id = Items.lookup(code="SKU1").id
+    sale = {"user_id": None, "client_id": None, "shift": None, "discount_cents": 0, "tax_cents": 0, "created_at": 1.0}
+
+    assert hq.receive("t1", [dict(sale, id=1, lines=[[item_id + 50, 1, 100]]), dict(sale, id=2, lines=[[item_id, 1, 100]])]) == (2, [1])
+    # sent again, e.g. the answer was lost, nothing is applied twice
+    assert hq.receive("t1", [dict(sale, id=2, lines=[[item_id, 1, 100]])]) == (2, [])
+    assert Items.lookup(code="SKU1").quantity_in_stock == 9
+    assert [(till, sale_id) for till, sale_id, _, _, _ in HQ.rejected()] == [("t1", 1)]
@@ -0,0 +1,67 @@
+import sqlite3
+import time
+
+import pytest
+
+from database.connection import conn
+from inventory.controller.items_controller import Items
+from reports.report import Reports
+from reports.rollups import Rollups
+from sales.controller.sales_controller import Sales
+from sales.controller.sales_sum_controller import Totals
+
+
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def sell(at, lines, **amounts):
+    with conn(Items.DB) as connection:
+        return Sales.write(connection, lines, created_at=time.mktime(at + (0, 0, -1)), **amounts)
+
+
+def rollups():
+    return {table: conn(Items.DB).execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+            for table in ("report_hourly", "report_items", "report_cashiers", "report_clients", "sales_totals")}
+
+
+def test_items_are_gross_and_hours_net(backend):
+    Items.create("A", "apple", None, 100, 1.0)
+    Items.create("B", "bread", None, 100, 2.0)
+    apple, bread = Items.lookup(code="A").id, Items.lookup(code="B").id
+
+    sell((2026, 3, 14, 10, 5, 0), [(apple, 2, 100), (bread, 1, 250)], discount_cents=50, tax_cents=20)
+    sell((2026, 3, 14, 10, 40, 0), [(bread, 2, 250)])
+    sell((2026, 3, 14, 17, 0, 0), [(apple, 1, 100)], tax_cents=10)
+
+    assert list(Reports.by_hour("2026-03-14 00", "2026-03-14 23")) == [("2026-03-14 10", 2, 5, 420 + 500),
+                                                                       ("2026-03-14 17", 1, 1, 110)]
+    assert list(Reports.by_item("2026-03-14", "2026-03-14")) == [(bread, "bread", 3, 750), (apple, "apple", 3, 300)]
+
+    (_, sales, total, discount, tax), = Reports.by_day("2026-03-14", "2026-03-14")
+    gross = sum(row[3] for row in Reports.by_item("2026-03-14", "2026-03-14"))
+
+    assert (sales, total) == (3, 1030)
+    assert gross == total + discount - tax
+    assert Totals.read("day", "2026-03-14") == (3, 1030, 50, 30)
+
+
+def test_rebuild_matches_the_rollups_kept_by_sales(backend):
+    Items.create("A", "apple", None, 100, 1.0)
+    apple = Items.lookup(code="A").id
+
+    for day in (13, 14):
+        for hour in (9, 18):
+            sell((2026, 3, day, hour, 0, 0), [(apple, hour // 9, 100)], discount_cents=day, tax_cents=hour)
+
+    kept = rollups()
+    Rollups.rebuild(conn(Items.DB))
+
+    assert rollups() == kept
+    assert len(kept["report_hourly"]) == 4
+
+
+def test_a_failing_report_raises(backend, tmp_path):
+    conn(Items.DB).execute("DROP TABLE report_hourly")
+
+    with pytest.raises(sqlite3.OperationalError):
+        Reports.to_csv(str(tmp_path / "hours.csv"), "by_hour", "2026-03-14 00", "2026-03-14 23")
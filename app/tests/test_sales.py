@@ -0,0 +1,122 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+from database.connection import conn
+from inventory.controller.items_controller import Items
+from sales.controller.sales_controller import Sales
+from sales.controller.sales_sum_controller import Basket, Totals
+
+
+pytestmark = pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+
+
+def stock(code):
+    return conn(Items.DB).execute("SELECT quantity_in_stock FROM items WHERE code = ?", (code,)).fetchone()[0]
+
+
+def count(table):
+    return conn(Items.DB).execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_a_sale_writes_its_lines_and_takes_the_stock(backend):
+    Items.create("A", "apple", None, 10, 1.0)
+    Items.create("B", "bread", None, 5, 2.5)
+    apple, bread = Items.lookup(code="A"), Items.lookup(code="B")
+
+    sale_id = Sales.record([(apple.id, 3, 100), (bread.id, 1, 250)], user_id=7)
+    sale, lines = Sales.read(sale_id)
+
+    assert sale[4] == 550
+    assert [line[2:] for line in lines] == [(apple.id, 3, 100), (bread.id, 1, 250)]
+    assert (stock("A"), stock("B")) == (7, 4)
+    # the cached item doesn't keep the stock from before the sale
+    assert Items.lookup(code="A").quantity_in_stock == 7
+
+
+def test_a_sale_with_an_unknown_item_writes_nothing(backend):
+    Items.create("A", "apple", None, 10, 1.0)
+    apple = Items.lookup(code="A")
+
+    assert isinstance(Sales.record([(apple.id, 3, 100), (apple.id + 99, 1, 250)]), ValueError)
+    assert isinstance(Sales.record([(apple.id, "three", 100)]), ValueError)
+
+    assert stock("A") == 10
+    assert (count("sales"), count("sale_lines"), count("sales_totals"), count("report_items")) == (0, 0, 0, 0)
+
+
+def test_concurrent_sales_take_every_unit_once(backend):
+    Items.create("A", "apple", None, 1000, 1.0)
+    apple = Items.lookup(code="A")
+    failed = []
+
+    def till():
+        for _ in range(25):
+            if isinstance(Sales.record([(apple.id, 2, 100)]), Exception):
+                failed.append(1)
+
+    threads = [threading.Thread(target=till) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert failed == []
+    assert stock("A") == 1000 - 8 * 25 * 2
+    assert count("sales") == 200
+
+
+def test_a_basket_keeps_its_totals_through_every_change(backend):
+    Items.create("A", "apple", None, 10, 1.0)
+    Items.create("B", "bread", None, 10, 2.5)
+    apple, bread = Items.lookup(code="A").id, Items.lookup(code="B").id
+    basket = Basket(tax_rate=Decimal("0.1"), shift="morning")
+
+    basket.add(apple, 100)
+    basket.add(apple, 100, quantity=2)
+    basket.add(bread, 250)
+    basket.discount(apple, 50)
+
+    assert (basket.quantity, basket.subtotal_cents, basket.discount_cents) == (4, 550, 50)
+    assert (basket.tax_cents, basket.total_cents) == (50, 550)
+
+    with pytest.raises(ValueError):
+        basket.discount(bread, 251)
+
+    # the discount shrinks with the line it belongs to
+    basket.set_quantity(apple, 0)
+    assert (basket.quantity, basket.subtotal_cents, basket.discount_cents, basket.total_cents) == (1, 250, 0, 275)
+
+    basket.remove(bread)
+    assert (basket.lines, basket.subtotal_cents, basket.quantity) == ({}, 0, 0)
+    assert isinstance(basket.checkout(), ValueError)
+
+
+def test_checkout_counts_the_sale_in_its_day_and_shift(backend):
+    Items.create("A", "apple", None, 10, 1.0)
+    apple = Items.lookup(code="A").id
+
+    for shift in ("morning", "morning", "evening"):
+        basket = Basket(tax_rate=Decimal("0.05"), shift=shift)
+        basket.add(apple, 333, quantity=3)
+        basket.discount(apple, 99)
+        total = basket.total_cents
+
+        assert isinstance(basket.checkout(), int)
+        assert basket.lines == {} and basket.total_cents == 0
+
+    assert total == 999 - 99 + 45
+    assert Totals.day() == (3, 3 * 945, 3 * 99, 3 * 45)
+    assert Totals.shift("morning") == (2, 2 * 945, 2 * 99, 2 * 45)
+    assert Totals.shift("nobody") == (0, 0, 0, 0)
+
+
+def test_a_basket_that_fails_to_record_is_kept(backend):
+    basket = Basket()
+    basket.add(12345, 100)
+
+    assert isinstance(basket.checkout(), ValueError)
+    assert basket.lines == {12345: (1, 100, 0)} and basket.total_cents == 100
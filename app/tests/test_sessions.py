@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from authentication.login import Auth
+from authentication.password import Password
+from security.sessions import Sessions
+from users.controller.user_controller import User
+
+
+def test_forged_expired_and_revoked_tokens_are_refused(monkeypatch):
+    sessions = Sessions(secret="one", ttl=60)
+    token = sessions.issue(1, "ana", 2)
+    session_id, _, signature = token.partition(".")
+
+    assert sessions.get(token).username == "ana"
+    assert sessions.check_permission(token, 2) and not sessions.check_permission(token, 3)
+    assert sessions.get(f"{session_id}.{'0' * len(signature)}") is None
+    assert sessions.get(f"{session_id}.é") is None
+    assert Sessions(secret="two").get(token) is None
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert sessions.get(token) is None
+    assert sessions.purge() == 0
+
+    monkeypatch.setattr(time, "time", lambda: now)
+    token = sessions.issue(1, "ana", 2)
+    sessions.revoke(token)
+
+    assert sessions.get(token) is None
+
+
+@pytest.mark.parametrize("backend", ["sqlite"], indirect=True)
+def test_stored_sessions_survive_a_restart_with_the_same_secret(backend, tmp_path):
+    path = str(tmp_path / "sessions.db")
+    sessions = Sessions(secret="kept", db=path)
+    token = sessions.issue(1, "ana", 2)
+    closed = sessions.issue(2, "bia", 1)
+    sessions.revoke(closed)
+
+    restarted = Sessions(secret="kept", db=path)
+
+    assert restarted.load() == 1
+    assert restarted.get(token).perm_level == 2
+    assert restarted.get(closed) is None
+
+
+def test_sessions_follow_updates_and_deletes_of_the_user(backend, monkeypatch):
+    sessions = Sessions()
+    monkeypatch.setattr(Auth, "sessions", sessions)
+    monkeypatch.setattr(User, "session_stores", [sessions])
+    User.create("Ana Souza", "ana", "caixaum12", 3)
+    User.create("Bia Lima", "bia", "caixadois34", 3)
+    user = User.read(username="ana")
+
+    assert Auth.open_session("ana", "wrong") is None
+    token, other = Auth.open_session("ana", "caixaum12"), Auth.open_session("bia", "caixadois34")
+
+    with monkeypatch.context() as patched:
+        # permission checks don't run bcrypt again
+        patched.setattr(Password, "check", lambda *args: pytest.fail("bcrypt ran"))
+        assert Auth.check_permission(token, 3)
+
+        User.update(user.id, perm_level=1)
+        assert not Auth.check_permission(token, 3) and Auth.check_permission(token, 1)
+
+    User.update(user.id, password="caixatres56")
+    assert sessions.get(token) is None
+
+    User.delete(username="bia")
+    assert sessions.get(other) is None
@@ -0,0 +1,98 @@
+from authentication.password import Password
+from users.controller.user_controller import User
+
+
+def test_create_and_read(backend):
+    assert User.create("Ana Souza", "ana", "caixaum12", 1) is None
+
+    user = User.read(username="ana")
+    assert (user.name, user.username, user.perm_level) == ("Ana Souza", "ana", 1)
+    assert Password.check("caixaum12", user.password)
+    assert User.read(user_id=user.id) == user
+    assert User.read(username="nobody") is None
+
+
+def test_duplicate_username_is_refused(backend):
+    User.create("Ana Souza", "ana", "caixaum12", 1)
+
+    assert isinstance(User.create("Ana Lima", "ana", "caixa5678", 1), Exception)
+    assert [user.name for user in User.list()] == ["Ana Souza"]
+
+
+def test_update(backend):
+    User.create("Ana Souza", "ana", "caixaum12", 1)
+    user_id = User.read(username="ana").id
+
+    assert User.update(user_id, name="Ana S. Souza", perm_level=2) is True
+    assert isinstance(User.update(user_id, password="short"), ValueError)
+    assert User.update(user_id, password="gerente99") is True
+
+    user = User.read(user_id=user_id)
+    assert (user.name, user.perm_level) == ("Ana S. Souza", 2)
+    assert Password.check("gerente99", user.password)
+
+
+def test_bulk_update(backend):
+    for n in range(3):
+        User.create(f"user {n}", f"user{n}", "caixaum12", 1)
+
+    ids = [user.id for user in User.list()]
+
+    assert User.bulk_update([(ids[0], {"perm_level": 3}), (ids[1], {"perm_level": 3}), (ids[2], {"name": "renamed"})]) == 3
+    assert [(user.name, user.perm_level) for user in User.list()] == [("user 0", 3), ("user 1", 3), ("renamed", 1)]
+
+
+def test_delete(backend):
+    User.create("Ana Souza", "ana", "caixaum12", 1)
+    User.create("Bia Lima", "bia", "caixaum12", 1)
+
+    assert User.delete(user_id=User.read(username="ana").id) is True
+    assert User.delete(username="bia") is True
+    assert User.delete(username="bia") is False
+    assert list(User.list()) == []
+
+
+def test_list_pages_sorts_and_filters(backend):
+    for n in range(7):
+        User.create(f"name {6 - n}", f"user{n}", "caixaum12", n % 2 + 1)
+
+    users = list(User.list(page_size=3))
+    assert [user.username for user in users] == [f"user{n}" for n in range(7)]
+    # hashes never leave through list
+    assert all(user.password is None for user in users)
+
+    by_name = list(User.list(order_by="name", page_size=2))
+    assert [user.name for user in by_name] == [f"name {n}" for n in range(7)]
+
+    rest = list(User.list(order_by="name", after=(by_name[2].name, by_name[2].id), limit=2))
+    assert rest == by_name[3:5]
+
+    assert [user.username for user in User.list(perm_level=2)] == ["user1", "user3", "user5"]
+
+
+def test_credentials(backend):
+    User.create("Ana Souza", "ana", "caixaum12", 2)
+
+    row = User.credentials("ana")
+    assert row.perm_level == 2 and row.name is None
+    assert Password.check("caixaum12", row.password)
+    assert User.credentials("nobody") is None
+
+
+def test_import_refuses_weak_passwords_and_export_leaves_hashes_out(backend, tmp_path):
+    path = tmp_path / "users.csv"
+    path.write_text("name,username,password,perm_level\n"
+                    "Ana Souza,ana,caixaum12,1\n"
+                    "Bia Lima,bia,123,1\n"
+                    "Ana again,ana,caixadois34,2\n"
+                    "Caio,caio,gerente99,3\n", encoding="utf-8")
+
+    loaded, rejected = User.import_file(str(path))
+
+    assert loaded == 2
+    assert [number for number, _ in rejected] == [2, 3]
+    assert Password.check("gerente99", User.read(username="caio").password)
+
+    exported = tmp_path / "out.csv"
+    assert User.export_file(str(exported)) == 2
+    assert exported.read_text(encoding="utf-8").splitlines() == ["id,name,username,perm_level", "1,Ana Souza,ana,1", "2,Caio,caio,3"]
@@ -1,9 +1,18 @@
 from database.connection import conn as c
+from database.queries import update_query, bulk_update, paginate
+from database import bulk, config
+from database.rows import UserRow, cursor as row_cursor
 from authentication.password import Password as p
 
 
 class User:
-    DB = "./database/users.db"
+    DB = config.path("users")
+    COLUMNS = ("name", "username", "password", "salt", "perm_level")
+    # indexed columns User.list can sort and filter on
+    ORDER_BY = ("id", "username", "name")
+    FILTERS = ("perm_level",)
+    # security.sessions.Sessions whose open sessions follow updates and deletes of users, see authentication.login.Auth
+    session_stores = []
     def __init__(self, name, username, password, permission_level):
 
         '''
@@ -52,14 +61,81 @@ class User:
                         VALUES (?,?,?,?,?)
                     '''
 
-            cursor.execute(query, (name, username, pw[0], pw[1], permission_level,))
-            conn.commit()
+            with conn:
+                cursor.execute(query, (name, username, pw[0], pw[1], permission_level,))
 
         except Exception as e:
             return e
 
-        finally:
-            conn.close()
+
+    @staticmethod
+    def validate(row):
+        '''
+         Turns an imported row into the values of User.COLUMNS, hashing the plain text password.
+
+         @param row - Mapping with name, username, password and perm_level.
+
+         @return A tuple ready to insert. Raises ValueError if a field is missing or the password is refused.
+        '''
+        if not row.get("name") or not row.get("username"):
+            raise ValueError("name and username are required")
+
+        pw = p.hash(row["password"]) if row.get("password") else None
+
+        if pw is None:
+            raise ValueError(f"password of {row['username']} doesn't meet the requirements")
+
+        return (row["name"], row["username"], pw[0], pw[1], int(row["perm_level"]))
+
+    @staticmethod
+    def screen(rows, batch_size=bulk.BATCH_SIZE):
+        '''
+         Checks the passwords of imported rows against the policy a chunk at a time, before anything is hashed.
+
+         Refused passwords are blanked so validate rejects the row without running bcrypt.
+        '''
+        for chunk in bulk.chunks(rows, batch_size):
+            for row, accepted in zip(chunk, p.policy.verify_many([row.get("password") for row in chunk])):
+                if not accepted:
+                    row["password"] = None
+
+                yield row
+
+    @staticmethod
+    def import_file(path, batch_size=bulk.BATCH_SIZE):
+        '''
+         Loads users from a CSV or JSON Lines file in chunked transactions.
+
+         @param path - The file to import.
+         @param batch_size - Rows per transaction.
+
+         @return A tuple (loaded, rejected) as returned by database.bulk.load or the exception raised.
+        '''
+        try:
+            rows = User.screen(bulk.read_rows(path), batch_size)
+
+            return bulk.load(c(User.DB), "users", User.COLUMNS, rows, User.validate, batch_size)
+
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def export_file(path, batch_size=bulk.BATCH_SIZE):
+        '''
+         Streams the users table into a CSV file. Password hashes and salts are left out.
+
+         @param path - The destination file.
+         @param batch_size - Rows fetched per round trip.
+
+         @return The number of users written or the exception raised.
+        '''
+        columns = ("id", "name", "username", "perm_level")
+
+        try:
+            return bulk.export_csv(path, columns, bulk.export(c(User.DB), "users", columns, batch_size))
+
+        except Exception as e:
+            return e
 
     @staticmethod
     def read(user_id=None, username=None):
@@ -69,11 +145,11 @@ class User:
          @param user_id - The user's id. Defaults to None.
          @param username - The user's username. Defaults to None.
          
-         @return None if no user is found or an exception that was raised while trying to read the user. Otherwise a dictionary
+         @return None if no user is found or an exception that was raised while trying to read the user. Otherwise a UserRow
         '''
         try:
             conn = c(User.DB)
-            cursor = conn.cursor()
+            cursor = row_cursor(conn, UserRow)
 
             # Return user_id if user_id is not None
             if user_id is not None:
@@ -86,8 +162,6 @@ class User:
                 except Exception as e:
                     return e
 
-                finally:
-                    conn.close()
 
             # Return the user object for the given username.
             if username is not None:
@@ -100,16 +174,41 @@ class User:
                 except Exception as e:
                     return e
 
-                finally:
-                    conn.close()
 
         except Exception as e:
             return e
 
-        finally:
-            # Close the connection to the server.
-            if conn:
-                conn.close()
+
+    @staticmethod
+    def credentials(username):
+        '''
+         Fetches what a login needs in a single indexed query.
+
+         @param username - The username to look up.
+
+         @return A UserRow with id, password, salt and perm_level set or None if there is no such user.
+        '''
+        return row_cursor(c(User.DB), UserRow).execute('SELECT id, password, salt, perm_level FROM users WHERE username = ?', (username,)).fetchone()
+
+    @staticmethod
+    def list(order_by="id", after=None, limit=None, page_size=bulk.BATCH_SIZE, **filters):
+        '''
+         Lists users page by page without their password hashes.
+
+         @param order_by - One of User.ORDER_BY.
+         @param after - (order_by value, id) of the last user already seen, None to start from the beginning.
+         @param limit - Maximum number of users, None for all of them.
+         @param page_size - Users read per query.
+         @param filters - Columns of User.FILTERS and the value they must have, e.g. perm_level=1.
+
+         @return A generator of UserRow or the exception raised.
+        '''
+        try:
+            return paginate(c(User.DB), "users", ("id", "name", "username", "perm_level"), User.ORDER_BY, User.FILTERS,
+                            order_by, filters, after, limit, page_size, UserRow)
+
+        except Exception as e:
+            return e
 
     @staticmethod
     def update(user_id, name=None, username=None, password=None, perm_level=None):
@@ -126,46 +225,62 @@ class User:
         '''
         # Check if the user is in the database.
         if user_id is not None:
+            fields = {"name": name, "username": username, "perm_level": perm_level}
+
             try:
-                conn = c(User.DB)
-                cursor = conn.cursor()
+                # Hash the new password, the salt goes along with it
+                if password is not None:
+                    pw = p.hash(password)
 
-                # Update the name of the user
-                if name is not None:
-                    query = ''' UPDATE users SET name = (?) WHERE id=(?)'''
-                    cursor.execute(query, (name, user_id,))
-                    conn.commit()
+                    if pw is None:
+                        raise ValueError("the password doesn't follow the password rules")
 
-                # Update the username of the user
-                if username is not None:
-                    query = ''' UPDATE users SET username = (?) WHERE id=(?)'''
-                    cursor.execute(query, (username, user_id,))
-                    conn.commit()
+                    fields["password"], fields["salt"] = pw[0], pw[1]
 
-                # Update the password of the user
-                if password is not None:
-                    query = ''' UPDATE users SET password = ?, salt = ? WHERE id=?'''
-                    pw = p.hash(password)
-                    cursor.execute(query, (pw[0], pw[1], user_id,))
-                    conn.commit()
+                built = update_query("users", User.COLUMNS, fields)
+
+                if built is None:
+                    return True
+
+                query, columns = built
+                conn = c(User.DB)
 
-                # Set the user s permission level.
-                if perm_level is not None:
-                    query = ''' UPDATE users SET perm_level = (?) WHERE id=(?)'''
-                    cursor.execute(query, (perm_level, user_id,))
-                    conn.commit()
+                with conn:
+                    conn.execute(query, tuple(fields[column] for column in columns) + (user_id,))
+
+                for sessions in User.session_stores:
+                    sessions.user_changed(user_id, username, perm_level, password is not None)
 
                 return True
 
             except Exception as e:
                 return e
 
-            finally:
-                conn.close()
-
         else:
             raise ValueError("User id not found")
 
+    @staticmethod
+    def bulk_update(updates):
+        '''
+         Update many users in a single transaction. Passwords must already be hashed.
+
+         @param updates - Iterable of (user_id, fields) pairs where fields maps column names to new values.
+
+         @return The number of users changed or the exception raised.
+        '''
+        try:
+            updates = list(updates)
+            changed = bulk_update(c(User.DB), "users", User.COLUMNS, updates)
+
+            for user_id, fields in updates:
+                for sessions in User.session_stores:
+                    sessions.user_changed(user_id, fields.get("username"), fields.get("perm_level"), "password" in fields)
+
+            return changed
+
+        except Exception as e:
+            return e
+
     @staticmethod
     def delete(user_id=None, username=None):
         '''
@@ -174,7 +289,7 @@ class User:
          @param user_id - The user's id
          @param username - The user's name ( optional ) If both user_id and username are specified the user will be deleted
          
-         @return True if successful otherwise
+         @return True if a user was deleted, False if there was no such user
         '''
         # Delete user from database if user_id is not None
         if user_id is not None:
@@ -184,17 +299,17 @@ class User:
                 conn = c(User.DB)
                 cursor = conn.cursor()
 
-                cursor.execute(query, (user_id,))
-                conn.commit()
+                with conn:
+                    cursor.execute(query, (user_id,))
 
-                return True
+                for sessions in User.session_stores:
+                    sessions.user_deleted(user_id=user_id)
+
+                return cursor.rowcount > 0
 
             except Exception as e:
                 return e
 
-            finally:
-                conn.close()
-
         # Delete the user with the given username.
         if username is not None:
             query = ''' DELETE FROM users WHERE username=(?)'''
@@ -203,12 +318,15 @@ class User:
                 conn = c(User.DB)
                 cursor = conn.cursor()
 
-                cursor.execute(query, (username,))
-                conn.commit()
+                with conn:
+                    cursor.execute(query, (username,))
+
+                for sessions in User.session_stores:
+                    sessions.user_deleted(username=username)
+
+                return cursor.rowcount > 0
 
             except Exception as e:
                 return e
 
-            finally:
-                conn.close()
 
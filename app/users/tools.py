@@ -17,7 +17,7 @@ class Tools:
          @return True if the user exists False if it doesn't or an exception if something went wrong during the
         '''
         try:
-            conn = c('./database/users.db')
+            conn = c(uc.DB)
             cursor = conn.cursor()
 
             # Returns the user id of the user
@@ -37,8 +37,6 @@ class Tools:
         except Exception as e:
             return e
 
-        finally:
-            conn.close()
 
     @staticmethod
     def create(name, username, password, perm_level):
@@ -63,16 +61,18 @@ class Tools:
     @staticmethod
     def read(user_id=None, username=None):
         '''
-         Read data from user's data store. This is a wrapper for uc. read that checks if the user exists before reading data
+         Read data from user's data store. This is a wrapper for uc. read, a single query that returns nothing when the user is missing
          
          @param user_id - ID of user to read data for
          @param username - Name of user to read data for ( optional )
          
-         @return List of data read from data store ( s ) or empty list if not found ( default ) or
+         @return The UserRow read from the data store or None if not found
         '''
         # Returns a list of users.
-        if Tools.exists(user_id=user_id, username=username) is not None:
-            return list(uc.read(user_id=user_id, username=username))
+        user = uc.read(user_id=user_id, username=username)
+
+        if user is not None:
+            return user
         else:
             print('User not found')
 
@@ -102,14 +102,11 @@ class Tools:
          @param user_id - User ID to delete from UC
          @param username - Username of user to delete from UC.
          
-         @return None on success Exception on failure. Usage : fab. delete ( [ user_id ] [ username ]
+         @return True if the user was deleted, False if not found, Exception on failure.
         '''
         try:
             # Delete the user from the database
-            if Tools.exists(user_id=None, username=username) is not None:
-                uc.delete(user_id=user_id, username=username)
+            return uc.delete(user_id=user_id, username=username)
         except Exception as e:
             return e
 
-
-print(Tools.create("matheus", "Lima", "alicein99", "1"))
\ No newline at end of file